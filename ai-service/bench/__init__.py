@@ -0,0 +1 @@
+"""Benchmark suite for the ai-service routers (see bench/run.py)."""
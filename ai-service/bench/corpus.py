@@ -0,0 +1,104 @@
+"""Synthetic, seeded corpus of Indonesian / Jaksel-style chat traffic."""
+
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from typing import Dict, List
+
+SIZES: Dict[str, int] = {"small": 200, "medium": 2000, "large": 20000}
+
+MENU_PHRASES = (
+    "indomie",
+    "indomie goreng",
+    "indomi grg",
+    "nasi goreng",
+    "nasgor",
+    "ayam geprek",
+    "geprek",
+    "es teh manis",
+    "es teh",
+    "teh tawar",
+    "kopi susu",
+    "kopi item",
+    "jus jeruk",
+    "air mineral",
+    "aqua",
+)
+QTY_WORDS = ("1", "2", "3", "4", "5", "10")
+OPENERS = ("", "bro ", "kak ", "min ", "halo kak, ", "guys ", "literally ")
+VERBS = ("pesan", "pesen", "minta", "order", "mau", "tolong")
+JOINERS = (" sama ", " dan ", ", ", " terus ", " plus ")
+CLOSERS = ("", " dong", " ya", " please", " which is urgent banget", " thx")
+
+QUESTIONS = (
+    "jam buka warung kapan",
+    "buka jam berapa kak",
+    "bisa bayar pake qris?",
+    "bisa transfer bca ga",
+    "alamatnya dimana min",
+    "lokasi warung di mana",
+    "bisa delivery ga",
+    "ongkir ke kemang berapa",
+    "menu apa aja hari ini",
+    "ada makanan apa aja",
+)
+SMALLTALK = (
+    "halo kak apa kabar",
+    "makasih ya kak",
+    "mantap bro",
+    "wkwk iya",
+    "kamu bot ya",
+    "lagi rame ga sih",
+    "which is enak banget kemarin",
+)
+# Orders the local parser cannot resolve (no quantity), so they hit the LLM.
+VAGUE_ORDERS = (
+    "mau yang pedes dong",
+    "kayak biasa ya kak",
+    "esteh manis satu",
+    "indomi grg aja",
+)
+
+
+@dataclass
+class Corpus:
+    orders: List[str]
+    vague_orders: List[str]
+    questions: List[str]
+    smalltalk: List[str]
+    carts: List[List[dict]]
+
+
+def _order(rng: random.Random) -> str:
+    parts = [
+        f"{rng.choice(QTY_WORDS)} {rng.choice(MENU_PHRASES)}"
+        for _ in range(rng.randint(1, 4))
+    ]
+    body = parts[0]
+    for part in parts[1:]:
+        body += rng.choice(JOINERS) + part
+    return f"{rng.choice(OPENERS)}{rng.choice(VERBS)} {body}{rng.choice(CLOSERS)}"
+
+
+def _cart(rng: random.Random) -> List[dict]:
+    slugs = ("indomie", "indomie_goreng", "nasi_goreng", "ayam_geprek", "es_teh_manis", "kopi_susu")
+    return [
+        {"item": rng.choice(slugs), "qty": rng.randint(1, 5)}
+        for _ in range(rng.randint(1, 5))
+    ]
+
+
+def build_corpus(size: str = "small", seed: int = 42) -> Corpus:
+    """Build a corpus of ``SIZES[size]`` orders plus proportional extras."""
+
+    rng = random.Random(seed)
+    count = SIZES[size]
+    extras = max(10, count // 10)
+    return Corpus(
+        orders=[_order(rng) for _ in range(count)],
+        vague_orders=[rng.choice(VAGUE_ORDERS) + f" #{i}" for i in range(extras)],
+        questions=[rng.choice(QUESTIONS) for _ in range(count)],
+        smalltalk=[rng.choice(SMALLTALK) for _ in range(extras)],
+        carts=[_cart(rng) for _ in range(count)],
+    )
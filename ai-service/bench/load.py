@@ -0,0 +1,90 @@
+"""End-to-end HTTP load runs against the FastAPI app."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from bench.corpus import Corpus
+from bench.stats import summarize
+
+# (name, path, payload builder over the corpus)
+Scenario = Tuple[str, str, Callable[[Corpus], List[dict]]]
+
+SCENARIOS: List[Scenario] = [
+    ("parse_order", "/parse_order", lambda c: [{"text": t} for t in c.orders]),
+    ("parse_order_llm", "/parse_order", lambda c: [{"text": t} for t in c.vague_orders]),
+    ("parse_order_batch", "/parse_order/batch", lambda c: [
+        {"texts": c.orders[i : i + 500]} for i in range(0, len(c.orders), 500)
+    ]),
+    ("invoice", "/invoice", lambda c: [{"items": cart} for cart in c.carts]),
+    ("faq", "/faq", lambda c: [{"question": q} for q in c.questions]),
+    ("promo", "/promo", lambda c: [{"items": cart} for cart in c.carts]),
+    ("chat", "/chat", lambda c: [{"text": t} for t in c.smalltalk]),
+]
+
+
+async def _drive(
+    client: httpx.AsyncClient, path: str, payloads: List[dict], concurrency: int
+) -> Dict[str, float]:
+    samples: List[float] = []
+    errors = 0
+    queue = list(reversed(payloads))
+
+    async def worker() -> None:
+        nonlocal errors
+        while queue:
+            payload = queue.pop()
+            t0 = time.perf_counter()
+            try:
+                resp = await client.post(path, json=payload)
+                if resp.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            samples.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(samples, time.perf_counter() - started, unit="ms")
+    result["errors"] = errors
+    result["concurrency"] = concurrency
+    return result
+
+
+@contextlib.asynccontextmanager
+async def _client(url: Optional[str]):
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=60.0) as client:
+            yield client
+        return
+
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=60.0
+        ) as client:
+            yield client
+
+
+async def run_load(
+    corpus: Corpus,
+    concurrency: int = 32,
+    url: Optional[str] = None,
+    only: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, float]]:
+    """Run every scenario (or ``only`` those) and summarize latencies."""
+
+    results: Dict[str, Dict[str, float]] = {}
+    async with _client(url) as client:
+        for name, path, build in SCENARIOS:
+            if only and name not in only:
+                continue
+            results[name] = await _drive(client, path, build(corpus), concurrency)
+    return results
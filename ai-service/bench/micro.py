@@ -0,0 +1,40 @@
+"""In-process micro-benchmarks of the hot local code paths."""
+
+from __future__ import annotations
+
+import time
+from typing import Callable, Dict, Iterable, List
+
+from bench.corpus import Corpus
+from bench.stats import summarize
+
+
+def _time_each(fn: Callable, inputs: Iterable, warmup: int = 20) -> Dict[str, float]:
+    inputs = list(inputs)
+    for value in inputs[:warmup]:
+        fn(value)
+
+    samples: List[float] = []
+    clock = time.perf_counter
+    started = clock()
+    for value in inputs:
+        t0 = clock()
+        fn(value)
+        samples.append(clock() - t0)
+    return summarize(samples, clock() - started, unit="us")
+
+
+def run_micro(corpus: Corpus) -> Dict[str, Dict[str, float]]:
+    """Time each local stage once per corpus entry."""
+
+    from models.order_model import OrderItem
+    from routers.order import _parse_locally
+    from utils.faq_engine import get_faq_answer
+    from utils.price_calc import calculate_total
+
+    carts = [[OrderItem(**line) for line in cart] for cart in corpus.carts]
+    return {
+        "parse_locally": _time_each(_parse_locally, corpus.orders),
+        "calculate_total": _time_each(calculate_total, carts),
+        "get_faq_answer": _time_each(get_faq_answer, corpus.questions + corpus.smalltalk),
+    }
@@ -0,0 +1,142 @@
+"""Benchmark runner: ``python -m bench.run --help`` from ``ai-service/``.
+
+Results are written as JSON under ``bench/results/`` and compared against a
+baseline file (by default the most recent earlier result for the same size),
+so regressions can be spotted offline without a live Gemini key.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Latency-like metrics where higher is worse; throughput is the opposite.
+_LOWER_IS_BETTER = ("mean_", "p50_", "p95_", "p99_", "max_")
+
+
+def _configure_env(args: argparse.Namespace) -> None:
+    # must happen before the app modules read their settings
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    os.environ.setdefault("LLM_CACHE_PATH", "")
+    os.environ["LLM_FAKE_LATENCY"] = str(args.llm_latency)
+    os.environ["LLM_FAKE_FAILURE_RATE"] = str(args.llm_failure_rate)
+    os.environ.setdefault("LLM_FAKE_SEED", str(args.seed))
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _latest_result(size: str, exclude: Path) -> Optional[Path]:
+    candidates = sorted(
+        path for path in RESULTS_DIR.glob(f"*-{size}.json") if path != exclude
+    )
+    return candidates[-1] if candidates else None
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float = 0.10) -> int:
+    """Print per-metric deltas; return the number of regressions."""
+
+    regressions = 0
+    for section in ("micro", "http"):
+        for name, metrics in current.get(section, {}).items():
+            before = baseline.get(section, {}).get(name)
+            if not before:
+                continue
+            for metric, value in metrics.items():
+                old = before.get(metric)
+                if not isinstance(value, (int, float)) or not old:
+                    continue
+                change = (value - old) / old
+                if metric.startswith(_LOWER_IS_BETTER):
+                    worse = change > tolerance
+                elif metric == "throughput_per_s":
+                    worse = change < -tolerance
+                else:
+                    continue
+                flag = "  REGRESSION" if worse else ""
+                print(f"{section}.{name}.{metric}: {old} -> {value} ({change:+.1%}){flag}")
+                regressions += int(worse)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="WarungGo ai-service benchmarks")
+    parser.add_argument("--suite", choices=("micro", "http", "all"), default="all")
+    parser.add_argument("--size", choices=("small", "medium", "large"), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--url", help="benchmark a running server instead of in-process")
+    parser.add_argument("--only", nargs="*", help="HTTP scenarios to run")
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--out", type=Path, help="result file (default: bench/results/)")
+    parser.add_argument("--baseline", type=Path, help="result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    _configure_env(args)
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+    from bench.corpus import build_corpus
+    from bench.load import run_load
+    from bench.micro import run_micro
+
+    corpus = build_corpus(args.size, seed=args.seed)
+    result: Dict = {
+        "meta": {
+            "revision": _git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "size": args.size,
+            "seed": args.seed,
+            "concurrency": args.concurrency,
+            "llm_latency": args.llm_latency,
+            "llm_failure_rate": args.llm_failure_rate,
+            "target": args.url or "in-process",
+        }
+    }
+    if args.suite in ("micro", "all"):
+        result["micro"] = run_micro(corpus)
+    if args.suite in ("http", "all"):
+        result["http"] = asyncio.run(
+            run_load(corpus, concurrency=args.concurrency, url=args.url, only=args.only)
+        )
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out = args.out or RESULTS_DIR / (
+        f"{time.strftime('%Y%m%d-%H%M%S')}-{result['meta']['revision']}-{args.size}.json"
+    )
+    out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    print(f"results written to {out}")
+
+    baseline_path = args.baseline or _latest_result(args.size, exclude=out)
+    if baseline_path and baseline_path.exists():
+        print(f"comparing against {baseline_path}")
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        return 1 if compare(result, baseline, tolerance=args.tolerance) else 0
+
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
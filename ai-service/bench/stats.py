@@ -0,0 +1,31 @@
+"""Latency summaries shared by the micro and HTTP benchmarks."""
+
+from __future__ import annotations
+
+from typing import Dict, Sequence
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(samples: Sequence[float], elapsed: float, unit: str = "ms") -> Dict[str, float]:
+    """Summarize latencies (seconds) measured over ``elapsed`` wall seconds."""
+
+    scale = {"ms": 1e3, "us": 1e6}[unit]
+    ordered = sorted(samples)
+    count = len(ordered)
+    return {
+        "count": count,
+        f"mean_{unit}": round(sum(ordered) / count * scale, 3) if count else 0.0,
+        f"p50_{unit}": round(percentile(ordered, 50) * scale, 3),
+        f"p95_{unit}": round(percentile(ordered, 95) * scale, 3),
+        f"p99_{unit}": round(percentile(ordered, 99) * scale, 3),
+        f"max_{unit}": round(ordered[-1] * scale, 3) if count else 0.0,
+        "throughput_per_s": round(count / elapsed, 1) if elapsed > 0 else 0.0,
+    }
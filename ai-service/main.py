@@ -2,14 +2,43 @@
 
 from __future__ import annotations
 
-import httpx
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+import time
 
-from routers import chat
+_import_started = time.perf_counter()
+
+from utils import startup  # noqa: E402
+
+startup.configure()  # .env must be loaded before the modules below read it
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.middleware.cors import CORSMiddleware  # noqa: E402
+from fastapi.responses import JSONResponse, PlainTextResponse  # noqa: E402
+
+from routers import (  # noqa: E402
+    aliases,
+    catalog,
+    chat,
+    faq,
+    intent,
+    inventory,
+    invoice,
+    order,
+    pipeline,
+    promo,
+    session,
+    stream,
+)
+from utils import metrics  # noqa: E402
+from utils.alias_store import close_alias_store  # noqa: E402
+from utils.inventory import close_inventory  # noqa: E402
+from utils.llm_client import cache_stats, llm_status  # noqa: E402
+from utils.tenants import TENANTS, TenantMiddleware  # noqa: E402
 
 app = FastAPI(title="WarungGo AI Service", version="0.1.0")
 
+# innermost, so CORS preflights and metrics see requests for unknown tenants
+app.add_middleware(TenantMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -17,21 +46,70 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
 
 @app.on_event("startup")
 async def on_startup() -> None:
     """Initialize shared resources."""
     app.state.http_client = httpx.AsyncClient(timeout=10.0)
-    # warmup_client removed
+    # catalog, matchers, FAQ index and Gemini client; see WARMUP
+    app.state.warmup_task = await startup.start()
 
 
 @app.on_event("shutdown")
-def shutdown():
-    pass
+async def shutdown() -> None:
+    """Release shared resources."""
+    task = app.state.warmup_task
+    if task is not None and not task.done():
+        task.cancel()
+    # write-behind: persist stock committed since the last flush
+    close_inventory()
+    close_alias_store()
+    await app.state.http_client.aclose()
 
 app.include_router(chat.router)
+app.include_router(catalog.router)
+app.include_router(order.router)
+app.include_router(invoice.router)
+app.include_router(faq.router)
+app.include_router(promo.router)
+app.include_router(session.router)
+app.include_router(intent.router)
+app.include_router(inventory.router)
+app.include_router(aliases.router)
+app.include_router(pipeline.router)
+app.include_router(stream.router)
+
+startup.record_import(time.perf_counter() - _import_started)
+
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    """Readiness: 503 until the startup warmup has finished."""
+    state = startup.READINESS.snapshot()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
+@app.get("/llm/cache")
+async def llm_cache_stats():
+    """Hit/miss counters of the LLM response cache."""
+    return cache_stats()
+
+
+@app.get("/llm/status")
+async def llm_client_status():
+    """Concurrency and circuit breaker state of the LLM client."""
+    return llm_status()
+
+
+@app.get("/tenants")
+async def tenant_cache_stats():
+    """Tenants currently compiled in this process and their estimated size."""
+    return TENANTS.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics() -> str:
+    """Prometheus text exposition; enable with METRICS_ENABLED=1."""
+    return metrics.render()
@@ -1,12 +1,21 @@
 """Pydantic models for order parsing requests."""
 
-from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field, NonNegativeInt
+
+# Request menu overrides (slug or name -> price). Validated here because the
+# invoice lines built from them are returned with model_construct.
+MenuPrices = Dict[str, NonNegativeInt]
 
 
 class OrderRequest(BaseModel):
     """Incoming natural language order payload."""
 
     text: str = Field(..., description="Raw order text from the user")
+    jid: Optional[str] = Field(
+        default=None, description="Customer JID; rate-limits the LLM fallback per customer"
+    )
 
 
 class OrderItem(BaseModel):
@@ -14,3 +23,11 @@ class OrderItem(BaseModel):
 
     item: str = Field(..., description="Slugified menu item name")
     qty: int = Field(..., ge=1, description="Quantity requested")
+
+
+class OrderBatchRequest(BaseModel):
+    """Many order texts parsed in a single request."""
+
+    texts: List[str] = Field(
+        ..., max_length=20000, description="Raw order texts, parsed independently"
+    )
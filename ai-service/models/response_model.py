@@ -1,6 +1,6 @@
 """Pydantic models for API responses."""
 
-from typing import List
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -16,6 +16,12 @@ class ParseOrderResponse(BaseModel):
     )
 
 
+class ParseOrderBatchResponse(BaseModel):
+    """Response returned by the /parse_order/batch endpoint."""
+
+    results: List[ParseOrderResponse] = Field(default_factory=list)
+
+
 class InvoiceItemResponse(OrderItem):
     """Invoice line item with pricing details."""
 
@@ -31,6 +37,127 @@ class InvoiceResponse(BaseModel):
     formatted: str
 
 
+class InvoiceCartTotal(BaseModel):
+    """Compact per-cart result of the bulk invoice endpoint."""
+
+    lines: List[List[int]] = Field(
+        default_factory=list,
+        description="One [item_index, qty, unit_price, subtotal] row per line",
+    )
+    total: int = Field(0, ge=0)
+
+
+class InvoiceBatchResponse(BaseModel):
+    """Totals for many carts priced against one menu."""
+
+    items: List[str] = Field(
+        default_factory=list, description="Item slugs referenced by item_index"
+    )
+    carts: List[InvoiceCartTotal] = Field(default_factory=list)
+    grand_total: int = Field(0, ge=0)
+
+
+class CartLine(BaseModel):
+    """A cart line after a delta; ``qty`` 0 means the line was removed."""
+
+    item: str
+    qty: int = Field(..., ge=0)
+
+
+class CartResponse(BaseModel):
+    """Current cart of a customer session plus what the last delta changed."""
+
+    jid: str
+    items: List[OrderItem] = Field(default_factory=list)
+    total: int = Field(0, ge=0)
+    op: Optional[str] = Field(
+        default=None, description="Delta applied: add, set or remove; null if nothing matched"
+    )
+    changes: List[CartLine] = Field(default_factory=list)
+
+
+class StockLevelResponse(BaseModel):
+    """Live stock of one item; ``available`` = ``on_hand`` - ``reserved``."""
+
+    item: str
+    on_hand: int = Field(..., ge=0)
+    reserved: int = Field(..., ge=0)
+    available: int = Field(..., ge=0)
+
+
+class InventoryResponse(BaseModel):
+    """All tracked items plus engine counters."""
+
+    items: List[StockLevelResponse] = Field(default_factory=list)
+    stats: Dict[str, int] = Field(default_factory=dict)
+
+
+class StockShortage(BaseModel):
+    item: str
+    requested: int = Field(..., ge=1)
+    available: int = Field(..., ge=0)
+
+
+class ReservationResponse(BaseModel):
+    """Outcome of a reserve, commit or release call."""
+
+    ok: bool
+    reservation_id: Optional[str] = None
+    items: List[OrderItem] = Field(
+        default_factory=list, description="Held lines; items without stock tracking are omitted"
+    )
+    expires_at: Optional[float] = Field(default=None, description="Unix time the hold lapses")
+    shortages: List[StockShortage] = Field(default_factory=list)
+    error: Optional[str] = None
+
+
+class CatalogSyncResponse(BaseModel):
+    """What a catalog sync changed; slugs per kind of change."""
+
+    ok: bool = True
+    version: int = Field(..., description="Catalog version serving after the sync")
+    added: List[str] = Field(default_factory=list)
+    removed: List[str] = Field(default_factory=list)
+    price_changed: List[str] = Field(default_factory=list)
+    stock_changed: List[str] = Field(default_factory=list)
+    renamed: List[str] = Field(default_factory=list)
+    unchanged: int = Field(0, ge=0)
+    written: List[str] = Field(default_factory=list, description="Files replaced on disk")
+    elapsed_ms: float = 0.0
+    error: Optional[str] = None
+
+
+class LearnedAliasResponse(BaseModel):
+    """One phrase -> slug alias learned from the LLM fallback (or pinned by hand)."""
+
+    phrase: str
+    slug: str
+    confidence: float = Field(..., ge=0.0, le=1.0)
+    usable: bool = Field(..., description="Confident enough to be used by the local parser")
+    hits: int = Field(0, ge=0, description="Times the local parser used it")
+    confirmations: int = Field(1, ge=0, description="LLM answers that agreed with it")
+    source: str = Field("llm", description="llm or manual")
+    learned_at: float = 0.0
+    last_used: float = 0.0
+
+
+class LearnedAliasListResponse(BaseModel):
+    items: List[LearnedAliasResponse] = Field(default_factory=list)
+    stats: Dict[str, int] = Field(default_factory=dict)
+
+
+class AliasPinResponse(BaseModel):
+    ok: bool = True
+    alias: Optional[LearnedAliasResponse] = None
+    error: Optional[str] = None
+
+
+class AliasPruneResponse(BaseModel):
+    ok: bool = True
+    removed: List[str] = Field(default_factory=list)
+    remaining: int = Field(0, ge=0)
+
+
 class FaqResponse(BaseModel):
     """Response payload for the FAQ endpoint."""
 
@@ -41,9 +168,41 @@ class PromoResponse(BaseModel):
     """Response payload for promo suggestion endpoint."""
 
     suggestion: str
+    promo_id: Optional[str] = None
 
 
 class ChatResponse(BaseModel):
     """Response payload for the chat endpoint."""
 
     reply: str
+
+
+class IntentResponse(BaseModel):
+    """Local intent prediction for one message."""
+
+    intent: str = Field(..., description="order, faq, promo or smalltalk")
+    confidence: float = Field(..., ge=0.0, le=1.0)
+    confident: bool = Field(..., description="confidence >= INTENT_MIN_CONFIDENCE")
+    scores: Dict[str, float] = Field(default_factory=dict)
+
+
+class ProcessMessageResponse(BaseModel):
+    """Combined result of the /process_message pipeline for one message."""
+
+    reply_type: str = Field(..., description="order, faq, promo, chat or fallback")
+    reply: str = Field(..., description="Text ready to send back to the customer")
+    items: List[OrderItem] = Field(default_factory=list)
+    confidence: float = Field(0.0, ge=0.0, le=1.0)
+    invoice: Optional[InvoiceResponse] = None
+    promo: Optional[PromoResponse] = None
+    session_op: Optional[str] = Field(
+        default=None, description="Cart delta applied when a jid was given"
+    )
+    intent: Optional[str] = Field(
+        default=None, description="Local intent label when the message was not a parsed order"
+    )
+    intent_confidence: Optional[float] = None
+    timings_ms: Dict[str, float] = Field(default_factory=dict)
+    timed_out: List[str] = Field(
+        default_factory=list, description="Stages cut off by the request deadline"
+    )
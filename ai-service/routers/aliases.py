@@ -0,0 +1,81 @@
+"""Review and prune the aliases learned from LLM order resolutions."""
+
+from __future__ import annotations
+
+from dataclasses import asdict
+from typing import List, Optional
+
+from fastapi import APIRouter
+from pydantic import BaseModel, Field
+
+from models.response_model import (
+    AliasPinResponse,
+    AliasPruneResponse,
+    LearnedAliasListResponse,
+    LearnedAliasResponse,
+)
+from utils.alias_store import LearnedAlias, get_alias_store
+
+router = APIRouter(tags=["aliases"])
+
+
+class AliasPinRequest(BaseModel):
+    phrase: str = Field(..., min_length=1, description="Frasa seperti yang ditulis pelanggan")
+    slug: str = Field(..., min_length=1, description="Slug menu tujuan")
+
+
+class AliasPruneRequest(BaseModel):
+    phrases: List[str] = Field(default_factory=list, description="Hapus frasa ini")
+    max_hits: Optional[int] = Field(
+        default=None, ge=0, description="Hapus alias yang dipakai paling banyak segini"
+    )
+    idle_days: Optional[float] = Field(
+        default=None, gt=0, description="Hapus alias yang tidak dipakai selama ini"
+    )
+    below_confidence: Optional[float] = Field(default=None, ge=0, le=1)
+    off_menu: bool = Field(default=True, description="Hapus alias ke menu yang sudah tidak ada")
+
+
+def _alias_response(alias: LearnedAlias) -> LearnedAliasResponse:
+    return LearnedAliasResponse.model_construct(usable=alias.usable, **asdict(alias))
+
+
+@router.get("/aliases/learned", response_model=LearnedAliasListResponse)
+async def list_learned_aliases(
+    min_hits: int = 0, limit: int = 500
+) -> LearnedAliasListResponse:
+    """Learned aliases, most used first."""
+
+    store = get_alias_store()
+    entries = [alias for alias in store.entries() if alias.hits >= min_hits]
+    return LearnedAliasListResponse.model_construct(
+        items=[_alias_response(alias) for alias in entries[: max(limit, 0)]],
+        stats=store.stats(),
+    )
+
+
+@router.put("/aliases/learned", response_model=AliasPinResponse)
+async def pin_learned_alias(payload: AliasPinRequest) -> AliasPinResponse:
+    """Confirm or correct an alias by hand; the LLM can no longer change it."""
+
+    alias = get_alias_store().set(payload.phrase, payload.slug)
+    if alias is None:
+        return AliasPinResponse.model_construct(
+            ok=False, alias=None, error="phrase and slug need letters or digits"
+        )
+    return AliasPinResponse.model_construct(ok=True, alias=_alias_response(alias), error=None)
+
+
+@router.post("/aliases/learned/prune", response_model=AliasPruneResponse)
+async def prune_learned_aliases(payload: AliasPruneRequest) -> AliasPruneResponse:
+    """Remove listed phrases, then learned aliases matching any criterion."""
+
+    store = get_alias_store()
+    removed = store.remove(payload.phrases)
+    removed += store.prune(
+        max_hits=payload.max_hits,
+        idle_days=payload.idle_days,
+        below_confidence=payload.below_confidence,
+        off_menu=payload.off_menu,
+    )
+    return AliasPruneResponse.model_construct(ok=True, removed=removed, remaining=len(store))
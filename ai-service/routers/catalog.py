@@ -0,0 +1,41 @@
+"""Catalog ingest: apply a menu sheet export without restarting the service."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Union
+
+from fastapi import APIRouter
+from pydantic import BaseModel, Field
+
+from models.response_model import CatalogSyncResponse
+from utils.catalog import get_snapshot
+from utils.catalog_sync import sync_file, sync_rows
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["catalog"])
+
+
+class CatalogSyncRequest(BaseModel):
+    rows: Optional[List[Union[List[Any], Dict[str, Any]]]] = Field(
+        default=None,
+        description="Baris sheet [item, harga, stok]; kosong = baca CATALOG_SYNC_SOURCE",
+    )
+
+
+@router.post("/catalog/sync", response_model=CatalogSyncResponse)
+async def sync_catalog(payload: CatalogSyncRequest) -> CatalogSyncResponse:
+    """Diff a full sheet export against the catalog and apply only the changes."""
+
+    try:
+        if payload.rows is None:
+            result = await asyncio.to_thread(sync_file)
+        else:
+            result = await asyncio.to_thread(sync_rows, payload.rows)
+    except (OSError, ValueError) as exc:
+        logger.warning("Catalog sync failed: %s", exc)
+        return CatalogSyncResponse(ok=False, version=get_snapshot().version, error=str(exc))
+    return CatalogSyncResponse(**asdict(result))
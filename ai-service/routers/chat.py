@@ -1,17 +1,78 @@
-from fastapi import APIRouter
+import json
+from contextlib import aclosing
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from utils.llm_client import ask_llm
+from utils.admission import admit
+from utils.faq_engine import current_faq_engine
+from utils.llm_client import stream_llm
 
 router = APIRouter()
 
+FALLBACK_REPLY = "ga tau bro 😭"
+BUSY_REPLY = "lagi rame banget nih bro, coba chat lagi bentar ya 🙏"
+
 
 class ChatRequest(BaseModel):
     text: str
+    jid: Optional[str] = None
+
+
+def _chat_prompt(text: str) -> str:
+    return f"lu jawab santai, pendek, indo-english, jaksel vibes. Pertanyaan: {text}"
+
+
+async def _reply_chunks(
+    text: str, jid: Optional[str] = None, timeout: Optional[float] = None
+) -> AsyncIterator[str]:
+    # single source of truth for both the streaming and the plain endpoint
+    async with admit("chat", jid, timeout) as admitted:
+        if not admitted:
+            # shed under load: a FAQ answer beats making the customer wait
+            yield current_faq_engine().lookup(text) or BUSY_REPLY
+            return
+        # closes the LLM stream (and frees its slot) before the admission slot
+        async with aclosing(stream_llm(_chat_prompt(text))) as stream:
+            async for chunk in stream:
+                yield chunk
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream(req: ChatRequest, request: Request):
+    """Relay the reply as Server-Sent Events: ``delta`` chunks, then ``done``."""
+
+    async def events() -> AsyncIterator[str]:
+        chunks = _reply_chunks(req.text, req.jid)
+        sent = False
+        try:
+            async for chunk in chunks:
+                if await request.is_disconnected():
+                    return
+                sent = True
+                yield _sse("delta", {"text": chunk})
+            if not sent:
+                yield _sse("delta", {"text": FALLBACK_REPLY})
+            yield _sse("done", {})
+        finally:
+            # stop generation (and free the LLM slot) as soon as we bail out
+            await chunks.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/chat")
 async def chat(req: ChatRequest):
-    resp = await ask_llm(f"lu jawab santai, pendek, indo-english, jaksel vibes. Pertanyaan: {req.text}")
+    resp = "".join([chunk async for chunk in _reply_chunks(req.text, req.jid)]).strip()
     if not resp:
-        resp = "ga tau bro 😭"
+        resp = FALLBACK_REPLY
     return {"reply": resp}
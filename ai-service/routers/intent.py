@@ -0,0 +1,28 @@
+"""Intent endpoint backed by the local classifier."""
+
+from __future__ import annotations
+
+from fastapi import APIRouter
+from pydantic import BaseModel, Field
+
+from models.response_model import IntentResponse
+from utils.intent import classify
+
+router = APIRouter(tags=["intent"])
+
+
+class IntentRequest(BaseModel):
+    text: str = Field(..., description="Pesan mentah dari pelanggan")
+
+
+@router.post("/intent", response_model=IntentResponse)
+async def predict_intent(payload: IntentRequest) -> IntentResponse:
+    """Classify a message as order, faq, promo or smalltalk without the LLM."""
+
+    result = classify(payload.text)
+    return IntentResponse(
+        intent=result.label,
+        confidence=result.confidence,
+        confident=result.confident,
+        scores=result.scores,
+    )
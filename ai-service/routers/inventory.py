@@ -0,0 +1,119 @@
+"""Stock levels and reservations backed by the in-memory inventory engine."""
+
+from __future__ import annotations
+
+from typing import List, Optional, Union
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+from models.order_model import OrderItem
+from models.response_model import (
+    InventoryResponse,
+    ReservationResponse,
+    StockLevelResponse,
+    StockShortage,
+)
+from utils.inventory import InventoryNotOwner, Reservation, get_inventory
+from utils.menu_index import normalize_slug
+from utils.session_store import get_session_store
+
+router = APIRouter(tags=["inventory"])
+
+
+class ReserveRequest(BaseModel):
+    items: List[OrderItem] = Field(default_factory=list)
+    jid: Optional[str] = Field(
+        default=None, description="Pakai keranjang sesi pelanggan ini jika items kosong"
+    )
+    ttl: Optional[float] = Field(
+        default=None, gt=0, le=86400, description="Lama stok ditahan dalam detik"
+    )
+
+
+def _reservation_response(reservation: Optional[Reservation]) -> ReservationResponse:
+    if reservation is None:
+        return ReservationResponse.model_construct(
+            ok=False, reservation_id=None, items=[], expires_at=None, shortages=[], error=None
+        )
+    return ReservationResponse.model_construct(
+        ok=True,
+        reservation_id=reservation.id,
+        items=[OrderItem.model_construct(item=slug, qty=qty) for slug, qty in reservation.lines],
+        expires_at=reservation.expires_at,
+        shortages=[],
+        error=None,
+    )
+
+
+def _not_owner(exc: InventoryNotOwner) -> JSONResponse:
+    # 503: this worker cannot hold stock; the client may retry another one
+    body = ReservationResponse(ok=False, error=str(exc))
+    return JSONResponse(body.model_dump(mode="json"), status_code=503)
+
+
+@router.get("/inventory", response_model=InventoryResponse)
+async def list_inventory() -> InventoryResponse:
+    """Current on-hand, reserved and available stock per item."""
+
+    engine = get_inventory()
+    return InventoryResponse.model_construct(
+        items=[
+            StockLevelResponse.model_construct(
+                item=slug, on_hand=on_hand, reserved=reserved, available=available
+            )
+            for slug, (on_hand, reserved, available) in sorted(engine.levels().items())
+        ],
+        stats=engine.stats(),
+    )
+
+
+@router.post("/inventory/reserve", response_model=ReservationResponse)
+async def reserve_stock(payload: ReserveRequest) -> Union[ReservationResponse, JSONResponse]:
+    """Hold stock for a whole order, all lines or none."""
+
+    items = payload.items
+    if not items and payload.jid:
+        items = get_session_store().get(payload.jid).items()
+    try:
+        reservation, shortages = get_inventory().reserve(
+            [(normalize_slug(entry.item), entry.qty) for entry in items],
+            jid=payload.jid,
+            ttl=payload.ttl,
+        )
+    except InventoryNotOwner as exc:
+        return _not_owner(exc)
+    if reservation is not None:
+        return _reservation_response(reservation)
+    return ReservationResponse.model_construct(
+        ok=False,
+        reservation_id=None,
+        items=[],
+        expires_at=None,
+        shortages=[
+            StockShortage.model_construct(item=slug, requested=requested, available=available)
+            for slug, requested, available in shortages
+        ],
+        error=None,
+    )
+
+
+@router.post("/inventory/reservations/{reservation_id}/commit", response_model=ReservationResponse)
+async def commit_reservation(reservation_id: str) -> Union[ReservationResponse, JSONResponse]:
+    """Confirm a hold (e.g. after payment); ``ok`` is false if it already lapsed."""
+
+    try:
+        return _reservation_response(get_inventory().commit(reservation_id))
+    except InventoryNotOwner as exc:
+        return _not_owner(exc)
+
+
+@router.post("/inventory/reservations/{reservation_id}/release", response_model=ReservationResponse)
+async def release_reservation(reservation_id: str) -> Union[ReservationResponse, JSONResponse]:
+    """Give a hold back, e.g. when the customer cancels."""
+
+    try:
+        return _reservation_response(get_inventory().release(reservation_id))
+    except InventoryNotOwner as exc:
+        return _not_owner(exc)
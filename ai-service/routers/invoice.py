@@ -2,29 +2,46 @@
 
 from __future__ import annotations
 
-import re
-from typing import Dict, List
+from typing import List, Optional
 
 from fastapi import APIRouter
 from pydantic import BaseModel, Field
 
-from models.order_model import OrderItem
-from models.response_model import InvoiceItemResponse, InvoiceResponse
-from utils.price_calc import calculate_total, format_rupiah
+from models.order_model import MenuPrices, OrderItem
+from models.response_model import (
+    InvoiceBatchResponse,
+    InvoiceCartTotal,
+    InvoiceItemResponse,
+    InvoiceResponse,
+)
+from utils.price_calc import (
+    calculate_total,
+    calculate_totals_bulk,
+    compile_price_table,
+    format_rupiah,
+)
+from utils.session_store import get_session_store
 
 router = APIRouter(tags=["invoice"])
 
 
 class InvoiceRequest(BaseModel):
     items: List[OrderItem] = Field(default_factory=list)
-    menu: Dict[str, int] = Field(
+    menu: MenuPrices = Field(
         default_factory=dict, description="Mapping dari nama menu ke harga"
     )
+    jid: Optional[str] = Field(
+        default=None, description="Pakai keranjang sesi pelanggan ini jika items kosong"
+    )
 
 
-def _slugify(text: str) -> str:
-    slug = re.sub(r"[^a-z0-9\s]", "", text.lower())
-    return re.sub(r"\s+", "_", slug).strip("_")
+class InvoiceBatchRequest(BaseModel):
+    carts: List[List[OrderItem]] = Field(
+        default_factory=list, description="Daftar keranjang, masing-masing list item"
+    )
+    menu: MenuPrices = Field(
+        default_factory=dict, description="Mapping dari nama menu ke harga"
+    )
 
 
 def _prettify_item(slug_name: str) -> str:
@@ -47,8 +64,32 @@ def _format_invoice(lines: List[dict], total: int) -> str:
 async def generate_invoice(payload: InvoiceRequest) -> InvoiceResponse:
     """Generate a WhatsApp-friendly invoice."""
 
-    normalized_menu = {_slugify(name): price for name, price in payload.menu.items()}
-    lines, total = calculate_total(payload.items, normalized_menu)
+    table = compile_price_table(payload.menu)
+    items = payload.items
+    if not items and payload.jid:
+        items = get_session_store().get(payload.jid).items()
+    lines, total = calculate_total(items, table=table)
     formatted = _format_invoice(lines, total)
-    response_items = [InvoiceItemResponse(**line) for line in lines]
-    return InvoiceResponse(items=response_items, total=total, formatted=formatted)
+    # lines are built from validated items, no need to validate them again
+    response_items = [InvoiceItemResponse.model_construct(**line) for line in lines]
+    return InvoiceResponse.model_construct(items=response_items, total=total, formatted=formatted)
+
+
+@router.post("/invoice/batch", response_model=InvoiceBatchResponse)
+async def generate_invoice_batch(payload: InvoiceBatchRequest) -> InvoiceBatchResponse:
+    """Total many carts against one price table for end-of-day settlement."""
+
+    import numpy as np
+
+    bulk = calculate_totals_bulk(payload.carts, compile_price_table(payload.menu))
+    rows = np.column_stack(
+        (bulk.item_ids, bulk.qty, bulk.unit_price, bulk.subtotal)
+    ).tolist()
+    offsets = bulk.offsets.tolist()
+    carts = [
+        InvoiceCartTotal.model_construct(lines=rows[start:end], total=total)
+        for start, end, total in zip(offsets, offsets[1:], bulk.totals.tolist())
+    ]
+    return InvoiceBatchResponse.model_construct(
+        items=list(bulk.slugs), carts=carts, grand_total=int(bulk.totals.sum())
+    )
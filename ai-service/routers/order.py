@@ -2,39 +2,32 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
+import os
 import re
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from fastapi import APIRouter
-from thefuzz import process
 
-from models.order_model import OrderItem, OrderRequest
-from models.response_model import ParseOrderResponse
+from models.order_model import OrderBatchRequest, OrderItem, OrderRequest
+from models.response_model import ParseOrderBatchResponse, ParseOrderResponse
+from utils.admission import admit
+from utils.alias_store import (
+    LEARNED_ALIAS_CONFIDENCE,
+    UNCONFIRMED_CONFIDENCE,
+    AliasStore,
+    get_alias_store,
+)
+from utils.catalog import CatalogSnapshot, get_snapshot
 from utils.llm_client import ask_llm
+from utils.menu_index import MIN_MATCH_SCORE, normalize_slug
+from utils.metrics import ORDER_PARSE, count, span, timed
+from utils.micro_batch import MicroBatcher
+from utils.order_tokenizer import extract_candidates, extract_loose, extract_trailing
 
 router = APIRouter(tags=["order"])
 
-# -------------------------------
-# RULES / DICTIONARIES
-# -------------------------------
-STOP_WORDS = {"dan", "sama", "dong", "ya", "tolong", "pesan", "minta", "please"}
-
-MENU_CATALOG = [
-    "indomie",
-    "indomie goreng",
-    "nasi goreng",
-    "ayam geprek",
-    "es teh manis",
-    "es teh tawar",
-    "teh tawar",
-    "kopi susu",
-    "kopi hitam",
-    "jus jeruk",
-    "air mineral",
-]
-
-
 # -------------------------------
 # HELPERS
 # -------------------------------
@@ -43,58 +36,44 @@ def _slugify(text: str) -> str:
     return re.sub(r"\s+", "_", slug).strip("_")
 
 
+@timed("extract_candidates")
 def _extract_candidates(raw_text: str) -> List[Tuple[int, str]]:
     """
-    Extract local order pairs like "2 indomie", "3 ayam geprek".
+    Extract local order pairs like "2 indomie", "dua puluh es teh",
+    "3 porsi ayam geprek" or "segelas kopi susu".
     """
-    tokens = re.findall(r"\d+|[a-zA-Z]+", raw_text.lower())
-
-    candidates = []
-    qty = None
-    buffer = []
-
-    def flush():
-        nonlocal qty, buffer
-        if qty and buffer:
-            candidates.append((qty, " ".join(buffer)))
-        qty = None
-        buffer = []
-
-    for token in tokens:
-        if token.isdigit():
-            flush()
-            qty = int(token)
-            continue
-
-        if qty is None or token in STOP_WORDS:
-            continue
-
-        buffer.append(token)
-
-    flush()
-    return candidates
+    return extract_candidates(raw_text)
 
 
+@timed("match_menu_name")
 def _match_menu_name(candidate: str) -> Tuple[str, float]:
-    """Fuzzy match menu name against catalog."""
+    """Learned alias first, then fuzzy match menu name against catalog."""
     if not candidate:
         return "", 0.0
 
-    match = process.extractOne(candidate, MENU_CATALOG)
+    snapshot = get_snapshot()
+    learned = get_alias_store().lookup(candidate, snapshot)
+    if learned is not None:
+        return learned
+    return _resolve_match(candidate, *snapshot.menu_index.match(candidate))
+
 
-    if match and match[1] >= 55:
-        return _slugify(match[0]), match[1] / 100
+def _resolve_match(candidate: str, slug: str, score: int) -> Tuple[str, float]:
+    if slug and score >= MIN_MATCH_SCORE:
+        return slug, score / 100
 
     # fallback: use raw slug
     return _slugify(candidate), 0.40
 
 
-def _parse_locally(text: str) -> Tuple[List[OrderItem], float]:
+def _build_items(
+    candidates: List[Tuple[int, str]], matches: Dict[str, Tuple[str, float]]
+) -> Tuple[List[OrderItem], float]:
     parsed_items = []
     scores = []
 
-    for qty, candidate in _extract_candidates(text):
-        slug, score = _match_menu_name(candidate)
+    for qty, candidate in candidates:
+        slug, score = matches[candidate]
         if slug:
             parsed_items.append(OrderItem(item=slug, qty=max(1, qty)))
             scores.append(score)
@@ -103,6 +82,95 @@ def _parse_locally(text: str) -> Tuple[List[OrderItem], float]:
     return parsed_items, confidence
 
 
+def _learned_candidates(
+    text: str, store: AliasStore, snapshot: CatalogSnapshot
+) -> List[Tuple[int, str]]:
+    """Item-then-quantity pairs ("indomi grg 2"), if every phrase was learned.
+
+    Without a leading quantity only exact learned phrases are trusted; a
+    fuzzy guess here would read "buka jam 8" as an order.
+    """
+
+    pairs = extract_trailing(text)
+    if pairs and all(store.peek(phrase, snapshot) for _, phrase in pairs):
+        return pairs
+    return []
+
+
+def _parse_locally(text: str) -> Tuple[List[OrderItem], float]:
+    candidates = _extract_candidates(text) or _learned_candidates(
+        text, get_alias_store(), get_snapshot()
+    )
+    matches = {candidate: _match_menu_name(candidate) for _, candidate in candidates}
+    return _build_items(candidates, matches)
+
+
+def _parse_degraded(text: str) -> Tuple[List[OrderItem], float]:
+    """Best local guess when the LLM fallback is shed: the message as one item.
+
+    Unlike :func:`_parse_locally` there is no raw-slug fallback; a phrase
+    that does not match the menu yields nothing.
+    """
+
+    loose = extract_loose(text)
+    if loose is None:
+        return [], 0.0
+    qty, phrase = loose
+    slug, score = _match_menu_name(phrase)
+    if not slug or score < MIN_MATCH_SCORE / 100:
+        return [], 0.0
+    return [OrderItem(item=slug, qty=qty)], min(score, 0.5)
+
+
+def _parse_many_locally(texts: List[str]) -> List[Tuple[List[OrderItem], float]]:
+    """Batch variant of :func:`_parse_locally` sharing one scoring matrix."""
+
+    store, snapshot = get_alias_store(), get_snapshot()
+    extracted = [
+        _extract_candidates(text) or _learned_candidates(text, store, snapshot)
+        for text in texts
+    ]
+    phrases = list({candidate for pairs in extracted for _, candidate in pairs})
+    matches: Dict[str, Tuple[str, float]] = {}
+    for phrase in phrases:
+        learned = store.lookup(phrase, snapshot)
+        if learned is not None:
+            matches[phrase] = learned
+    unmatched = [phrase for phrase in phrases if phrase not in matches]
+    with span("match_menu_many"):
+        scored = snapshot.menu_index.match_many(unmatched)
+    for phrase, (slug, score) in zip(unmatched, scored):
+        matches[phrase] = _resolve_match(phrase, slug, score)
+    return [_build_items(pairs, matches) for pairs in extracted]
+
+
+def _learn_aliases(text: str, items: List[OrderItem]) -> None:
+    """Remember which phrase of ``text`` the LLM resolved to which item.
+
+    Phrases are paired with items by position and must agree on a quantity
+    that no other item shares. An LLM answer that contradicts an exact menu
+    name is not learned. A phrase that looks nothing like the item ("kayak
+    biasa") is only used once a second LLM answer agrees.
+    """
+
+    pairs = extract_trailing(text)
+    if not items or len(pairs) != len(items):
+        return
+    from rapidfuzz import fuzz
+
+    store, snapshot = get_alias_store(), get_snapshot()
+    qtys = [entry.qty for entry in items]
+    for (qty, phrase), entry in zip(pairs, items):
+        if qty != entry.qty or qtys.count(qty) > 1:
+            continue
+        slug, score = snapshot.menu_index.match(phrase)
+        if score >= 100 and slug != entry.item:
+            continue
+        similar = fuzz.WRatio(phrase, entry.item.replace("_", " ")) >= MIN_MATCH_SCORE
+        confidence = LEARNED_ALIAS_CONFIDENCE if similar else UNCONFIRMED_CONFIDENCE
+        store.learn(phrase, entry.item, snapshot, confidence)
+
+
 # -------------------------------
 # 100% SAFE JSON EXTRACTOR
 # -------------------------------
@@ -114,29 +182,71 @@ def _extract_json(text: str):
     if not text:
         return []
 
-    # ambil substring {...} pertama
-    match = re.search(r"\{[\s\S]*\}", text)
-    if not match:
-        return []
+    # ambil blok [...] atau {...} terluar yang pertama
+    for pattern in (r"\[[\s\S]*\]", r"\{[\s\S]*\}"):
+        match = re.search(pattern, text)
+        if not match:
+            continue
 
-    try:
-        block = match.group(0)
-        data = json.loads(block)
+        try:
+            block = match.group(0)
+            data = json.loads(block)
+        except Exception:
+            continue
 
         # pastikan sesuai format list
         if isinstance(data, dict) and "items" in data:
-            return data.get("items", [])
+            items = data.get("items", [])
+            return items if isinstance(items, list) else []
         if isinstance(data, list):
             return data
-        return []
+    return []
+
+
+def _extract_batch_json(text: str) -> Dict[int, str]:
+    """Split a batched reply into one JSON block per request id."""
+    if not text:
+        return {}
+
+    match = re.search(r"\{[\s\S]*\}", text)
+    if not match:
+        return {}
+
+    try:
+        data = json.loads(match.group(0))
+        results = data.get("results", []) if isinstance(data, dict) else []
     except Exception:
-        return []
+        return {}
+
+    blocks = {}
+    for entry in results if isinstance(results, list) else []:
+        try:
+            blocks[int(entry["id"])] = json.dumps(entry)
+        except Exception:
+            continue
+    return blocks
 
 
 # -------------------------------
 # CALL GEMINI (WITH SAFETY)
 # -------------------------------
-async def _parse_with_llm(text: str) -> List[OrderItem]:
+def _coerce_items(raw_items) -> List[OrderItem]:
+    items = []
+    for entry in raw_items:
+        try:
+            # normalize_slug keeps the underscores the prompt asks for
+            item = normalize_slug(str(entry.get("item", "")))
+            qty = int(entry.get("qty", 0))
+        except Exception:
+            continue
+
+        if item and qty > 0:
+            items.append(OrderItem(item=item, qty=qty))
+
+    return items
+
+
+async def _parse_one_with_llm(text: str) -> List[OrderItem]:
     prompt = (
         "Extract order items ONLY as JSON like: "
         '[{"item":"indomie","qty":2},{"item":"es_teh","qty":3}]. '
@@ -149,19 +259,77 @@ async def _parse_with_llm(text: str) -> List[OrderItem]:
     if not response:
         return []
 
-    raw_items = _extract_json(response)
+    return _coerce_items(_extract_json(response))
 
-    items = []
-    for entry in raw_items:
-        item = _slugify(str(entry.get("item", "")))
-        qty = int(entry.get("qty", 0))
 
-        if item and qty > 0:
-            items.append(OrderItem(item=item, qty=qty))
+async def _parse_batch_with_llm(texts: List[str]) -> List[List[OrderItem]]:
+    """Resolve several fallback texts with one Gemini call."""
+    unique = list(dict.fromkeys(texts))
+    if len(unique) == 1:
+        items = await _parse_one_with_llm(unique[0])
+        return [items for _ in texts]
+
+    prompt = (
+        "Extract order items for EACH text in the JSON array below. "
+        "Reply ONLY with JSON like: "
+        '{"results":[{"id":0,"items":[{"item":"indomie","qty":2}]},'
+        '{"id":1,"items":[]}]} '
+        "with one result per text, id = position in the array. "
+        "Slug all names. No words outside JSON.\n"
+        f"Texts: {json.dumps(unique, ensure_ascii=False)}"
+    )
+
+    response = await ask_llm(prompt, json_mode=True)
+    blocks = _extract_batch_json(response or "")
+
+    # each result is validated on its own so one bad entry only empties itself
+    parsed = {
+        text: _coerce_items(_extract_json(blocks.get(idx, "")))
+        for idx, text in enumerate(unique)
+    }
+    return [parsed[text] for text in texts]
+
+
+# Fallback texts arriving within the window share a single Gemini request.
+LLM_BATCHER: MicroBatcher[str, List[OrderItem]] = MicroBatcher(
+    _parse_batch_with_llm,
+    window=float(os.getenv("LLM_BATCH_WINDOW", "0.03")),
+    max_batch=int(os.getenv("LLM_BATCH_SIZE", "16")),
+)
+# /parse_order/batch: chunks of LLM_BATCH_SIZE texts in flight at once
+LLM_BATCH_CONCURRENCY = int(os.getenv("LLM_BATCH_CONCURRENCY", "4"))
+
+
+async def _resolve_with_llm(text: str) -> List[OrderItem]:
+    """One text through the shared batcher, learning aliases from the answer.
 
+    Learning runs here, in the caller's context, because a batch can mix
+    texts of several tenants and each answer is checked against its own menu.
+    """
+
+    items = await LLM_BATCHER.submit(text)
+    _learn_aliases(text, items)
     return items
 
 
+async def _parse_with_llm(
+    text: str, jid: Optional[str] = None, timeout: Optional[float] = None
+) -> Optional[List[OrderItem]]:
+    """LLM fallback behind admission control; None if the request was shed."""
+
+    async with admit("order", jid, timeout) as admitted:
+        if not admitted:
+            return None
+        return await _resolve_with_llm(text)
+
+
+def _build_response(items: List[OrderItem], confidence: float) -> ParseOrderResponse:
+    return ParseOrderResponse(
+        items=items,
+        confidence=round(max(min(confidence, 1.0), 0.0), 2),
+    )
+
+
 # -------------------------------
 # MAIN ENDPOINT
 # -------------------------------
@@ -175,12 +343,77 @@ async def parse_order(request: OrderRequest) -> ParseOrderResponse:
 
     # Step 2: fallback LLM only if no local match
     if not items:
-        llm_items = await _parse_with_llm(request.text)
-        if llm_items:
+        llm_items = await _parse_with_llm(request.text, request.jid)
+        if llm_items is None:
+            # shed under load: answer with the looser local guess instead
+            items, confidence = _parse_degraded(request.text)
+            count(ORDER_PARSE, "shed")
+        elif llm_items:
             items = llm_items
             confidence = 0.9  # LLM baseline confidence
+            count(ORDER_PARSE, "llm")
+        else:
+            count(ORDER_PARSE, "none")
+    else:
+        count(ORDER_PARSE, "local")
 
-    return ParseOrderResponse(
-        items=items,
-        confidence=round(max(min(confidence, 1.0), 0.0), 2),
+    return _build_response(items, confidence)
+
+
+async def _resolve_chunk(
+    texts: List[str], slots: asyncio.Semaphore
+) -> List[Optional[List[OrderItem]]]:
+    """One Gemini call's worth of batch texts behind its own admission slot.
+
+    Returns one None per text if the chunk was shed.
+    """
+
+    async with slots, admit("order") as admitted:
+        if not admitted:
+            return [None] * len(texts)
+        return await asyncio.gather(*(_resolve_with_llm(text) for text in texts))
+
+
+@router.post("/parse_order/batch", response_model=ParseOrderBatchResponse)
+async def parse_order_batch(request: OrderBatchRequest) -> ParseOrderBatchResponse:
+    """Parse many texts at once; results match /parse_order item for item."""
+
+    parsed = _parse_many_locally(request.texts)
+    results: List[Tuple[List[OrderItem], float]] = []
+    for items, confidence in parsed:
+        if items and confidence < 0.4:
+            confidence = 0.4
+        results.append((items, confidence))
+
+    # Only texts the local parser could not resolve pay for the LLM.
+    unresolved = list(
+        dict.fromkeys(text for text, (items, _) in zip(request.texts, results) if not items)
+    )
+    if unresolved:
+        size = LLM_BATCHER.max_batch
+        slots = asyncio.Semaphore(LLM_BATCH_CONCURRENCY)
+        chunks = await asyncio.gather(
+            *(
+                _resolve_chunk(unresolved[start : start + size], slots)
+                for start in range(0, len(unresolved), size)
+            )
+        )
+        resolved = dict(zip(unresolved, (items for chunk in chunks for items in chunk)))
+        for pos, text in enumerate(request.texts):
+            if text not in resolved or results[pos][0]:
+                count(ORDER_PARSE, "local")
+                continue
+            llm_items = resolved[text]
+            if llm_items is None:
+                results[pos] = _parse_degraded(text)
+                count(ORDER_PARSE, "shed")
+            else:
+                results[pos] = (llm_items, 0.9) if llm_items else results[pos]
+                count(ORDER_PARSE, "llm" if llm_items else "none")
+    else:
+        for _ in results:
+            count(ORDER_PARSE, "local")
+
+    return ParseOrderBatchResponse(
+        results=[_build_response(items, confidence) for items, confidence in results]
     )
@@ -0,0 +1,253 @@
+"""One round-trip per customer message: parse, invoice, promo, FAQ and chat."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter
+from pydantic import BaseModel, Field
+
+from models.order_model import MenuPrices, OrderItem
+from models.response_model import (
+    InvoiceItemResponse,
+    InvoiceResponse,
+    ProcessMessageResponse,
+    PromoResponse,
+)
+from routers.chat import FALLBACK_REPLY, _reply_chunks
+from routers.invoice import _format_invoice
+from routers.order import _parse_degraded, _parse_locally, _parse_with_llm
+from routers.session import _parse_delta
+from utils.catalog import get_snapshot
+from utils.faq_engine import DEFAULT_FAQ_ANSWER, current_faq_engine
+from utils.intent import classify
+from utils.price_calc import calculate_total, compile_price_table
+from utils.promo_engine import current_promo_engine
+from utils.session_store import OP_ADD, get_session_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["pipeline"])
+
+PIPELINE_DEADLINE = float(os.getenv("PIPELINE_DEADLINE", "8"))
+# weaker local parses are checked against the intent classifier
+PIPELINE_LOCAL_MIN_CONFIDENCE = float(os.getenv("PIPELINE_LOCAL_MIN_CONFIDENCE", "0.75"))
+
+
+class ProcessMessageRequest(BaseModel):
+    text: str = Field(..., description="Pesan mentah dari pelanggan")
+    jid: Optional[str] = Field(
+        default=None, description="Jika diisi, pesanan diterapkan ke keranjang sesi pelanggan"
+    )
+    branch: Optional[str] = Field(default=None, description="Cabang untuk promo khusus")
+    menu: MenuPrices = Field(
+        default_factory=dict, description="Mapping dari nama menu ke harga"
+    )
+    llm: bool = Field(default=True, description="Izinkan tahap LLM (fallback order & chat)")
+    deadline: Optional[float] = Field(
+        default=None, gt=0, le=60, description="Batas waktu total dalam detik"
+    )
+
+
+async def _chat_reply(text: str, jid: Optional[str], timeout: float) -> str:
+    chunks = _reply_chunks(text, jid, timeout)
+    try:
+        return "".join([chunk async for chunk in chunks]).strip()
+    finally:
+        # frees the admission slot right away if the deadline cut us off
+        await chunks.aclose()
+
+
+async def _bounded(name: str, stage: Awaitable, timeout: float, timed_out: List[str]) -> Any:
+    try:
+        return await asyncio.wait_for(stage, timeout=max(timeout, 0.0))
+    except asyncio.TimeoutError:
+        timed_out.append(name)
+    except Exception:
+        logger.exception("Pipeline stage %s failed", name)
+    return None
+
+
+async def _gather_within(
+    stages: Dict[str, Awaitable], timeout: float
+) -> Tuple[Dict[str, Any], List[str]]:
+    """Run ``stages`` concurrently; stages past the deadline yield None."""
+
+    timed_out: List[str] = []
+    if not stages:
+        return {}, timed_out
+    results = await asyncio.gather(
+        *(_bounded(name, stage, timeout, timed_out) for name, stage in stages.items())
+    )
+    return dict(zip(stages, results)), timed_out
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+@router.post("/process_message", response_model=ProcessMessageResponse)
+async def process_message(payload: ProcessMessageRequest) -> ProcessMessageResponse:
+    """Handle one customer message in a single request.
+
+    Local stages (parsing, cart delta, intent, FAQ, invoice, promo) run
+    in-process on the same objects. When the local parser finds no order on
+    the menu, or only one scoring below ``PIPELINE_LOCAL_MIN_CONFIDENCE``,
+    the intent classifier routes the message; a weak parse is dropped when
+    the classifier confidently says it is not an order. A confident faq or promo label
+    is answered locally. A confident order label only runs the LLM order
+    fallback, and smalltalk only runs chat. Below ``INTENT_MIN_CONFIDENCE``
+    the FAQ is tried first, and then the top label still picks the single
+    LLM stage: the order fallback for order, chat for anything else. That
+    stage runs within the request deadline and passes admission control; a
+    shed order falls back to a looser local parse, and a shed chat to the
+    FAQ or a busy reply.
+    """
+
+    loop = asyncio.get_running_loop()
+    expires = loop.time() + (payload.deadline or PIPELINE_DEADLINE)
+    timings: Dict[str, float] = {}
+    text = payload.text
+
+    started = time.perf_counter()
+    items: List[OrderItem] = []
+    confidence = 0.0
+    op, deltas = None, []
+    if payload.jid:
+        op, deltas, confidence = _parse_delta(text)
+    else:
+        items, confidence = _parse_locally(text)
+        slug_ids = get_snapshot().slug_ids
+        items = [entry for entry in items if entry.item in slug_ids]
+        if items and confidence < 0.4:
+            confidence = 0.4
+    timings["parse"] = _elapsed_ms(started)
+
+    intent = None
+    parsed = bool(op or items)
+    if not parsed or confidence < PIPELINE_LOCAL_MIN_CONFIDENCE:
+        started = time.perf_counter()
+        intent = classify(text)
+        timings["intent"] = _elapsed_ms(started)
+        if parsed and intent.confident and intent.label != "order":
+            # "buka jam 8 ga" fuzzy-matches indomie_goreng x8; it is a question
+            items, op, deltas, confidence = [], None, [], 0.0
+            parsed = False
+    # a confident label picks exactly one branch; otherwise try them all
+    route = intent.label if intent is not None and intent.confident else None
+
+    if route == "promo":
+        started = time.perf_counter()
+        cart_items = get_session_store().get(payload.jid).items() if payload.jid else []
+        rule, suggestion = current_promo_engine().evaluate(cart_items, branch=payload.branch)
+        timings["promo"] = _elapsed_ms(started)
+        return ProcessMessageResponse.model_construct(
+            reply_type="promo",
+            reply=suggestion,
+            items=[],
+            confidence=0.0,
+            invoice=None,
+            promo=PromoResponse.model_construct(
+                suggestion=suggestion, promo_id=rule.id if rule else None
+            ),
+            session_op=None,
+            intent=intent.label,
+            intent_confidence=intent.confidence,
+            timings_ms=timings,
+            timed_out=[],
+        )
+
+    faq_answer = None
+    if not parsed and route in (None, "faq"):
+        started = time.perf_counter()
+        faq_answer = current_faq_engine().lookup(text)
+        if faq_answer is None and route == "faq":
+            faq_answer = DEFAULT_FAQ_ANSWER
+        timings["faq"] = _elapsed_ms(started)
+
+    results: Dict[str, Any] = {}
+    timed_out: List[str] = []
+    if not parsed and faq_answer is None and payload.llm:
+        stages: Dict[str, Awaitable] = {}
+        remaining = expires - loop.time()
+        # one LLM call per message; an unsure classifier still picks by its top label
+        if intent.label == "order":
+            stages["order_llm"] = _parse_with_llm(text, payload.jid, remaining)
+        else:
+            stages["chat"] = _chat_reply(text, payload.jid, remaining)
+        started = time.perf_counter()
+        results, timed_out = await _gather_within(stages, remaining)
+        timings["llm"] = _elapsed_ms(started)
+        llm_items = results.get("order_llm") or []
+        llm_confidence = 0.9
+        if "order_llm" in stages and results.get("order_llm") is None:
+            # shed, timed out or failed: settle for the looser local guess
+            llm_items, llm_confidence = _parse_degraded(text)
+        if llm_items:
+            confidence = llm_confidence
+            if payload.jid:
+                op, deltas = OP_ADD, [(entry.item, entry.qty) for entry in llm_items]
+            else:
+                items = llm_items
+
+    if payload.jid and op:
+        cart, _ = get_session_store().apply(payload.jid, op, deltas)
+        items = cart.items()
+
+    if items or op:
+        started = time.perf_counter()
+        table = compile_price_table(payload.menu)
+        lines, total = calculate_total(items, table=table)
+        formatted = _format_invoice(lines, total)
+        invoice = InvoiceResponse.model_construct(
+            items=[InvoiceItemResponse.model_construct(**line) for line in lines],
+            total=total,
+            formatted=formatted,
+        )
+        timings["invoice"] = _elapsed_ms(started)
+
+        started = time.perf_counter()
+        rule, suggestion = current_promo_engine().evaluate(items, branch=payload.branch)
+        promo = PromoResponse.model_construct(
+            suggestion=suggestion, promo_id=rule.id if rule else None
+        )
+        timings["promo"] = _elapsed_ms(started)
+
+        reply = f"{formatted}\n\n{suggestion}" if rule else formatted
+        return ProcessMessageResponse.model_construct(
+            reply_type="order",
+            reply=reply,
+            items=items,
+            confidence=round(min(confidence, 1.0), 2),
+            invoice=invoice,
+            promo=promo,
+            session_op=op,
+            intent=intent.label if intent else None,
+            intent_confidence=intent.confidence if intent else None,
+            timings_ms=timings,
+            timed_out=timed_out,
+        )
+
+    if faq_answer is not None:
+        reply_type, reply = "faq", faq_answer
+    elif results.get("chat"):
+        reply_type, reply = "chat", results["chat"]
+    else:
+        reply_type, reply = "fallback", FALLBACK_REPLY
+    return ProcessMessageResponse.model_construct(
+        reply_type=reply_type,
+        reply=reply,
+        items=[],
+        confidence=0.0,
+        invoice=None,
+        promo=None,
+        session_op=None,
+        intent=intent.label if intent else None,
+        intent_confidence=intent.confidence if intent else None,
+        timings_ms=timings,
+        timed_out=timed_out,
+    )
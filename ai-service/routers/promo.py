@@ -9,6 +9,8 @@ from pydantic import BaseModel, Field
 
 from models.order_model import OrderItem
 from models.response_model import PromoResponse
+from utils.promo_engine import current_promo_engine
+from utils.session_store import get_session_store
 
 router = APIRouter(tags=["promo"])
 
@@ -18,32 +20,20 @@ class PromoRequest(BaseModel):
     text: Optional[str] = Field(
         default=None, description="Optional free-form text from the user"
     )
-
-
-BEVERAGE_KEYWORDS = ("es", "teh", "kopi", "jus", "air")
-
-
-def _has_indomie(items: List[OrderItem]) -> bool:
-    return any("indomie" in entry.item for entry in items)
-
-
-def _beverage_qty(items: List[OrderItem]) -> int:
-    total = 0
-    for entry in items:
-        if any(keyword in entry.item for keyword in BEVERAGE_KEYWORDS):
-            total += entry.qty
-    return total
+    branch: Optional[str] = Field(
+        default=None, description="Branch id for branch-specific promos"
+    )
+    jid: Optional[str] = Field(
+        default=None, description="Use this customer's session cart when items is empty"
+    )
 
 
 @router.post("/promo", response_model=PromoResponse)
 async def promo_hint(payload: PromoRequest) -> PromoResponse:
-    """Return a quick, rule-based promo suggestion."""
-
-    if payload.items and _has_indomie(payload.items):
-        return PromoResponse(suggestion="Tambah telur biar lebih mantap?")
-
-    beverage_qty = _beverage_qty(payload.items)
-    if not payload.items or beverage_qty < 2:
-        return PromoResponse(suggestion="Mau sekalian minum?")
+    """Return a promo suggestion from the rules in data/config.json."""
 
-    return PromoResponse(suggestion="belum ada promo")
+    items = payload.items
+    if not items and payload.jid:
+        items = get_session_store().get(payload.jid).items()
+    rule, suggestion = current_promo_engine().evaluate(items, branch=payload.branch)
+    return PromoResponse(suggestion=suggestion, promo_id=rule.id if rule else None)
@@ -0,0 +1,148 @@
+"""Multi-turn cart sessions keyed by the customer's JID."""
+
+from __future__ import annotations
+
+import re
+from typing import List, Literal, Optional, Tuple
+
+from fastapi import APIRouter
+from pydantic import BaseModel, Field
+
+from models.response_model import CartLine, CartResponse
+from routers.order import _match_menu_name, _parse_locally
+from utils.catalog import get_snapshot
+from utils.menu_index import MIN_MATCH_SCORE, normalize_slug
+from utils.order_tokenizer import ONES_WORDS, STOP_WORDS, TEN_WORDS, UNIT_WORDS
+from utils.session_store import OP_ADD, OP_REMOVE, OP_SET, Cart, Delta, get_session_store
+
+router = APIRouter(tags=["session"])
+
+# jumlah di awal frasa: "2", "dua", "sepuluh", "seporsi"
+QUANTITY = r"(?:\d+|{}|se(?:{}))\b".format(
+    "|".join(sorted(set(ONES_WORDS) - {"se"} | set(TEN_WORDS))), "|".join(sorted(UNIT_WORDS))
+)
+# "gak jadi" harus dicek sebelum pola "jadi" milik OP_SET. "kurang" saja
+# juga catatan masak ("kurang pedas"), jadi baru dianggap hapus kalau
+# langsung diikuti jumlah ("kurang 1 indomie")
+REMOVE_PATTERN = re.compile(
+    r"\b(?:hapus|batal(?:in|kan)?|cancel|(?:gak|ga|nggak|ngga|enggak)\s*jadi|kurang(?:in|i))\b"
+    rf"|\bkurang\s+(?={QUANTITY})"
+)
+SET_PATTERN = re.compile(r"([a-z][a-z\s]*?)\s+(?:jadi(?:in)?|ganti)\s+(\d+)")
+FILLER_WORDS = STOP_WORDS | {"yang", "nya", "aja", "deh", "tambah", "tambahin", "lagi"}
+
+
+class SessionMessageRequest(BaseModel):
+    text: str = Field(..., description="Pesan lanjutan dari pelanggan")
+
+
+class CartDeltaItem(BaseModel):
+    item: str = Field(..., description="Slug menu")
+    qty: Optional[int] = Field(
+        default=None, ge=0, description="Jumlah; kosong pada remove = hapus seluruh baris"
+    )
+
+
+class CartDeltaRequest(BaseModel):
+    op: Literal["add", "set", "remove"] = "add"
+    items: List[CartDeltaItem] = Field(default_factory=list)
+
+
+def _strip_fillers(text: str) -> str:
+    return " ".join(word for word in re.findall(r"[a-z]+", text) if word not in FILLER_WORDS)
+
+
+def _known_slug(phrase: str) -> Tuple[Optional[str], float]:
+    slug, score = _match_menu_name(_strip_fillers(phrase))
+    return (slug, score) if slug and score >= MIN_MATCH_SCORE / 100 else (None, 0.0)
+
+
+def _match_delta(lowered: str) -> Tuple[Optional[str], List[Delta], float]:
+    remove = REMOVE_PATTERN.search(lowered)
+    if remove:
+        rest = REMOVE_PATTERN.sub(" ", lowered)
+        items, confidence = _parse_locally(rest)
+        if items:
+            return OP_REMOVE, [(entry.item, entry.qty) for entry in items], confidence
+        slug, score = _known_slug(rest)
+        return (OP_REMOVE, [(slug, None)], score) if slug else (None, [], 0.0)
+
+    pairs = SET_PATTERN.findall(lowered)
+    if pairs:
+        matches = [(_known_slug(phrase), int(qty)) for phrase, qty in pairs]
+        deltas = [(slug, qty) for (slug, _), qty in matches if slug]
+        if deltas:
+            return OP_SET, deltas, min(score for (slug, score), _ in matches if slug)
+
+    items, confidence = _parse_locally(lowered)
+    if items:
+        return OP_ADD, [(entry.item, entry.qty) for entry in items], confidence
+    return None, [], 0.0
+
+
+def _on_menu(
+    op: Optional[str], deltas: List[Delta], confidence: float
+) -> Tuple[Optional[str], List[Delta], float]:
+    # raw-slug fallbacks ("jam 7 udah buka" -> udah_buka) never reach the cart
+    slug_ids = get_snapshot().slug_ids
+    deltas = [delta for delta in deltas if delta[0] in slug_ids]
+    return (op, deltas, confidence) if deltas else (None, [], 0.0)
+
+
+def _parse_delta(text: str) -> Tuple[Optional[str], List[Delta], float]:
+    """Turn a follow-up message into ``(op, deltas, confidence)``.
+
+    op is None if nothing matched. "tambah 1 es teh" adds, "yang indomie
+    jadi 3" sets a quantity and "gak jadi es teh" / "kurangin 1 indomie"
+    removes. Only slugs on the current menu are kept; confidence is the
+    local match score, as returned by ``_parse_locally``.
+    """
+
+    return _on_menu(*_match_delta(text.lower()))
+
+
+def _cart_response(jid: str, cart: Cart, op: Optional[str] = None, changes=()) -> CartResponse:
+    # cart.jid carries the tenant prefix; answer with the JID as requested
+    return CartResponse.model_construct(
+        jid=jid,
+        items=cart.items(),
+        total=cart.total,
+        op=op,
+        changes=[CartLine.model_construct(item=slug, qty=qty) for slug, qty in changes],
+    )
+
+
+@router.get("/session/{jid}", response_model=CartResponse)
+async def get_cart(jid: str) -> CartResponse:
+    """Current cart and running total for a customer."""
+
+    return _cart_response(jid, get_session_store().get(jid))
+
+
+@router.post("/session/{jid}/message", response_model=CartResponse)
+async def apply_message(jid: str, payload: SessionMessageRequest) -> CartResponse:
+    """Parse a follow-up message locally and apply it to the cart as a delta."""
+
+    op, deltas, _ = _parse_delta(payload.text)
+    store = get_session_store()
+    if op is None:
+        return _cart_response(jid, store.get(jid))
+    cart, changes = store.apply(jid, op, deltas)
+    return _cart_response(jid, cart, op, changes)
+
+
+@router.post("/session/{jid}/items", response_model=CartResponse)
+async def apply_items(jid: str, payload: CartDeltaRequest) -> CartResponse:
+    """Apply an already structured delta (e.g. from /parse_order)."""
+
+    deltas = [(normalize_slug(entry.item), entry.qty) for entry in payload.items]
+    cart, changes = get_session_store().apply(jid, payload.op, deltas)
+    return _cart_response(jid, cart, payload.op, changes)
+
+
+@router.delete("/session/{jid}", response_model=CartResponse)
+async def clear_cart(jid: str) -> CartResponse:
+    """Drop the customer's cart, e.g. after checkout."""
+
+    get_session_store().clear(jid)
+    return _cart_response(jid, Cart(jid=jid))
@@ -0,0 +1,163 @@
+"""Pipelined customer messages over one WebSocket.
+
+The bot keeps a connection to ``/ws`` open and writes JSON envelopes
+without waiting for the replies::
+
+    {"id": "m1", "type": "process", "text": "2 indomie", "jid": "62812@s.whatsapp.net"}
+    {"id": "m2", "type": "chat", "text": "halo kak"}
+
+``type`` is ``process`` (the default; the fields of ``POST
+/process_message``) or ``chat`` (those of ``POST /chat``). Each envelope is
+answered as soon as it is done, so replies can come back out of order; they
+carry the envelope's ``id``::
+
+    {"id": "m2", "ok": true, "data": {"reply": "..."}}
+    {"id": "m1", "ok": true, "data": {...ProcessMessageResponse...}}
+    {"id": "m3", "ok": false, "error": "..."}
+
+A connection processes up to ``STREAM_MAX_IN_FLIGHT`` envelopes at once.
+Beyond that it is not read until one finishes, which pushes back on the
+sender through the socket. Envelopes for the same ``jid`` run one after
+another in arrival order, so cart deltas are applied as the customer sent
+them. The ``X-Tenant-ID`` header of the handshake picks the tenant for the
+whole connection.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from fastapi import APIRouter, WebSocket
+from pydantic import ValidationError
+
+from routers.chat import ChatRequest, chat
+from routers.pipeline import ProcessMessageRequest, process_message
+from utils.metrics import STREAM_CONNECTIONS, STREAM_MESSAGES, count, enabled
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["stream"])
+
+STREAM_MAX_IN_FLIGHT = int(os.getenv("STREAM_MAX_IN_FLIGHT", "64"))
+
+
+async def _process(envelope: Dict[str, Any]) -> Dict[str, Any]:
+    response = await process_message(ProcessMessageRequest.model_validate(envelope))
+    return response.model_dump(mode="json")
+
+
+async def _chat(envelope: Dict[str, Any]) -> Dict[str, Any]:
+    return await chat(ChatRequest.model_validate(envelope))
+
+
+_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+    "process": _process,
+    "chat": _chat,
+}
+
+
+class _Stream:
+    """In-flight envelopes of one connection."""
+
+    def __init__(self, websocket: WebSocket, limit: int) -> None:
+        self.websocket = websocket
+        self.slots = asyncio.Semaphore(limit)
+        self.tasks: Set[asyncio.Task] = set()
+        # newest envelope per customer; the next one waits for it
+        self.latest: Dict[str, asyncio.Task] = {}
+        self._send_lock = asyncio.Lock()
+
+    def submit(self, raw: Any) -> None:
+        """Start on one received frame; the caller holds a slot for it."""
+
+        try:
+            envelope = json.loads(raw)
+        except ValueError:
+            envelope = None
+        if not isinstance(envelope, dict):
+            self._spawn(self._reject(None, "envelope must be a JSON object"))
+            return
+
+        jid = envelope.get("jid")
+        previous = self.latest.get(jid) if isinstance(jid, str) else None
+        task = self._spawn(self._answer(envelope, previous))
+        if isinstance(jid, str):
+            self.latest[jid] = task
+            task.add_done_callback(lambda done: self._forget(jid, done))
+
+    def _spawn(self, work) -> asyncio.Task:
+        task = asyncio.create_task(work)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def _forget(self, jid: str, task: asyncio.Task) -> None:
+        if self.latest.get(jid) is task:
+            del self.latest[jid]
+
+    async def _answer(self, envelope: Dict[str, Any], previous: Optional[asyncio.Task]) -> None:
+        kind = envelope.get("type") or "process"
+        handler = _HANDLERS.get(kind) if isinstance(kind, str) else None
+        if handler is None:
+            await self._reject(envelope.get("id"), f"unknown type {kind!r}")
+            return
+        reply: Dict[str, Any] = {"id": envelope.get("id"), "ok": False}
+        try:
+            if previous is not None:
+                # only the order matters here, not how the previous one ended
+                await asyncio.wait([previous])
+            reply["data"] = await handler(envelope)
+            reply["ok"] = True
+        except ValidationError as exc:
+            reply["error"] = str(exc)
+        except Exception:
+            logger.exception("Stream envelope %r failed", envelope.get("id"))
+            reply["error"] = "internal error"
+        count(STREAM_MESSAGES, kind, "ok" if reply["ok"] else "error")
+        await self._send(reply)
+
+    async def _reject(self, envelope_id: Any, error: str) -> None:
+        count(STREAM_MESSAGES, "invalid", "error")
+        await self._send({"id": envelope_id, "ok": False, "error": error})
+
+    async def _send(self, reply: Dict[str, Any]) -> None:
+        try:
+            async with self._send_lock:
+                await self.websocket.send_text(json.dumps(reply, ensure_ascii=False))
+        except Exception:
+            # the client went away; the receive loop notices and cleans up
+            logger.debug("Dropping stream reply %r", reply.get("id"))
+        finally:
+            self.slots.release()
+
+    def cancel(self) -> None:
+        for task in list(self.tasks):
+            task.cancel()
+
+
+@router.websocket("/ws")
+async def message_stream(websocket: WebSocket) -> None:
+    """Answer pipelined envelopes as they finish; see the module docs."""
+
+    await websocket.accept()
+    stream = _Stream(websocket, STREAM_MAX_IN_FLIGHT)
+    measured = enabled()
+    if measured:
+        STREAM_CONNECTIONS.inc()
+    try:
+        while True:
+            # wait for a free slot before reading, so a full pipeline backs up to the client
+            await stream.slots.acquire()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            stream.submit(message.get("text") or message.get("bytes") or b"")
+    finally:
+        # replies can no longer be delivered; stop the work (and free LLM slots)
+        stream.cancel()
+        if measured:
+            STREAM_CONNECTIONS.dec()
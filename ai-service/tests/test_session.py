@@ -0,0 +1,47 @@
+"""Follow-up messages parsed into cart deltas (run ``python -m pytest`` from ``ai-service/``)."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from routers.session import SessionMessageRequest, _parse_delta, apply_message, clear_cart
+from utils.session_store import OP_ADD, OP_REMOVE
+
+
+@pytest.mark.parametrize(
+    "text, slug, qty",
+    [
+        ("2 nasi goreng kurang pedas", "nasi_goreng", 2),
+        ("1 es teh kurang manis", "es_teh", 1),
+    ],
+)
+def test_kurang_as_cooking_note_adds(text: str, slug: str, qty: int) -> None:
+    op, deltas, _ = _parse_delta(text)
+    assert op == OP_ADD
+    assert deltas == [(slug, qty)]
+
+
+@pytest.mark.parametrize(
+    "text", ["kurangin 1 indomie", "kurangi 1 indomie", "kurang 1 indomie", "kurang satu indomie"]
+)
+def test_kurang_with_quantity_removes(text: str) -> None:
+    op, deltas, _ = _parse_delta(text)
+    assert op == OP_REMOVE
+    assert deltas == [("indomie", 1)]
+
+
+def test_kurang_pedas_reaches_the_cart() -> None:
+    jid = "test-kurang@s.whatsapp.net"
+
+    async def scenario():
+        await clear_cart(jid)
+        await apply_message(jid, SessionMessageRequest(text="2 nasi goreng"))
+        cart = await apply_message(jid, SessionMessageRequest(text="1 nasi goreng kurang pedas"))
+        await clear_cart(jid)
+        return cart
+
+    cart = asyncio.run(scenario())
+    assert cart.op == OP_ADD
+    assert [(line.item, line.qty) for line in cart.items] == [("nasi_goreng", 3)]
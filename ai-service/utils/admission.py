@@ -0,0 +1,222 @@
+"""Admission control in front of the LLM-bound paths.
+
+Every request that wants the LLM (order fallback, chat) first asks
+:func:`admit` for a slot. It is refused (*shed*) when:
+
+* the customer ran out of tokens in their bucket (``ADMISSION_RATE``
+  tokens per second, up to ``ADMISSION_BURST``);
+* ``ADMISSION_QUEUE_SIZE`` requests are already waiting and none of them
+  has a lower priority to make room;
+* it waited longer than ``ADMISSION_MAX_WAIT`` (or the caller's own
+  deadline) without getting one of the ``ADMISSION_CONCURRENCY`` slots.
+
+Waiters are served by priority, then arrival: order parsing outranks chat,
+and a full queue evicts its newest chat waiter for an incoming order.
+Callers answer shed requests locally instead of queueing on Gemini.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+
+from utils.metrics import ADMISSION_DECISIONS, ADMISSION_QUEUE_DEPTH, REGISTRY, count, enabled
+
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", "16"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "2"))
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", "0.2"))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", "5"))
+ADMISSION_MAX_CUSTOMERS = int(os.getenv("ADMISSION_MAX_CUSTOMERS", "10000"))
+
+# lower value is served first
+PRIORITIES: Dict[str, int] = {"order": 0, "chat": 1}
+
+ADMITTED = "admitted"
+RATE_LIMITED = "rate_limited"
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+EVICTED = "evicted"
+
+
+@dataclass
+class TokenBucket:
+    rate: float
+    burst: float
+    tokens: float
+    updated: float
+
+    def take(self, now: float) -> bool:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    kind: str = field(compare=False)
+    future: "asyncio.Future[bool]" = field(compare=False)
+
+
+class AdmissionController:
+    """Slots, per-customer buckets and a bounded priority queue; see module docs.
+
+    All state is touched from the event loop only, so no locks are needed.
+    """
+
+    def __init__(
+        self,
+        capacity: int = ADMISSION_CONCURRENCY,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        max_wait: float = ADMISSION_MAX_WAIT,
+        rate: float = ADMISSION_RATE,
+        burst: float = ADMISSION_BURST,
+        max_customers: int = ADMISSION_MAX_CUSTOMERS,
+    ) -> None:
+        self.capacity = capacity
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.rate = rate
+        self.burst = burst
+        self.max_customers = max_customers
+        self.active = 0
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._outcomes: Dict[str, int] = {}
+
+    def _record(self, kind: str, outcome: str) -> None:
+        self._outcomes[outcome] = self._outcomes.get(outcome, 0) + 1
+        count(ADMISSION_DECISIONS, kind, outcome)
+
+    def _take_token(self, customer: str) -> bool:
+        now = time.monotonic()
+        bucket = self._buckets.get(customer)
+        if bucket is None:
+            bucket = self._buckets[customer] = TokenBucket(
+                self.rate, self.burst, self.burst, now
+            )
+            # forgetting an idle customer only refills their bucket
+            if len(self._buckets) > self.max_customers:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(customer)
+        return bucket.take(now)
+
+    def _make_room(self, priority: int) -> bool:
+        worst = max(self._queue, key=lambda waiter: (waiter.priority, waiter.seq))
+        if worst.priority <= priority:
+            return False
+        self._queue.remove(worst)
+        heapq.heapify(self._queue)
+        worst.future.set_result(False)
+        self._record(worst.kind, EVICTED)
+        return True
+
+    async def acquire(
+        self, kind: str, customer: Optional[str] = None, timeout: Optional[float] = None
+    ) -> bool:
+        """Wait for a slot; False if the request was shed. Pair with :meth:`release`."""
+
+        if customer and self.rate > 0 and not self._take_token(customer):
+            self._record(kind, RATE_LIMITED)
+            return False
+        if self.active < self.capacity and not self._queue:
+            self.active += 1
+            self._record(kind, ADMITTED)
+            return True
+
+        priority = PRIORITIES.get(kind, len(PRIORITIES))
+        if len(self._queue) >= self.queue_size and not self._make_room(priority):
+            self._record(kind, QUEUE_FULL)
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(priority, next(self._seq), kind, future)
+        heapq.heappush(self._queue, waiter)
+        wait = self.max_wait if timeout is None else min(timeout, self.max_wait)
+        try:
+            # shield: a timeout must not cancel a slot that was just handed over
+            admitted = await asyncio.wait_for(asyncio.shield(waiter.future), max(wait, 0.0))
+        except asyncio.TimeoutError:
+            admitted = self._abandon(waiter)
+            self._record(kind, ADMITTED if admitted else QUEUE_TIMEOUT)
+            return admitted
+        except asyncio.CancelledError:
+            if self._abandon(waiter):
+                self.release()
+            raise
+        if admitted:
+            self._record(kind, ADMITTED)
+        return admitted
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Take ``waiter`` off the queue; True if it was granted a slot meanwhile."""
+
+        if waiter.future.done():
+            return waiter.future.result()
+        waiter.future.cancel()
+        self._queue.remove(waiter)
+        heapq.heapify(self._queue)
+        return False
+
+    def release(self) -> None:
+        self.active -= 1
+        # hand the freed slot straight to the best waiter
+        while self._queue and self.active < self.capacity:
+            waiter = heapq.heappop(self._queue)
+            self.active += 1
+            waiter.future.set_result(True)
+
+    def depth(self) -> Dict[str, int]:
+        depth = {kind: 0 for kind in PRIORITIES}
+        for waiter in self._queue:
+            depth[waiter.kind] = depth.get(waiter.kind, 0) + 1
+        return depth
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "active": self.active,
+            "capacity": self.capacity,
+            "queued": self.depth(),
+            "customers": len(self._buckets),
+            "outcomes": dict(self._outcomes),
+        }
+
+
+ADMISSION = AdmissionController()
+
+
+@asynccontextmanager
+async def admit(
+    kind: str, customer: Optional[str] = None, timeout: Optional[float] = None
+) -> AsyncIterator[bool]:
+    """``async with admit("order", jid) as admitted:``; the slot is freed on exit."""
+
+    admitted = await ADMISSION.acquire(kind, customer, timeout)
+    try:
+        yield admitted
+    finally:
+        if admitted:
+            ADMISSION.release()
+
+
+def _collect_depth() -> None:
+    for kind, waiting in ADMISSION.depth().items():
+        ADMISSION_QUEUE_DEPTH.set(waiting, kind)
+
+
+if enabled():
+    REGISTRY.add_collector(_collect_depth)
@@ -0,0 +1,335 @@
+"""Aliases learned from LLM order resolutions.
+
+When the LLM fallback resolves a phrase the local parser could not
+("indomi grg 2", "esteh manis satu"), the phrase -> slug pair is recorded
+here. The next message with the same phrase is then answered locally.
+Phrases are keyed by their lower-cased words, so lookups are a single dict
+access, made before any fuzzy matching.
+
+Each alias carries a confidence. A new alias starts at
+``LEARNED_ALIAS_CONFIDENCE`` (callers pass less for phrases that look
+nothing like the item), and every later LLM answer that agrees halves the
+distance to 1. An answer that disagrees replaces the slug but drops the
+confidence below ``LEARNED_ALIAS_MIN_CONFIDENCE``. The alias is then not
+used until the LLM confirms it. Aliases set by hand are never overwritten.
+
+Hits and new aliases are kept in memory and written to
+``LEARNED_ALIAS_PATH`` by a background thread, at most every
+``LEARNED_ALIAS_FLUSH_INTERVAL`` seconds. Beyond ``LEARNED_ALIAS_MAX``
+entries the least recently used learned alias is dropped; manual ones stay.
+Like the inventory engine, the
+store assumes it is the only writer of its file.
+
+A tenant (``X-Tenant-ID``) learns into its own store, kept in
+``learned_aliases.json`` in its directory, so one branch's phrases never
+resolve orders of another.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.catalog import (
+    CURRENT_TENANT,
+    DATA_DIR,
+    CatalogSnapshot,
+    _read_json,
+    get_snapshot,
+    write_json_atomic,
+)
+from utils.menu_index import normalize_slug
+
+logger = logging.getLogger(__name__)
+
+LEARNED_ALIAS_PATH = Path(os.getenv("LEARNED_ALIAS_PATH", DATA_DIR / "learned_aliases.json"))
+LEARNED_ALIAS_CONFIDENCE = float(os.getenv("LEARNED_ALIAS_CONFIDENCE", "0.9"))
+LEARNED_ALIAS_MIN_CONFIDENCE = float(os.getenv("LEARNED_ALIAS_MIN_CONFIDENCE", "0.7"))
+LEARNED_ALIAS_MAX = int(os.getenv("LEARNED_ALIAS_MAX", "5000"))
+LEARNED_ALIAS_FLUSH_INTERVAL = float(os.getenv("LEARNED_ALIAS_FLUSH_INTERVAL", "5"))
+
+SOURCE_LLM = "llm"
+SOURCE_MANUAL = "manual"
+
+# confidence after an LLM answer contradicts the alias
+CONFLICT_CONFIDENCE = 0.5
+# a new alias that must be confirmed once more before it is used
+UNCONFIRMED_CONFIDENCE = 0.6
+MAX_CONFIDENCE = 0.99
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def phrase_key(phrase: str) -> str:
+    return " ".join(_WORD.findall(phrase.lower()))
+
+
+@dataclass
+class LearnedAlias:
+    phrase: str
+    slug: str
+    confidence: float
+    hits: int = 0
+    confirmations: int = 1
+    source: str = SOURCE_LLM
+    learned_at: float = 0.0
+    last_used: float = 0.0
+
+    @property
+    def usable(self) -> bool:
+        return self.confidence >= LEARNED_ALIAS_MIN_CONFIDENCE
+
+
+class AliasStore:
+    """Learned phrase -> slug map with write-behind persistence; see module docs."""
+
+    def __init__(
+        self,
+        path: Path = LEARNED_ALIAS_PATH,
+        max_entries: int = LEARNED_ALIAS_MAX,
+        flush_interval: float = LEARNED_ALIAS_FLUSH_INTERVAL,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self._aliases: Dict[str, LearnedAlias] = {}
+        # learned (not manual) phrases, least recently used first
+        self._recency: "OrderedDict[str, None]" = OrderedDict()
+        # guards changes to entries; lookups read the dict without it
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def start(self) -> "AliasStore":
+        """Load the file and start the write-behind thread."""
+
+        with self._lock:
+            if self._flusher is not None:
+                return self
+            data = _read_json(self.path)
+            for entry in data if isinstance(data, list) else ():
+                try:
+                    alias = LearnedAlias(**entry)
+                except TypeError:
+                    continue
+                self._aliases[alias.phrase] = alias
+            learned = [a for a in self._aliases.values() if a.source != SOURCE_MANUAL]
+            learned.sort(key=lambda alias: alias.last_used or alias.learned_at)
+            self._recency.update((alias.phrase, None) for alias in learned)
+            self._flusher = threading.Thread(
+                target=self._run, name="alias-flush", daemon=True
+            )
+            self._flusher.start()
+        return self
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def __len__(self) -> int:
+        return len(self._aliases)
+
+    def peek(
+        self, phrase: str, snapshot: Optional[CatalogSnapshot] = None
+    ) -> Optional[LearnedAlias]:
+        """The usable alias for ``phrase`` if its slug is still on the menu."""
+
+        alias = self._aliases.get(phrase_key(phrase))
+        if alias is None or not alias.usable:
+            return None
+        snapshot = snapshot or get_snapshot()
+        return alias if alias.slug in snapshot.slug_ids else None
+
+    def lookup(
+        self, phrase: str, snapshot: Optional[CatalogSnapshot] = None
+    ) -> Optional[Tuple[str, float]]:
+        """``(slug, confidence)`` for a known phrase, counting the hit."""
+
+        alias = self.peek(phrase, snapshot)
+        if alias is None:
+            return None
+        # a lost increment under contention only skews the counter
+        alias.hits += 1
+        alias.last_used = time.time()
+        try:
+            self._recency.move_to_end(alias.phrase)
+        except KeyError:
+            # removed or pinned by hand since peek()
+            pass
+        self._dirty.set()
+        return alias.slug, alias.confidence
+
+    def learn(
+        self,
+        phrase: str,
+        slug: str,
+        snapshot: Optional[CatalogSnapshot] = None,
+        confidence: float = LEARNED_ALIAS_CONFIDENCE,
+    ) -> Optional[LearnedAlias]:
+        """Record an LLM resolution; None if the slug is not on the menu.
+
+        ``confidence`` only applies to a new alias.
+        """
+
+        key = phrase_key(phrase)
+        slug = normalize_slug(slug)
+        snapshot = snapshot or get_snapshot()
+        if not key or slug not in snapshot.slug_ids:
+            return None
+        now = time.time()
+        with self._lock:
+            alias = self._aliases.get(key)
+            if alias is None:
+                alias = LearnedAlias(key, slug, confidence, learned_at=now)
+                self._aliases[key] = alias
+                self._recency[key] = None
+                self._evict()
+            elif alias.source == SOURCE_MANUAL:
+                return alias
+            elif alias.slug == slug:
+                alias.confirmations += 1
+                alias.confidence = min(MAX_CONFIDENCE, 1 - (1 - alias.confidence) / 2)
+            else:
+                logger.info("Learned alias %r changed %s -> %s", key, alias.slug, slug)
+                alias.slug = slug
+                alias.confidence = CONFLICT_CONFIDENCE
+                alias.confirmations = 1
+        self._dirty.set()
+        return alias
+
+    def set(self, phrase: str, slug: str) -> Optional[LearnedAlias]:
+        """Pin ``phrase`` to ``slug`` by hand; LLM answers no longer change it."""
+
+        key, slug = phrase_key(phrase), normalize_slug(slug)
+        if not key or not slug:
+            return None
+        with self._lock:
+            alias = self._aliases.get(key)
+            if alias is None:
+                alias = self._aliases[key] = LearnedAlias(key, slug, 1.0, learned_at=time.time())
+                self._evict()
+            alias.slug = slug
+            alias.confidence = 1.0
+            alias.source = SOURCE_MANUAL
+            self._recency.pop(key, None)
+        self._dirty.set()
+        return alias
+
+    def remove(self, phrases: Iterable[str]) -> List[str]:
+        with self._lock:
+            removed = [key for key in map(phrase_key, phrases) if self._aliases.pop(key, None)]
+            for key in removed:
+                self._recency.pop(key, None)
+        if removed:
+            self._dirty.set()
+        return removed
+
+    def prune(
+        self,
+        max_hits: Optional[int] = None,
+        idle_days: Optional[float] = None,
+        below_confidence: Optional[float] = None,
+        off_menu: bool = True,
+        snapshot: Optional[CatalogSnapshot] = None,
+    ) -> List[str]:
+        """Drop learned (not manual) aliases matching any given criterion.
+
+        ``max_hits`` drops aliases used at most that often, ``idle_days`` those
+        unused (or, if never used, learned) that long ago, and ``off_menu``
+        those whose item left the menu.
+        """
+
+        snapshot = snapshot or get_snapshot()
+        cutoff = time.time() - idle_days * 86400 if idle_days is not None else None
+
+        def stale(alias: LearnedAlias) -> bool:
+            if alias.source == SOURCE_MANUAL:
+                return False
+            return (
+                (max_hits is not None and alias.hits <= max_hits)
+                or (cutoff is not None and (alias.last_used or alias.learned_at) < cutoff)
+                or (below_confidence is not None and alias.confidence < below_confidence)
+                or (off_menu and alias.slug not in snapshot.slug_ids)
+            )
+
+        return self.remove([key for key, alias in list(self._aliases.items()) if stale(alias)])
+
+    def entries(self) -> List[LearnedAlias]:
+        """All aliases, most used first."""
+
+        return sorted(self._aliases.values(), key=lambda alias: (-alias.hits, alias.phrase))
+
+    def _evict(self) -> None:
+        # called with the lock held; drops the least recently used learned alias
+        while len(self._aliases) > self.max_entries and self._recency:
+            phrase, _ = self._recency.popitem(last=False)
+            del self._aliases[phrase]
+
+    def flush(self) -> bool:
+        """Write the aliases now if anything changed; True if written."""
+
+        if not self._dirty.is_set():
+            return False
+        self._dirty.clear()
+        with self._lock:
+            data = [asdict(alias) for alias in self._aliases.values()]
+        try:
+            write_json_atomic(self.path, data)
+        except OSError:
+            self._dirty.set()
+            logger.exception("Writing learned aliases to %s failed", self.path)
+            return False
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Learned alias flush failed")
+
+    def stats(self) -> Dict[str, int]:
+        aliases = list(self._aliases.values())
+        return {
+            "aliases": len(aliases),
+            "usable": sum(alias.usable for alias in aliases),
+            "manual": sum(alias.source == SOURCE_MANUAL for alias in aliases),
+            "hits": sum(alias.hits for alias in aliases),
+            "pending_write": int(self._dirty.is_set()),
+        }
+
+
+# one store per file: the default one and each tenant's
+_stores: Dict[Path, AliasStore] = {}
+_store_lock = threading.Lock()
+
+
+def get_alias_store() -> AliasStore:
+    """The store of the tenant being served, or of ``LEARNED_ALIAS_PATH``."""
+
+    tenant = CURRENT_TENANT.get()
+    path = LEARNED_ALIAS_PATH if tenant is None else tenant.root / LEARNED_ALIAS_PATH.name
+    store = _stores.get(path)
+    if store is None:
+        with _store_lock:
+            store = _stores.get(path)
+            if store is None:
+                store = _stores[path] = AliasStore(path).start()
+    return store
+
+
+def close_alias_store() -> None:
+    """Write pending aliases and hits of every store that was used."""
+
+    for store in list(_stores.values()):
+        store.close()
@@ -0,0 +1,515 @@
+"""Shared menu catalog published as immutable, versioned snapshots."""
+
+from __future__ import annotations
+
+import itertools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from types import MappingProxyType
+from typing import (
+    TYPE_CHECKING,
+    AbstractSet,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from utils.menu_index import MenuIndex, normalize_slug
+
+if TYPE_CHECKING:
+    from utils.tenants import Tenant
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(
+    os.getenv("WARUNGGO_DATA_DIR", Path(__file__).resolve().parents[2] / "data")
+)
+MENU_PATH = DATA_DIR / "menu.json"
+INVENTORY_PATH = DATA_DIR / "inventory.json"
+ALIAS_PATH = DATA_DIR / "aliases.json"
+
+RELOAD_CHECK_INTERVAL = float(os.getenv("CATALOG_RELOAD_INTERVAL", "1.0"))
+
+# Compiled snapshots mapped by every worker (utils.catalog_image); empty disables them.
+CATALOG_IMAGE_DIR = os.getenv(
+    "CATALOG_IMAGE_DIR", str(Path(__file__).resolve().parents[1] / ".cache" / "catalog")
+)
+
+# Built-in menu used when the Sheets sync has not produced data yet. Synced
+# prices from data/menu.json take precedence over these.
+DEFAULT_MENU_NAMES: Tuple[str, ...] = (
+    "indomie",
+    "indomie goreng",
+    "nasi goreng",
+    "ayam geprek",
+    "es teh manis",
+    "es teh tawar",
+    "teh tawar",
+    "kopi susu",
+    "kopi hitam",
+    "jus jeruk",
+    "air mineral",
+)
+
+DEFAULT_MENU_PRICES: Dict[str, int] = {
+    "indomie": 3500,
+    "indomie_goreng": 5000,
+    "nasi_goreng": 12000,
+    "ayam_geprek": 15000,
+    "es_teh": 3000,
+    "es_teh_manis": 3000,
+    "es_teh_tawar": 2500,
+    "kopi_susu": 8000,
+    "kopi_hitam": 6000,
+    "jus_jeruk": 10000,
+    "air_mineral": 4000,
+}
+
+BEVERAGE_KEYWORDS = ("es", "teh", "kopi", "jus", "air")
+
+# Set per request by utils.tenants; None serves the files in DATA_DIR.
+CURRENT_TENANT: "ContextVar[Optional[Tenant]]" = ContextVar("warunggo_tenant", default=None)
+
+# One counter for every catalog in the process, so caches keyed by snapshot
+# version (price tables, carts) never mix up two tenants.
+_versions = itertools.count(1)
+
+
+def next_version() -> int:
+    return next(_versions)
+
+
+def catalog_image_path(name: str) -> Optional[Path]:
+    """Where the image of catalog ``name`` goes; None when images are disabled."""
+
+    return Path(CATALOG_IMAGE_DIR) / f"{name}.img" if CATALOG_IMAGE_DIR else None
+
+
+def _pretty(slug: str) -> str:
+    return slug.replace("_", " ")
+
+
+def is_beverage(slug: str) -> bool:
+    return any(keyword in slug for keyword in BEVERAGE_KEYWORDS)
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """One consistent view of menu, prices, stock and derived lookups.
+
+    Snapshots are never mutated; a reload publishes a new one with a higher
+    ``version``. ``slug_ids`` maps a slug to its position in ``slugs`` and
+    the parallel ``price_array`` / ``stock_array``. A snapshot derived from
+    ``parent_version`` by :func:`update_snapshot` lists the slugs whose
+    price differs from the parent in ``changed``. Snapshots loaded from a
+    catalog image read their menu index and price / stock arrays from it
+    (see :mod:`utils.catalog_image`).
+    """
+
+    version: int
+    slugs: Sequence[str]
+    slug_ids: Mapping[str, int]
+    prices: Mapping[str, int]
+    stock: Mapping[str, int]
+    price_array: Sequence[int]
+    stock_array: Sequence[int]
+    synced: Sequence[str]
+    beverages: AbstractSet[str]
+    aliases: Mapping[str, str]
+    menu_index: MenuIndex
+    menu_text: str
+    loaded_at: float = field(default_factory=time.time)
+    parent_version: int = 0
+    changed: frozenset = frozenset()
+
+    def price_of(self, slug: str) -> int:
+        return self.prices.get(slug, 0)
+
+    def stock_of(self, slug: str) -> Optional[int]:
+        return self.stock.get(slug)
+
+    def is_beverage(self, slug: str) -> bool:
+        if slug in self.slug_ids:
+            return slug in self.beverages
+        return is_beverage(slug)
+
+
+def write_bytes_atomic(path: Path, data: bytes) -> None:
+    """Write ``data`` to a temp file next to ``path``, fsync, then rename over it."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def write_text_atomic(path: Path, text: str) -> None:
+    write_bytes_atomic(path, text.encode("utf-8"))
+
+
+def write_json_atomic(path: Path, data) -> None:
+    write_text_atomic(path, json.dumps(data, ensure_ascii=False, indent=2))
+
+
+def _read_json(path: Path):
+    try:
+        raw = path.read_text(encoding="utf-8")
+    except OSError:
+        return None
+    if not raw.strip():
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        logger.warning("Ignoring malformed JSON in %s", path)
+        return None
+
+
+def _to_int(value) -> int:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def load_menu(path: Path = MENU_PATH) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """Return ``(prices, stock)`` from menu.json in list or mapping layout."""
+
+    data = _read_json(path)
+    prices: Dict[str, int] = {}
+    stock: Dict[str, int] = {}
+    if isinstance(data, Mapping):
+        for key, price in data.items():
+            prices[normalize_slug(str(key))] = _to_int(price)
+    elif isinstance(data, list):
+        for entry in data:
+            if not isinstance(entry, Mapping) or not entry.get("item"):
+                continue
+            slug = normalize_slug(str(entry["item"]))
+            prices[slug] = _to_int(entry.get("harga", entry.get("price")))
+            if "stok" in entry or "stock" in entry:
+                stock[slug] = _to_int(entry.get("stok", entry.get("stock")))
+    prices.pop("", None)
+    return prices, stock
+
+
+def load_inventory(path: Path = INVENTORY_PATH) -> Dict[str, int]:
+    data = _read_json(path)
+    if not isinstance(data, Mapping):
+        return {}
+    return {normalize_slug(str(key)): _to_int(value) for key, value in data.items()}
+
+
+def load_stock(menu_path: Path = MENU_PATH, inventory_path: Path = INVENTORY_PATH) -> Dict[str, int]:
+    """Stock from menu.json overridden by inventory.json, as the catalog sees it."""
+
+    _, stock = load_menu(menu_path)
+    stock.update(load_inventory(inventory_path))
+    return stock
+
+
+def load_aliases(path: Path = ALIAS_PATH) -> Dict[str, str]:
+    data = _read_json(path)
+    if not isinstance(data, Mapping):
+        return {}
+    return {str(alias): normalize_slug(str(slug)) for alias, slug in data.items() if slug}
+
+
+def build_snapshot(
+    version: int,
+    synced_prices: Mapping[str, int],
+    stock: Mapping[str, int],
+    aliases: Mapping[str, str],
+    base_names: Sequence[str] = DEFAULT_MENU_NAMES,
+    base_prices: Mapping[str, int] = DEFAULT_MENU_PRICES,
+) -> CatalogSnapshot:
+    """Compile a snapshot; everything derived is computed here, once."""
+
+    prices = dict(base_prices)
+    prices.update(synced_prices)
+
+    # ordered dedup; a list membership test here was O(n^2) on big menus
+    candidates = itertools.chain((normalize_slug(name) for name in base_names), prices, stock)
+    slugs: List[str] = [slug for slug in dict.fromkeys(candidates) if slug]
+    slug_ids = {slug: idx for idx, slug in enumerate(slugs)}
+
+    entries = [(name, normalize_slug(name)) for name in base_names]
+    entries += [(_pretty(slug), slug) for slug in slugs]
+    entries += list(aliases.items())
+
+    synced = tuple(synced_prices)
+    listed = synced or tuple(slug for slug in slugs if slug in prices)
+    menu_text = "Menu kami: " + ", ".join(_pretty(slug) for slug in listed) + "."
+
+    return CatalogSnapshot(
+        version=version,
+        slugs=tuple(slugs),
+        slug_ids=MappingProxyType(slug_ids),
+        prices=MappingProxyType(prices),
+        stock=MappingProxyType(dict(stock)),
+        price_array=tuple(prices.get(slug, 0) for slug in slugs),
+        stock_array=tuple(stock.get(slug, -1) for slug in slugs),
+        synced=synced,
+        beverages=frozenset(slug for slug in slugs if is_beverage(slug)),
+        aliases=MappingProxyType(dict(aliases)),
+        menu_index=MenuIndex(entries, version=version),
+        menu_text=menu_text,
+    )
+
+
+def update_snapshot(
+    current: CatalogSnapshot,
+    version: int,
+    synced_prices: Mapping[str, int],
+    stock: Mapping[str, int],
+    base_names: Sequence[str] = DEFAULT_MENU_NAMES,
+    base_prices: Mapping[str, int] = DEFAULT_MENU_PRICES,
+) -> CatalogSnapshot:
+    """Like :func:`build_snapshot` with ``current``'s aliases, reusing its work.
+
+    Only slugs that enter or leave the catalog touch the menu index; a
+    price or stock change keeps the index object as it is.
+    """
+
+    prices = dict(base_prices)
+    prices.update(synced_prices)
+    base_slugs = [normalize_slug(name) for name in base_names]
+    wanted = set(base_slugs).union(prices, stock)
+    wanted.discard("")
+
+    present = set(current.slug_ids)
+    added = []
+    for slug in list(prices) + list(stock):
+        if slug and slug not in present:
+            present.add(slug)
+            added.append(slug)
+    removed = [slug for slug in current.slugs if slug not in wanted]
+    if added or removed:
+        present.difference_update(removed)
+        slugs = [slug for slug in current.slugs if slug in wanted] + added
+        slug_ids: Mapping[str, int] = MappingProxyType(
+            {slug: idx for idx, slug in enumerate(slugs)}
+        )
+    else:
+        slugs, slug_ids = list(current.slugs), current.slug_ids
+
+    index = current.menu_index
+    if added or removed:
+        index = index.updated(
+            added=[(_pretty(slug), slug) for slug in added],
+            removed=[(_pretty(slug), slug) for slug in removed],
+            version=version,
+        )
+    changed = frozenset(
+        slug for slug in present.union(removed) if prices.get(slug) != current.prices.get(slug)
+    )
+
+    synced = tuple(synced_prices)
+    listed = synced or tuple(slug for slug in slugs if slug in prices)
+    if synced == current.synced and not added and not removed:
+        menu_text = current.menu_text
+    else:
+        menu_text = "Menu kami: " + ", ".join(_pretty(slug) for slug in listed) + "."
+
+    beverages = (current.beverages - set(removed)) | {slug for slug in added if is_beverage(slug)}
+    return CatalogSnapshot(
+        version=version,
+        slugs=tuple(slugs),
+        slug_ids=slug_ids,
+        prices=MappingProxyType(prices),
+        stock=MappingProxyType(dict(stock)),
+        price_array=tuple(prices.get(slug, 0) for slug in slugs),
+        stock_array=tuple(stock.get(slug, -1) for slug in slugs),
+        synced=synced,
+        beverages=frozenset(beverages),
+        aliases=current.aliases,
+        menu_index=index,
+        menu_text=menu_text,
+        parent_version=current.version,
+        changed=changed,
+    )
+
+
+def _file_signature(path: Path) -> Tuple[int, int]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return (0, 0)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class Catalog:
+    """Watches the catalog files and publishes a new snapshot on change.
+
+    :meth:`snapshot` never waits for a reload: it returns the current
+    snapshot and, when the files changed, starts a rebuild in a background
+    thread that swaps the reference once finished. Only the very first call
+    builds synchronously.
+
+    With an ``image_path``, full builds go through a catalog image that
+    other workers map as well (see :mod:`utils.catalog_image`).
+    """
+
+    def __init__(
+        self,
+        menu_path: Path = MENU_PATH,
+        inventory_path: Path = INVENTORY_PATH,
+        alias_path: Path = ALIAS_PATH,
+        image_path: Optional[Path] = None,
+    ) -> None:
+        self.menu_path = menu_path
+        self.inventory_path = inventory_path
+        self.alias_path = alias_path
+        self.image_path = image_path
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._signature: Tuple = ()
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _signature_now(self) -> Tuple:
+        paths = (self.menu_path, self.inventory_path, self.alias_path)
+        return tuple(_file_signature(path) for path in paths)
+
+    def build(self, version: int) -> CatalogSnapshot:
+        """Compile a snapshot from the files, without the image."""
+
+        prices, stock = load_menu(self.menu_path)
+        stock.update(load_inventory(self.inventory_path))
+        return build_snapshot(version, prices, stock, load_aliases(self.alias_path))
+
+    def _build(self, version: int, signature: Tuple) -> CatalogSnapshot:
+        if self.image_path is not None:
+            from utils.catalog_image import load_snapshot
+
+            try:
+                return load_snapshot(self, version, signature)
+            except (OSError, ValueError) as exc:
+                logger.warning(
+                    "Catalog image %s unusable (%s); building in-process", self.image_path, exc
+                )
+        return self.build(version)
+
+    def _restock(self, current: CatalogSnapshot, version: int) -> Optional[CatalogSnapshot]:
+        """Copy ``current`` with fresh stock, or None if a full rebuild is needed."""
+
+        stock = load_stock(self.menu_path, self.inventory_path)
+        if any(slug not in current.slug_ids for slug in stock):
+            return None
+        return replace(
+            current,
+            version=version,
+            stock=MappingProxyType(stock),
+            stock_array=tuple(stock.get(slug, -1) for slug in current.slugs),
+            loaded_at=time.time(),
+            parent_version=current.version,
+            changed=frozenset(),
+        )
+
+    def _load(self, signature: Tuple) -> None:
+        try:
+            current = self._snapshot
+            if current is not None and signature == self._signature:
+                return
+            version = next_version()
+            snapshot = None
+            previous = self._signature
+            # only inventory.json moved (e.g. stock write-back): keep the menu index
+            if current is not None and previous and (previous[0], previous[2]) == (
+                signature[0],
+                signature[2],
+            ):
+                snapshot = self._restock(current, version)
+            if snapshot is None:
+                snapshot = self._build(version, signature)
+            self._snapshot = snapshot
+            self._signature = signature
+            logger.info("Catalog v%d loaded with %d items", version, len(snapshot.slugs))
+        except Exception:
+            logger.exception("Catalog reload failed; keeping previous snapshot")
+        finally:
+            self._lock.release()
+
+    def publish(
+        self,
+        synced_prices: Mapping[str, int],
+        stock: Mapping[str, int],
+        write: Optional[Callable[[], None]] = None,
+    ) -> CatalogSnapshot:
+        """Swap in a synced catalog without waiting for the file watcher.
+
+        ``write`` (persisting the same data) runs under the reload lock so
+        the watcher cannot pick up half of it and rebuild from scratch.
+        """
+
+        current = self.snapshot()
+        with self._lock:
+            current = self._snapshot or current
+            if write is not None:
+                write()
+            snapshot = update_snapshot(current, next_version(), synced_prices, stock)
+            self._snapshot = snapshot
+            self._signature = self._signature_now()
+        logger.info(
+            "Catalog v%d published from sync (%d price changes)", snapshot.version, len(snapshot.changed)
+        )
+        return snapshot
+
+    def reload(self, wait: bool = True) -> None:
+        """Re-read the files now (used after a sync or in tests)."""
+
+        if self._lock.acquire(blocking=wait):
+            self._signature = ()
+            self._load(self._signature_now())
+
+    def snapshot(self) -> CatalogSnapshot:
+        current = self._snapshot
+        now = time.monotonic()
+        if current is None:
+            self._lock.acquire()
+            self._load(self._signature_now())
+            return self._snapshot
+        if now - self._checked_at >= RELOAD_CHECK_INTERVAL:
+            self._checked_at = now
+            signature = self._signature_now()
+            if signature != self._signature and self._lock.acquire(blocking=False):
+                threading.Thread(
+                    target=self._load, args=(signature,), name="catalog-reload", daemon=True
+                ).start()
+        return current
+
+
+CATALOG = Catalog(image_path=catalog_image_path("catalog"))
+
+
+def current_catalog() -> Catalog:
+    """The catalog of the tenant being served, or :data:`CATALOG`."""
+
+    tenant = CURRENT_TENANT.get()
+    return CATALOG if tenant is None else tenant.catalog
+
+
+def get_snapshot() -> CatalogSnapshot:
+    """Return the current catalog snapshot (never blocks on a reload)."""
+
+    return current_catalog().snapshot()
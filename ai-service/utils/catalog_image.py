@@ -0,0 +1,411 @@
+"""Compiled catalog image shared by worker processes through ``mmap``.
+
+Every worker used to build the same snapshot from the JSON files: slug
+tables, price and stock columns and the menu's trigram postings. That cost
+memory and startup time in each of them. The first worker to need a
+snapshot now writes it to one file, and every worker maps that file
+read-only. The pages live in the OS page cache once, however many workers
+map them, and a restarted worker starts from the finished index::
+
+    cd ai-service
+    python -m utils.catalog_image   # build (if stale) and describe the image
+
+The file starts with a fixed header and a section table; each section is
+an array in native byte order, 8-byte aligned:
+
+* string tables (``u32`` count, ``u32`` offsets, UTF-8 blob) for the slugs,
+  the menu index's names / processed keys / slugs and its sorted trigrams;
+* ``int64`` price and stock columns with ``u8`` presence flags;
+* ``u32`` postings addressed by per-trigram bounds.
+
+The per-slug tables are small, and they sit on the hot path (every price,
+stock and ``slug_ids`` lookup), so a mapped snapshot decodes them once into
+the same dicts and tuples a built one has. The menu index is the bulk of
+the image and is read in place through :class:`StringTable` and
+:class:`MappedMenuIndex`. Trigram lookups binary-search the sorted table,
+and only the names a request touches are decoded.
+
+An image is keyed by the menu and alias files (paths, mtimes and sizes)
+plus the built-in menu, so it is rebuilt when they change. The new file is
+written next to the old one and renamed over it. Workers keep serving from
+the mapping they have until their own file watcher loads the new one.
+Stock changes too often for that (inventory write-backs), so an image only
+records the inventory it was built with. A worker whose inventory differs
+re-reads the stock into Python objects, as a reload does, unless the
+inventory adds items the image does not know.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import mmap
+import struct
+import sys
+import time
+from array import array
+from collections.abc import Mapping, Sequence
+from contextlib import contextmanager
+from dataclasses import replace
+from pathlib import Path
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.catalog import (
+    DEFAULT_MENU_NAMES,
+    DEFAULT_MENU_PRICES,
+    CatalogSnapshot,
+    load_stock,
+    write_bytes_atomic,
+)
+from utils.menu_index import MenuIndex
+
+if TYPE_CHECKING:
+    from utils.catalog import Catalog
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WGCATIMG"
+FORMAT_VERSION = 2
+
+# magic, format, section count, build key, inventory mtime_ns and size
+_HEADER = struct.Struct("<8sII32sqq")
+# name, offset, length
+_SECTION = struct.Struct("<16sQQ")
+_ALIGN = 8
+
+
+def image_key(catalog: "Catalog", signature: Tuple) -> bytes:
+    """What an image was built from, apart from the inventory."""
+
+    menu_sig, _, alias_sig = signature
+    digest = hashlib.blake2b(digest_size=32)
+    parts = (
+        FORMAT_VERSION,
+        sys.byteorder,
+        DEFAULT_MENU_NAMES,
+        sorted(DEFAULT_MENU_PRICES.items()),
+        str(catalog.menu_path.resolve()),
+        menu_sig,
+        str(catalog.alias_path.resolve()),
+        alias_sig,
+    )
+    digest.update(repr(parts).encode("utf-8"))
+    return digest.digest()
+
+
+# -- writing ---------------------------------------------------------------
+
+
+def _strings(values: Iterable[str]) -> bytes:
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = array("I", [0])
+    for raw in encoded:
+        offsets.append(offsets[-1] + len(raw))
+    return array("I", [len(encoded)]).tobytes() + offsets.tobytes() + b"".join(encoded)
+
+
+def _column(values: Iterable[int], typecode: str) -> bytes:
+    return array(typecode, values).tobytes()
+
+
+def encode_snapshot(
+    snapshot: CatalogSnapshot, key: bytes, inventory: Tuple[int, int]
+) -> bytes:
+    """Serialize a snapshot built from the JSON files into an image."""
+
+    index = snapshot.menu_index
+    if index.tombstones:
+        raise ValueError("only freshly built snapshots can be written as an image")
+
+    slugs = list(snapshot.slugs)
+    grams = sorted(index.postings, key=lambda gram: gram.encode("utf-8"))
+    bounds, ids = [0], []
+    for gram in grams:
+        ids.extend(index.postings[gram])
+        bounds.append(len(ids))
+    aliases = [text for pair in snapshot.aliases.items() for text in pair]
+
+    sections: Dict[str, bytes] = {
+        "slugs": _strings(slugs),
+        "prices": _column((snapshot.prices.get(slug, 0) for slug in slugs), "q"),
+        "priced": _column((slug in snapshot.prices for slug in slugs), "B"),
+        "stock": _column((snapshot.stock.get(slug, -1) for slug in slugs), "q"),
+        "stocked": _column((slug in snapshot.stock for slug in slugs), "B"),
+        "beverages": _column((slug in snapshot.beverages for slug in slugs), "B"),
+        "synced": _column((snapshot.slug_ids[slug] for slug in snapshot.synced), "I"),
+        "aliases": _strings(aliases),
+        "menu_text": snapshot.menu_text.encode("utf-8"),
+        "ix_names": _strings(index.names),
+        "ix_processed": _strings(index.processed),
+        "ix_slugs": _strings(index.slugs),
+        "ix_grams": _strings(grams),
+        "ix_bounds": _column(bounds, "I"),
+        "ix_ids": _column(ids, "I"),
+    }
+
+    table_end = _HEADER.size + _SECTION.size * len(sections)
+    offset = -(-table_end // _ALIGN) * _ALIGN
+    entries, body = [], bytearray()
+    for name, data in sections.items():
+        entries.append(_SECTION.pack(name.encode("ascii"), offset + len(body), len(data)))
+        body += data + b"\0" * (-len(data) % _ALIGN)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(sections), key, *inventory)
+    head = header + b"".join(entries)
+    return head + b"\0" * (offset - len(head)) + bytes(body)
+
+
+# -- reading ---------------------------------------------------------------
+
+
+class StringTable(Sequence):
+    """Read-only sequence of the strings in a string table section."""
+
+    def __init__(self, view: memoryview) -> None:
+        count = view[:4].cast("I")[0]
+        self._offsets = view[4 : 8 + 4 * count].cast("I")
+        self._blob = view[8 + 4 * count :]
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def raw(self, idx: int) -> bytes:
+        return bytes(self._blob[self._offsets[idx] : self._offsets[idx + 1]])
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[pos] for pos in range(*idx.indices(self._count))]
+        if idx < 0:
+            idx += self._count
+        if not 0 <= idx < self._count:
+            raise IndexError(idx)
+        return str(self._blob[self._offsets[idx] : self._offsets[idx + 1]], "utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        blob, offsets = self._blob, self._offsets
+        for idx in range(self._count):
+            yield str(blob[offsets[idx] : offsets[idx + 1]], "utf-8")
+
+    def find(self, key: str, order: Optional[Sequence[int]] = None) -> int:
+        """Index of ``key``, or -1; the table (or ``order`` over it) must be sorted."""
+
+        target = key.encode("utf-8")
+        low, high = 0, self._count if order is None else len(order)
+        while low < high:
+            mid = (low + high) // 2
+            idx = mid if order is None else order[mid]
+            raw = self.raw(idx)
+            if raw == target:
+                return idx
+            if raw < target:
+                low = mid + 1
+            else:
+                high = mid
+        return -1
+
+
+class Postings(Mapping):
+    """``trigram -> ids`` of a menu index; ids are ``u32`` views into the image."""
+
+    def __init__(self, grams: StringTable, bounds: memoryview, ids: memoryview) -> None:
+        self._grams = grams
+        self._bounds = bounds
+        self._ids = ids
+
+    def __getitem__(self, gram: str) -> memoryview:
+        pos = self._grams.find(gram) if isinstance(gram, str) else -1
+        if pos < 0:
+            raise KeyError(gram)
+        return self._ids[self._bounds[pos] : self._bounds[pos + 1]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._grams)
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+
+class MappedMenuIndex(MenuIndex):
+    """:class:`MenuIndex` reading its tables and postings from an image."""
+
+    def __init__(
+        self,
+        version: int,
+        names: StringTable,
+        processed: StringTable,
+        slugs: StringTable,
+        postings: Postings,
+    ) -> None:
+        # _assign would copy everything into tuples
+        self.version = version
+        self.names = names  # type: ignore[assignment]
+        self.processed = processed  # type: ignore[assignment]
+        self.slugs = slugs  # type: ignore[assignment]
+        self.postings = postings  # type: ignore[assignment]
+        self.tombstones = 0
+        self.live = None
+
+    def updated(
+        self,
+        added: Iterable[Tuple[str, str]] = (),
+        removed: Iterable[Tuple[str, str]] = (),
+        version: int = 0,
+    ) -> MenuIndex:
+        # a sync continues on an ordinary copy; the image is rebuilt on the next start
+        index = MenuIndex.__new__(MenuIndex)
+        index._assign(
+            self.version,
+            list(self.names),
+            list(self.processed),
+            list(self.slugs),
+            {gram: tuple(ids) for gram, ids in self.postings.items()},
+            0,
+        )
+        return index.updated(added, removed, version)
+
+
+class CatalogImage:
+    """An image file mapped read-only; the mapping lives as long as its views."""
+
+    def __init__(self, path: Path) -> None:
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        if len(view) < _HEADER.size:
+            raise ValueError(f"{path} is not a catalog image")
+        magic, fmt, count, self.key, mtime, size = _HEADER.unpack_from(view)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a catalog image of format {FORMAT_VERSION}")
+        self.path = path
+        self.size = len(view)
+        self.inventory_signature = (mtime, size)
+        self.sections: Dict[str, memoryview] = {}
+        for pos in range(count):
+            name, offset, length = _SECTION.unpack_from(view, _HEADER.size + pos * _SECTION.size)
+            if offset + length > len(view):
+                raise ValueError(f"{path} is truncated")
+            self.sections[name.rstrip(b"\0").decode("ascii")] = view[offset : offset + length]
+
+    def snapshot(self, version: int) -> CatalogSnapshot:
+        section = self.sections
+        slugs = tuple(StringTable(section["slugs"]))
+        prices, stock = section["prices"].cast("q"), section["stock"].cast("q")
+        priced, stocked = section["priced"], section["stocked"]
+        beverages = section["beverages"]
+        aliases = list(StringTable(section["aliases"]))
+        index = MappedMenuIndex(
+            version,
+            StringTable(section["ix_names"]),
+            StringTable(section["ix_processed"]),
+            StringTable(section["ix_slugs"]),
+            Postings(
+                StringTable(section["ix_grams"]),
+                section["ix_bounds"].cast("I"),
+                section["ix_ids"].cast("I"),
+            ),
+        )
+        return CatalogSnapshot(
+            version=version,
+            slugs=slugs,
+            slug_ids=MappingProxyType({slug: idx for idx, slug in enumerate(slugs)}),
+            prices=MappingProxyType(
+                {slug: prices[idx] for idx, slug in enumerate(slugs) if priced[idx]}
+            ),
+            stock=MappingProxyType(
+                {slug: stock[idx] for idx, slug in enumerate(slugs) if stocked[idx]}
+            ),
+            price_array=prices,
+            stock_array=stock,
+            synced=tuple(slugs[idx] for idx in section["synced"].cast("I")),
+            beverages=frozenset(slug for idx, slug in enumerate(slugs) if beverages[idx]),
+            aliases=MappingProxyType(dict(zip(aliases[::2], aliases[1::2]))),
+            menu_index=index,
+            menu_text=str(section["menu_text"], "utf-8"),
+        )
+
+
+def open_image(path: Path, key: Optional[bytes] = None) -> Optional[CatalogImage]:
+    """The image at ``path``; None if it is missing, unreadable or not for ``key``."""
+
+    try:
+        image = CatalogImage(path)
+    except (OSError, ValueError):
+        return None
+    return image if key is None or image.key == key else None
+
+
+@contextmanager
+def _exclusive(path: Path) -> Iterator[None]:
+    # serializes builders across workers; the lock file is never removed
+    try:
+        import fcntl
+    except ImportError:  # no flock (Windows): concurrent builders only repeat work
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "a") as handle:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def _write(catalog: "Catalog", version: int, signature: Tuple, key: bytes) -> CatalogImage:
+    started = time.perf_counter()
+    snapshot = catalog.build(version)
+    write_bytes_atomic(catalog.image_path, encode_snapshot(snapshot, key, signature[1]))
+    image = CatalogImage(catalog.image_path)
+    logger.info(
+        "Catalog image %s written in %.1f ms (%d items, %.1f KiB)",
+        catalog.image_path,
+        (time.perf_counter() - started) * 1000,
+        len(snapshot.slugs),
+        image.size / 1024,
+    )
+    return image
+
+
+def load_snapshot(catalog: "Catalog", version: int, signature: Tuple) -> CatalogSnapshot:
+    """``catalog``'s snapshot served from its image, (re)building a stale one."""
+
+    path = catalog.image_path
+    key = image_key(catalog, signature)
+    image = open_image(path, key)
+    if image is None:
+        with _exclusive(path):
+            # another worker may have written it while we waited
+            image = open_image(path, key) or _write(catalog, version, signature, key)
+
+    snapshot = image.snapshot(version)
+    if image.inventory_signature == signature[1]:
+        return snapshot
+    stock = load_stock(catalog.menu_path, catalog.inventory_path)
+    if any(slug not in snapshot.slug_ids for slug in stock):
+        with _exclusive(path):
+            return _write(catalog, version, signature, key).snapshot(version)
+    return replace(
+        snapshot,
+        stock=MappingProxyType(stock),
+        stock_array=tuple(stock.get(slug, -1) for slug in snapshot.slugs),
+    )
+
+
+def describe(image: CatalogImage) -> List[str]:
+    lines = [f"{image.path}: {image.size / 1024:.1f} KiB, key {image.key.hex()[:16]}"]
+    for name, view in image.sections.items():
+        lines.append(f"  {name:<14}{len(view):>10} bytes")
+    return lines
+
+
+if __name__ == "__main__":
+    from utils.catalog import CATALOG
+
+    logging.basicConfig(level=logging.INFO)
+    if CATALOG.image_path is None:
+        sys.exit("CATALOG_IMAGE_DIR is empty: catalog images are disabled")
+    snapshot = CATALOG.snapshot()
+    print(f"catalog v{snapshot.version}: {len(snapshot.slugs)} items")
+    image = open_image(CATALOG.image_path)
+    print("\n".join(describe(image)) if image else "no image was written")
@@ -0,0 +1,102 @@
+"""Local stand-in for the Gemini client, used by benchmarks and offline runs.
+
+Enable it with ``LLM_BACKEND=fake``. It mimics the parts of
+``google.genai.Client`` that :mod:`utils.llm_client` touches
+(``client.aio.models.generate_content`` and ``generate_content_stream``)
+with configurable latency and failure rate.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import re
+from types import SimpleNamespace
+from typing import AsyncIterator, List, Optional
+
+FAKE_LATENCY = float(os.getenv("LLM_FAKE_LATENCY", "0.8"))
+FAKE_JITTER = float(os.getenv("LLM_FAKE_JITTER", "0.2"))
+FAKE_FAILURE_RATE = float(os.getenv("LLM_FAKE_FAILURE_RATE", "0.0"))
+FAKE_SEED = os.getenv("LLM_FAKE_SEED")
+
+_FAKE_ITEMS = ("indomie", "es_teh_manis", "nasi_goreng", "kopi_susu", "ayam_geprek")
+
+
+class FakeLLMError(Exception):
+    """Injected failure; ``code`` makes it look retryable like a 503."""
+
+    code = 503
+
+
+def _prompt_text(contents) -> str:
+    if isinstance(contents, str):
+        return contents
+    return " ".join(str(part.get("text", "")) for part in contents if isinstance(part, dict))
+
+
+class _FakeModels:
+    def __init__(self, owner: "FakeGeminiClient") -> None:
+        self._owner = owner
+
+    async def generate_content(self, model: str, contents, config=None):
+        await self._owner._delay()
+        return SimpleNamespace(text=self._owner.reply(_prompt_text(contents)), candidates=None)
+
+    async def generate_content_stream(self, model: str, contents, config=None):
+        owner = self._owner
+        reply = owner.reply(_prompt_text(contents))
+        await owner._delay(first_token=True)
+
+        async def chunks() -> AsyncIterator[SimpleNamespace]:
+            words = reply.split(" ")
+            step = max(1, len(words) // 4)
+            for start in range(0, len(words), step):
+                if start:
+                    await asyncio.sleep(owner.latency / 10)
+                yield SimpleNamespace(text=" ".join(words[start : start + step]) + " ")
+
+        return chunks()
+
+
+class FakeGeminiClient:
+    """Deterministic (when seeded) Gemini double with latency and failures."""
+
+    def __init__(
+        self,
+        latency: float = FAKE_LATENCY,
+        jitter: float = FAKE_JITTER,
+        failure_rate: float = FAKE_FAILURE_RATE,
+        seed: Optional[int] = int(FAKE_SEED) if FAKE_SEED else None,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self.aio = SimpleNamespace(models=_FakeModels(self))
+
+    async def _delay(self, first_token: bool = False) -> None:
+        self.calls += 1
+        base = self.latency / 3 if first_token else self.latency
+        await asyncio.sleep(max(0.0, base + self._random.uniform(-self.jitter, self.jitter)))
+        if self._random.random() < self.failure_rate:
+            raise FakeLLMError("fake backend failure")
+
+    def _items_for(self, text: str) -> List[dict]:
+        qty = re.search(r"\d+", text)
+        item = self._random.choice(_FAKE_ITEMS)
+        return [{"item": item, "qty": int(qty.group(0)) if qty else 1}]
+
+    def reply(self, prompt: str) -> str:
+        if "Texts: " in prompt:
+            try:
+                texts = json.loads(prompt.split("Texts: ", 1)[1])
+            except ValueError:
+                texts = []
+            results = [{"id": idx, "items": self._items_for(t)} for idx, t in enumerate(texts)]
+            return json.dumps({"results": results})
+        if "Text: " in prompt:
+            return json.dumps(self._items_for(prompt.split("Text: ", 1)[1]))
+        return "santai bro, warung buka kok, langsung aja order ya"
@@ -1,14 +1,32 @@
-"""Simple FAQ engine with fuzzy matching."""
+"""FAQ engine with a BM25 inverted index over ``data/faq.json``."""
 
 from __future__ import annotations
 
+import hashlib
+import json
+import logging
 import re
-from typing import Dict
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Mapping, Optional, Sequence, Tuple
 
-from thefuzz import fuzz, process
+from utils.catalog import CURRENT_TENANT, DATA_DIR, RELOAD_CHECK_INTERVAL, get_snapshot
+from utils.metrics import timed
 
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FAQ_PATH = DATA_DIR / "faq.json"
+
+# Built-in corpus used when data/faq.json is missing or empty. The "{menu}"
+# answer is filled in from the current catalog snapshot.
 FAQ_DATA: Dict[str, str] = {
-    "menu": "Menu kami: indomie, nasi goreng, ayam geprek, es teh manis, kopi susu.",
+    "menu": "{menu}",
     "jam buka": "WarungGo buka setiap hari dari 08.00 sampai 21.00 WIB.",
     "alamat": "Alamat WarungGo: Jl. Mawar No. 10, Jakarta.",
     "pembayaran": "Pembayaran bisa via tunai, QRIS, atau transfer bank BCA/Mandiri.",
@@ -16,7 +34,13 @@ FAQ_DATA: Dict[str, str] = {
 }
 
 DEFAULT_FAQ_ANSWER = "Maaf, saya belum menemukan jawabannya. Silakan hubungi admin."
-MIN_FAQ_SCORE = 60
+# Minimum calibrated confidence for an answer; see FaqIndex.search.
+MIN_FAQ_CONFIDENCE = 0.38
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Question and keyword text counts this many times the answer text.
+QUESTION_WEIGHT = 3
 
 
 def _normalize(text: str) -> str:
@@ -24,26 +48,252 @@ def _normalize(text: str) -> str:
     return re.sub(r"\s+", " ", cleaned).strip()
 
 
+def _terms(text: str) -> List[str]:
+    """Words plus character trigrams, so "bayar" still meets "pembayaran"."""
+
+    terms: List[str] = []
+    for word in _normalize(text).split():
+        terms.append(word)
+        padded = f"#{word}#"
+        terms.extend("#" + padded[i : i + 3] for i in range(len(padded) - 2))
+    return terms
+
+
+@dataclass(frozen=True)
+class FaqEntry:
+    question: str
+    answer: str
+    keywords: Tuple[str, ...] = ()
+
+    def digest(self) -> str:
+        raw = "\x1f".join((self.question, self.answer, *self.keywords))
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _entry_counts(entry: FaqEntry) -> Counter:
+    counts = Counter(_terms(entry.answer))
+    for text in (entry.question, *entry.keywords):
+        for term in _terms(text):
+            counts[term] += QUESTION_WEIGHT
+    return counts
+
+
+class FaqIndex:
+    """Immutable BM25 index: term -> (doc ids, precomputed weights).
+
+    Term counts are cached per entry digest, so rebuilding after a file
+    change only tokenizes the entries that actually changed.
+    """
+
+    def __init__(
+        self,
+        entries: Sequence[FaqEntry],
+        version: int = 0,
+        previous: Optional["FaqIndex"] = None,
+    ) -> None:
+        import numpy as np
+
+        reuse = previous._counts if previous is not None else {}
+        self.version = version
+        self.entries: Tuple[FaqEntry, ...] = tuple(entries)
+        self._counts: Dict[str, Counter] = {}
+        doc_counts = []
+        for entry in self.entries:
+            digest = entry.digest()
+            counts = reuse.get(digest)
+            if counts is None:
+                counts = _entry_counts(entry)
+            self._counts[digest] = counts
+            doc_counts.append(counts)
+
+        n_docs = len(doc_counts)
+        vocab: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        tfs: List[int] = []
+        for doc_id, counts in enumerate(doc_counts):
+            for term, tf in counts.items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        term_arr = np.array(term_ids, dtype=np.int64)
+        doc_arr = np.array(doc_ids, dtype=np.int32)
+        tf_arr = np.array(tfs, dtype=np.float64)
+
+        lengths = np.bincount(doc_arr, weights=tf_arr, minlength=n_docs)
+        avg_len = float(lengths.mean()) if n_docs else 1.0
+        df = np.bincount(term_arr, minlength=len(vocab)).astype(np.float64)
+        idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / (avg_len or 1.0))
+        weights = idf[term_arr] * tf_arr * (BM25_K1 + 1) / (tf_arr + norm[doc_arr])
+
+        # group the (term, doc, weight) triples into one posting list per term
+        order = np.argsort(term_arr, kind="stable")
+        bounds = np.searchsorted(term_arr[order], np.arange(len(vocab) + 1))
+        doc_sorted = doc_arr[order]
+        weight_sorted = weights[order].astype(np.float32)
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {
+            term: (doc_sorted[bounds[tid] : bounds[tid + 1]], weight_sorted[bounds[tid] : bounds[tid + 1]])
+            for term, tid in vocab.items()
+        }
+        # best weight any document reaches per term, for score calibration
+        self._ceiling: Dict[str, float] = {
+            term: float(weights.max()) for term, (_, weights) in self._postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def search(self, question: str, k: int = 3) -> List[Tuple[FaqEntry, float]]:
+        """Return up to ``k`` entries with a confidence in ``[0, 1]``.
+
+        Confidence is the BM25 score divided by the best score the query's
+        known terms could reach, scaled by the share of query terms the
+        corpus knows at all. That keeps the threshold stable across corpus
+        sizes and query lengths, and pushes chatter with a lucky trigram or
+        two below it.
+        """
+
+        import numpy as np
+
+        query_terms = set(_terms(question))
+        terms = [term for term in query_terms if term in self._postings]
+        if not terms or not self.entries:
+            return []
+        coverage = len(terms) / len(query_terms)
+
+        scores = np.zeros(len(self.entries), dtype=np.float32)
+        for term in terms:
+            ids, weights = self._postings[term]
+            scores[ids] += weights
+        ceiling = sum(self._ceiling[term] for term in terms) / coverage
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            (self.entries[idx], float(scores[idx]) / ceiling)
+            for idx in top.tolist()
+            if scores[idx] > 0
+        ]
+
+
+def load_faq_entries(path: Path = FAQ_PATH) -> List[FaqEntry]:
+    """Read FAQ entries from a list of objects or a question -> answer map."""
+
+    try:
+        raw = path.read_text(encoding="utf-8")
+        data = json.loads(raw) if raw.strip() else None
+    except (OSError, ValueError) as exc:
+        logger.warning("Cannot read FAQ corpus %s: %s", path, exc)
+        data = None
+
+    entries: List[FaqEntry] = []
+    if isinstance(data, Mapping):
+        data = [{"question": key, "answer": value} for key, value in data.items()]
+    if isinstance(data, list):
+        for row in data:
+            if not isinstance(row, Mapping) or not row.get("question") or not row.get("answer"):
+                continue
+            keywords = row.get("keywords") or ()
+            entries.append(
+                FaqEntry(
+                    question=str(row["question"]),
+                    answer=str(row["answer"]),
+                    keywords=tuple(str(word) for word in keywords),
+                )
+            )
+    if not entries:
+        entries = [FaqEntry(question=key, answer=value) for key, value in FAQ_DATA.items()]
+    return entries
+
+
+class FaqEngine:
+    """Serves answers from the current index and re-indexes on file change."""
+
+    def __init__(self, path: Path = FAQ_PATH, threshold: float = MIN_FAQ_CONFIDENCE) -> None:
+        self.path = path
+        self.threshold = threshold
+        self._index: Optional[FaqIndex] = None
+        self._signature: Tuple[int, int] = (-1, -1)
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _signature_now(self) -> Tuple[int, int]:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return (0, 0)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _reindex(self, signature: Tuple[int, int]) -> None:
+        try:
+            previous = self._index
+            version = previous.version + 1 if previous else 1
+            self._index = FaqIndex(load_faq_entries(self.path), version=version, previous=previous)
+            self._signature = signature
+            logger.info("FAQ index v%d built with %d entries", version, len(self._index))
+        except Exception:
+            logger.exception("FAQ re-index failed; keeping previous index")
+        finally:
+            self._lock.release()
+
+    def index(self) -> FaqIndex:
+        current = self._index
+        if current is None:
+            self._lock.acquire()
+            if self._index is None:
+                self._reindex(self._signature_now())
+            else:
+                self._lock.release()
+            return self._index
+
+        now = time.monotonic()
+        if now - self._checked_at >= RELOAD_CHECK_INTERVAL:
+            self._checked_at = now
+            signature = self._signature_now()
+            if signature != self._signature and self._lock.acquire(blocking=False):
+                threading.Thread(
+                    target=self._reindex, args=(signature,), name="faq-reindex", daemon=True
+                ).start()
+        return current
+
+    def search(self, question: str, k: int = 3) -> List[Tuple[FaqEntry, float]]:
+        return self.index().search(question, k=k)
+
+    def lookup(self, question: str) -> Optional[str]:
+        """Confident answer for ``question``, or None below the threshold."""
+
+        if not _normalize(question):
+            return None
+
+        hits = self.search(question, k=1)
+        if not hits or hits[0][1] < self.threshold:
+            return None
+
+        answer = hits[0][0].answer
+        if "{menu}" in answer:
+            answer = answer.replace("{menu}", get_snapshot().menu_text)
+        return answer
+
+    def answer(self, question: str) -> str:
+        answer = self.lookup(question)
+        return DEFAULT_FAQ_ANSWER if answer is None else answer
+
+
+FAQ_ENGINE = FaqEngine()
+
+
+def current_faq_engine() -> FaqEngine:
+    """The FAQ engine of the tenant being served, or :data:`FAQ_ENGINE`."""
+
+    tenant = CURRENT_TENANT.get()
+    return FAQ_ENGINE if tenant is None else tenant.faq
+
+
+@timed("get_faq_answer")
 def get_faq_answer(question: str) -> str:
     """Return the FAQ answer that best matches the given question."""
 
-    normalized_question = _normalize(question)
-    if not normalized_question:
-        return DEFAULT_FAQ_ANSWER
-
-    choices = list(FAQ_DATA.keys())
-    match = (
-        process.extractOne(
-            normalized_question, choices, scorer=fuzz.partial_ratio
-        )
-        if choices
-        else None
-    )
-    if not match:
-        return DEFAULT_FAQ_ANSWER
-
-    key, score = match
-    if score < MIN_FAQ_SCORE:
-        return DEFAULT_FAQ_ANSWER
-
-    return FAQ_DATA[key]
+    return current_faq_engine().answer(question)
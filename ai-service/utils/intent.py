@@ -0,0 +1,273 @@
+"""Local intent classifier: order / faq / promo / smalltalk.
+
+A linear softmax model over hashed character n-grams, word unigrams and a
+handful of keyword features. It is trained offline from
+``data/intent_corpus.json``::
+
+    cd ai-service
+    python -m utils.intent train      # writes data/intent_model.npz
+    python -m utils.intent "jam buka kapan"
+
+Scoring one message takes a few tens of microseconds. The trained weights
+are loaded on first use. If the model file is missing, the corpus is
+trained in-process once.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import re
+import sys
+import threading
+import weakref
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from utils.catalog import DATA_DIR, get_snapshot
+from utils.menu_index import MenuIndex
+from utils.metrics import timed
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CORPUS_PATH = DATA_DIR / "intent_corpus.json"
+MODEL_PATH = Path(os.getenv("INTENT_MODEL_PATH", DATA_DIR / "intent_model.npz"))
+# Below this probability callers should treat the label as unknown.
+INTENT_MIN_CONFIDENCE = float(os.getenv("INTENT_MIN_CONFIDENCE", "0.55"))
+
+LABELS: Tuple[str, ...] = ("order", "faq", "promo", "smalltalk")
+HASH_DIM = 4096
+NGRAM_RANGE = (2, 4)
+
+NUMBER_WORDS = {
+    "se", "satu", "dua", "tiga", "empat", "lima", "enam", "tujuh", "delapan",
+    "sembilan", "sepuluh", "sebelas", "belas", "puluh",
+}
+KEYWORDS: Dict[str, FrozenSet[str]] = {
+    "order_verb": frozenset(
+        "pesan pesen order minta mau beli tambah tambahin bungkus bungkusin "
+        "batal batalin kurangin ganti sekalian checkout".split()
+    ),
+    "question": frozenset(
+        "apa berapa kapan dimana mana gimana bagaimana bisa ga gak nggak kah ada".split()
+    ),
+    "promo": frozenset(
+        "promo diskon voucher cashback kupon potongan gratis hemat paket bundling "
+        "murah flash sale member poin combo".split()
+    ),
+    "greeting": frozenset(
+        "halo hai hi pagi siang sore malam makasih thanks terima kasih wkwk "
+        "wkwkwk hehe sip oke ok mantap".split()
+    ),
+}
+# keyword features live after the hashed buckets
+FEATURE_NAMES: Tuple[str, ...] = ("number", "menu", "question_mark") + tuple(KEYWORDS)
+FEATURE_DIM = HASH_DIM + len(FEATURE_NAMES)
+_FEATURE_IDS = {name: HASH_DIM + pos for pos, name in enumerate(FEATURE_NAMES)}
+
+
+def _normalize(text: str) -> str:
+    cleaned = re.sub(r"[^a-z0-9?\s]", " ", text.lower())
+    return re.sub(r"\s+", " ", cleaned).strip()
+
+
+def _bucket(gram: str) -> int:
+    return zlib.crc32(gram.encode("utf-8")) % HASH_DIM
+
+
+def _menu_words(index: Optional[MenuIndex] = None) -> FrozenSet[str]:
+    index = index or get_snapshot().menu_index
+    words = set()
+    for name in index.names:
+        words.update(word for word in _normalize(name).split() if len(word) >= 3)
+    return frozenset(words)
+
+
+def extract_features(text: str, menu_words: FrozenSet[str]) -> List[int]:
+    """Sorted, de-duplicated active feature ids for ``text``."""
+
+    normalized = _normalize(text)
+    words = normalized.replace("?", " ").split()
+    active = set()
+    padded = f" {normalized} "
+    low, high = NGRAM_RANGE
+    for n in range(low, high + 1):
+        for i in range(len(padded) - n + 1):
+            active.add(_bucket(padded[i : i + n]))
+    for word in words:
+        active.add(_bucket("w:" + word))
+        if word.isdigit() or word in NUMBER_WORDS:
+            active.add(_FEATURE_IDS["number"])
+        if word in menu_words:
+            active.add(_FEATURE_IDS["menu"])
+        for name, vocab in KEYWORDS.items():
+            if word in vocab:
+                active.add(_FEATURE_IDS[name])
+    if "?" in normalized:
+        active.add(_FEATURE_IDS["question_mark"])
+    return sorted(active)
+
+
+@dataclass(frozen=True)
+class IntentResult:
+    label: str
+    confidence: float
+    scores: Dict[str, float]
+
+    @property
+    def confident(self) -> bool:
+        return self.confidence >= INTENT_MIN_CONFIDENCE
+
+
+class IntentModel:
+    """Weights ``(FEATURE_DIM, len(labels))`` plus bias; rows are L2-normalized."""
+
+    def __init__(self, weights: "np.ndarray", bias: "np.ndarray", labels: Sequence[str]) -> None:
+        self.weights = weights
+        self.bias = bias
+        self.labels = tuple(labels)
+        # one entry per live menu index, i.e. per tenant being served
+        self._menu_words: "weakref.WeakKeyDictionary[MenuIndex, FrozenSet[str]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _menu(self) -> FrozenSet[str]:
+        # price/stock-only catalog updates keep the same index object
+        index = get_snapshot().menu_index
+        words = self._menu_words.get(index)
+        if words is None:
+            words = self._menu_words[index] = _menu_words(index)
+        return words
+
+    def predict(self, text: str) -> IntentResult:
+        import numpy as np
+
+        ids = extract_features(text, self._menu())
+        logits = self.bias.copy()
+        if ids:
+            logits += self.weights[ids].sum(axis=0) / math.sqrt(len(ids))
+        logits -= logits.max()
+        probs = np.exp(logits)
+        probs /= probs.sum()
+        best = int(probs.argmax())
+        return IntentResult(
+            label=self.labels[best],
+            confidence=round(float(probs[best]), 4),
+            scores={label: round(float(p), 4) for label, p in zip(self.labels, probs.tolist())},
+        )
+
+    def save(self, path: Path = MODEL_PATH) -> None:
+        import numpy as np
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as handle:
+            np.savez_compressed(
+                handle,
+                weights=self.weights.astype(np.float32),
+                bias=self.bias.astype(np.float32),
+                labels=np.array(self.labels),
+                hash_dim=np.array(HASH_DIM),
+                features=np.array(FEATURE_NAMES),
+            )
+
+    @classmethod
+    def load(cls, path: Path = MODEL_PATH) -> "IntentModel":
+        import numpy as np
+
+        with np.load(path) as data:
+            if int(data["hash_dim"]) != HASH_DIM or tuple(data["features"]) != FEATURE_NAMES:
+                raise ValueError("intent model was trained with different features")
+            return cls(data["weights"], data["bias"], [str(label) for label in data["labels"]])
+
+
+def load_corpus(path: Path = CORPUS_PATH) -> List[Tuple[str, str]]:
+    rows = json.loads(path.read_text(encoding="utf-8"))
+    return [
+        (str(row["text"]), str(row["intent"]))
+        for row in rows
+        if row.get("text") and row.get("intent") in LABELS
+    ]
+
+
+def train(
+    samples: Sequence[Tuple[str, str]],
+    epochs: int = 600,
+    learning_rate: float = 4.0,
+    l2: float = 1e-5,
+) -> IntentModel:
+    """Full-batch softmax regression; a few hundred samples train in about a second."""
+
+    import numpy as np
+
+    menu_words = _menu_words()
+    features = np.zeros((len(samples), FEATURE_DIM), dtype=np.float32)
+    targets = np.zeros((len(samples), len(LABELS)), dtype=np.float32)
+    for row, (text, label) in enumerate(samples):
+        ids = extract_features(text, menu_words)
+        if ids:
+            features[row, ids] = 1.0 / math.sqrt(len(ids))
+        targets[row, LABELS.index(label)] = 1.0
+
+    weights = np.zeros((FEATURE_DIM, len(LABELS)), dtype=np.float32)
+    bias = np.zeros(len(LABELS), dtype=np.float32)
+    for _ in range(epochs):
+        logits = features @ weights + bias
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        grad = (probs - targets) / len(samples)
+        weights -= learning_rate * (features.T @ grad + l2 * weights)
+        bias -= learning_rate * grad.sum(axis=0)
+    return IntentModel(weights, bias, LABELS)
+
+
+_model: Optional[IntentModel] = None
+_model_lock = threading.Lock()
+
+
+def get_model() -> IntentModel:
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                try:
+                    _model = IntentModel.load(MODEL_PATH)
+                except (OSError, ValueError, KeyError) as exc:
+                    logger.warning("Intent model unavailable (%s); training from corpus", exc)
+                    _model = train(load_corpus())
+    return _model
+
+
+@timed("classify_intent")
+def classify(text: str) -> IntentResult:
+    """Predict the intent of one customer message."""
+
+    return get_model().predict(text)
+
+
+def _cross_validate(samples: List[Tuple[str, str]], folds: int = 5) -> float:
+    correct = 0
+    for fold in range(folds):
+        held = [s for i, s in enumerate(samples) if i % folds == fold]
+        model = train([s for i, s in enumerate(samples) if i % folds != fold])
+        correct += sum(model.predict(text).label == label for text, label in held)
+    return correct / len(samples)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["train"]:
+        corpus = load_corpus()
+        print(f"{len(corpus)} samples, 5-fold accuracy {_cross_validate(corpus):.3f}")
+        model = train(corpus)
+        model.save(MODEL_PATH)
+        print(f"model written to {MODEL_PATH}")
+    else:
+        for message in sys.argv[1:]:
+            print(message, "->", classify(message))
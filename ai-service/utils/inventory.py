@@ -0,0 +1,394 @@
+"""Stock reservations with per-item locks and write-behind persistence.
+
+Stock levels are loaded from the catalog files once and are then owned by
+:class:`InventoryEngine`. An order first *reserves* stock, then either
+*commits* the hold (stock leaves the shelf) or *releases* it. Holds that are
+not committed within ``INVENTORY_HOLD_TTL`` seconds are released
+automatically.
+
+Every item has its own lock, so orders for different items never wait on
+each other. A multi-item reservation takes its locks in slug order and is
+all-or-nothing. Items without a stock entry are treated as unlimited.
+
+Reads are served from memory. A background thread writes committed levels
+back to ``data/inventory.json`` at most every ``INVENTORY_FLUSH_INTERVAL``
+seconds, as one atomic replace. When the file is rewritten by someone else
+(the Sheets sync), the synced counts become the new on-hand levels and open
+holds are carried over.
+
+Holds live in one process's memory, so only one worker may take them. The
+first engine to start on an inventory file takes an exclusive lock on
+``inventory.json.lock`` and owns that file's stock. Engines in other
+workers serve levels (reloaded from the owner's write-backs) but raise
+:class:`InventoryNotOwner` on reserve, commit and release. They take over
+when the owning worker exits. Put the reservation endpoints behind one
+worker, or run a single worker per tenant.
+
+Each tenant (``X-Tenant-ID``) has its own engine over its own
+``inventory.json``. Engines are kept for the life of the process, so
+evicting a tenant from the tenant cache never drops open holds.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.catalog import (
+    INVENTORY_PATH,
+    MENU_PATH,
+    current_catalog,
+    _file_signature,
+    _read_json,
+    load_stock,
+    write_json_atomic,
+)
+from utils.metrics import INVENTORY_OPS, count
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_FLUSH_INTERVAL = float(os.getenv("INVENTORY_FLUSH_INTERVAL", "2.0"))
+INVENTORY_HOLD_TTL = float(os.getenv("INVENTORY_HOLD_TTL", "900"))
+
+# (slug, requested, available)
+Shortage = Tuple[str, int, int]
+
+
+class InventoryNotOwner(RuntimeError):
+    """Another worker owns this inventory file's holds."""
+
+
+@dataclass
+class StockLevel:
+    """Mutable stock of one item; only touched while holding ``lock``."""
+
+    on_hand: int
+    reserved: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def available(self) -> int:
+        return max(self.on_hand - self.reserved, 0)
+
+
+@dataclass(frozen=True)
+class Reservation:
+    id: str
+    lines: Tuple[Tuple[str, int], ...]
+    expires_at: float
+    jid: Optional[str] = None
+
+
+class InventoryEngine:
+    """Reserve / commit / release against in-memory stock; see module docs."""
+
+    def __init__(
+        self,
+        path: Path = INVENTORY_PATH,
+        menu_path: Path = MENU_PATH,
+        flush_interval: float = INVENTORY_FLUSH_INTERVAL,
+        hold_ttl: float = INVENTORY_HOLD_TTL,
+    ) -> None:
+        self.path = path
+        self.menu_path = menu_path
+        self.flush_interval = flush_interval
+        self.hold_ttl = hold_ttl
+        self._levels: Dict[str, StockLevel] = {}
+        self._holds: Dict[str, Reservation] = {}
+        self._ids = itertools.count(1)
+        self._prefix = f"{os.getpid():x}{int(time.time()) & 0xFFFFFF:06x}"
+        self._dirty = threading.Event()
+        self._stop = threading.Event()
+        # serializes flushes and reconciles, never taken on the reserve path
+        self._io_lock = threading.Lock()
+        self._written: Tuple[int, int] = (0, 0)
+        self._flusher: Optional[threading.Thread] = None
+        self._stats: Dict[str, int] = {"flushes": 0, "reconciles": 0, "expired": 0}
+        # open for the life of the process; its flock marks the owning worker
+        self._owner_lock = None
+        self.owner = False
+
+    def start(self) -> "InventoryEngine":
+        """Load levels from the catalog files and start the write-behind thread."""
+
+        with self._io_lock:
+            if self._flusher is not None:
+                return self
+            self._written = _file_signature(self.path)
+            for slug, qty in load_stock(self.menu_path, self.path).items():
+                self._levels[slug] = StockLevel(on_hand=max(qty, 0))
+            if not self._claim():
+                logger.warning(
+                    "Inventory %s is owned by another worker; reservations are refused here",
+                    self.path,
+                )
+            self._flusher = threading.Thread(
+                target=self._run, name="inventory-flush", daemon=True
+            )
+            self._flusher.start()
+        return self
+
+    def _claim(self) -> bool:
+        """Try to become the owning worker of this file; True if we are."""
+
+        if self.owner:
+            return True
+        try:
+            import fcntl
+        except ImportError:  # no flock (Windows): a single worker is assumed
+            self.owner = True
+            return True
+        if self._owner_lock is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._owner_lock = open(self.path.with_name(self.path.name + ".lock"), "a")
+        try:
+            fcntl.flock(self._owner_lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        self.owner = True
+        return True
+
+    def _require_owner(self) -> None:
+        if self.owner:
+            return
+        with self._io_lock:
+            if not self._claim():
+                raise InventoryNotOwner(f"stock of {self.path.name} is held by another worker")
+            # the previous owner is gone: start from what it wrote back
+            self._reconcile_locked()
+
+    def close(self) -> None:
+        """Stop the background thread, write any pending changes and hand over ownership."""
+
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=self.flush_interval + 5)
+        self.flush()
+        if self._owner_lock is not None:
+            # closing the file drops the flock; another worker can claim the stock
+            self._owner_lock.close()
+            self._owner_lock = None
+            self.owner = False
+
+    def level(self, slug: str) -> Optional[StockLevel]:
+        return self._levels.get(slug)
+
+    def levels(self) -> Dict[str, Tuple[int, int, int]]:
+        """``slug -> (on_hand, reserved, available)`` for every tracked item."""
+
+        return {
+            slug: (level.on_hand, level.reserved, level.available)
+            for slug, level in list(self._levels.items())
+        }
+
+    def reserve(
+        self, items: Iterable[Tuple[str, int]], jid: Optional[str] = None, ttl: Optional[float] = None
+    ) -> Tuple[Optional[Reservation], List[Shortage]]:
+        """Hold stock for all ``items`` or none of them.
+
+        Returns ``(reservation, [])`` on success and ``(None, shortages)``
+        when any tracked item has too little available. Raises
+        :class:`InventoryNotOwner` in a worker that does not own the file.
+        """
+
+        self._require_owner()
+        wanted: Dict[str, int] = {}
+        for slug, qty in items:
+            if qty > 0:
+                wanted[slug] = wanted.get(slug, 0) + qty
+        while True:
+            pairs = [(slug, self._levels.get(slug)) for slug in sorted(wanted)]
+            tracked = [slug for slug, level in pairs if level is not None]
+            levels = [level for _, level in pairs if level is not None]
+
+            # sorted acquisition order: two multi-item orders cannot deadlock
+            for level in levels:
+                level.lock.acquire()
+            try:
+                # a reconcile may have dropped a level before we locked it
+                stale = any(self._levels.get(slug) is not level for slug, level in pairs)
+                if not stale:
+                    shortages = [
+                        (slug, wanted[slug], level.available)
+                        for slug, level in zip(tracked, levels)
+                        if level.available < wanted[slug]
+                    ]
+                    if not shortages:
+                        for slug, level in zip(tracked, levels):
+                            level.reserved += wanted[slug]
+            finally:
+                for level in reversed(levels):
+                    level.lock.release()
+            if not stale:
+                break
+        if shortages:
+            count(INVENTORY_OPS, "reserve", "short")
+            return None, shortages
+
+        reservation = Reservation(
+            id=f"{self._prefix}-{next(self._ids)}",
+            lines=tuple((slug, wanted[slug]) for slug in tracked),
+            expires_at=time.time() + (self.hold_ttl if ttl is None else ttl),
+            jid=jid,
+        )
+        self._holds[reservation.id] = reservation
+        count(INVENTORY_OPS, "reserve", "ok")
+        return reservation, []
+
+    def commit(self, reservation_id: str) -> Optional[Reservation]:
+        """Take the held stock off the shelf; None if the hold is unknown or expired."""
+
+        self._require_owner()
+        reservation = self._holds.pop(reservation_id, None)
+        if reservation is None:
+            count(INVENTORY_OPS, "commit", "unknown")
+            return None
+        for slug, qty in reservation.lines:
+            level = self._levels.get(slug)
+            if level is None:
+                continue
+            with level.lock:
+                level.reserved = max(level.reserved - qty, 0)
+                level.on_hand = max(level.on_hand - qty, 0)
+        self._dirty.set()
+        count(INVENTORY_OPS, "commit", "ok")
+        return reservation
+
+    def release(self, reservation_id: str, outcome: str = "ok") -> Optional[Reservation]:
+        """Give held stock back; None if the hold is unknown."""
+
+        self._require_owner()
+        # dict.pop is atomic: a hold is committed or released exactly once
+        reservation = self._holds.pop(reservation_id, None)
+        if reservation is None:
+            count(INVENTORY_OPS, "release", "unknown")
+            return None
+        for slug, qty in reservation.lines:
+            level = self._levels.get(slug)
+            if level is None:
+                continue
+            with level.lock:
+                level.reserved = max(level.reserved - qty, 0)
+        count(INVENTORY_OPS, "release", outcome)
+        return reservation
+
+    def expire_holds(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        expired = [rid for rid, hold in list(self._holds.items()) if hold.expires_at <= now]
+        released = sum(self.release(rid, outcome="expired") is not None for rid in expired)
+        self._stats["expired"] += released
+        return released
+
+    def reconcile(self) -> bool:
+        """Adopt the counts in the files if someone else rewrote them.
+
+        Synced counts replace ``on_hand``. Open holds are kept, so an item
+        that was synced below its reserved quantity simply shows 0
+        available. Returns True if anything was reloaded.
+        """
+
+        with self._io_lock:
+            return self._reconcile_locked()
+
+    def _reconcile_locked(self) -> bool:
+        signature = _file_signature(self.path)
+        if signature == self._written:
+            return False
+        if signature != (0, 0) and not isinstance(_read_json(self.path), dict):
+            # caught mid-write or malformed: keep current levels, retry next tick
+            return False
+        synced = load_stock(self.menu_path, self.path)
+        for slug, qty in synced.items():
+            level = self._levels.get(slug)
+            if level is None:
+                self._levels[slug] = StockLevel(on_hand=max(qty, 0))
+                continue
+            with level.lock:
+                level.on_hand = max(qty, 0)
+        for slug in [slug for slug in self._levels if slug not in synced]:
+            # dropped by the sync; items still held stay tracked until released.
+            # Under the lock, so a reserve() that got the level first keeps it.
+            level = self._levels[slug]
+            with level.lock:
+                if not level.reserved:
+                    del self._levels[slug]
+        self._written = signature
+        self._dirty.clear()
+        self._stats["reconciles"] += 1
+        logger.info("Inventory reconciled with %s (%d items)", self.path.name, len(synced))
+        return True
+
+    def flush(self) -> bool:
+        """Write committed levels now if anything changed; True if written."""
+
+        with self._io_lock:
+            self._reconcile_locked()
+            if not self._dirty.is_set():
+                return False
+            self._dirty.clear()
+            counts = {slug: level.on_hand for slug, level in list(self._levels.items())}
+            try:
+                write_json_atomic(self.path, counts)
+            except OSError:
+                self._dirty.set()
+                logger.exception("Inventory write-back to %s failed", self.path)
+                return False
+            self._written = _file_signature(self.path)
+            self._stats["flushes"] += 1
+            return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.expire_holds()
+                self.flush()
+            except Exception:
+                logger.exception("Inventory background flush failed")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "items": len(self._levels),
+            "holds": len(self._holds),
+            "pending_write": int(self._dirty.is_set()),
+            "owner": int(self.owner),
+            **self._stats,
+        }
+
+
+# one engine per inventory file: the default catalog's and each tenant's
+_engines: Dict[Path, InventoryEngine] = {}
+_engine_lock = threading.Lock()
+
+
+def get_inventory() -> InventoryEngine:
+    """The engine of the tenant being served, or of ``data/inventory.json``."""
+
+    catalog = current_catalog()
+    engine = _engines.get(catalog.inventory_path)
+    if engine is None:
+        with _engine_lock:
+            engine = _engines.get(catalog.inventory_path)
+            if engine is None:
+                engine = InventoryEngine(catalog.inventory_path, catalog.menu_path).start()
+                _engines[catalog.inventory_path] = engine
+    return engine
+
+
+def reconcile_inventory(path: Path = INVENTORY_PATH) -> bool:
+    """Adopt freshly synced stock; no-op if the file's engine was never used."""
+
+    engine = _engines.get(path)
+    return engine.reconcile() if engine is not None else False
+
+
+def close_inventory() -> None:
+    """Flush pending stock changes of every engine that was used."""
+
+    for engine in list(_engines.values()):
+        engine.close()
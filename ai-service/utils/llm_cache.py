@@ -0,0 +1,182 @@
+"""Two-tier response cache for LLM prompts: in-process LRU plus SQLite."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parents[1] / ".cache" / "llm_cache.sqlite3"
+
+CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+CACHE_DISK_SIZE = int(os.getenv("LLM_CACHE_DISK_SIZE", "20000"))
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", str(DEFAULT_CACHE_PATH))
+
+# Disk eviction is amortised: trim only every N writes.
+_DISK_TRIM_EVERY = 64
+
+
+def normalize_prompt(prompt: str) -> str:
+    return re.sub(r"\s+", " ", prompt).strip().casefold()
+
+
+def make_key(prompt: str, model: str, json_mode: bool = False) -> str:
+    raw = f"{model}\x1f{int(json_mode)}\x1f{normalize_prompt(prompt)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """LRU memory tier in front of an optional persistent SQLite tier.
+
+    Entries carry their own expiry; the memory tier is bounded by entry count
+    and the disk tier by row count (least recently used rows go first).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_SIZE,
+        disk_path: Optional[str] = CACHE_PATH,
+        disk_max_entries: int = CACHE_DISK_SIZE,
+        default_ttl: float = CACHE_TTL,
+    ) -> None:
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+        self.default_ttl = default_ttl
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes = 0
+        self._stats: Dict[str, int] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+        if disk_path:
+            self._open_disk(Path(disk_path))
+
+    def _open_disk(self, path: Path) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)"
+            )
+        except sqlite3.Error as exc:
+            logger.warning("LLM disk cache disabled (%s): %s", path, exc)
+            return
+        self._db = db
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+                self._stats["expired"] += 1
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row and row[1] > now:
+                        self._db.execute(
+                            "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key)
+                        )
+                        self._remember(key, row[0], row[1])
+                        self._stats["disk_hits"] += 1
+                        return row[0]
+                    if row:
+                        self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                        self._stats["expired"] += 1
+                except sqlite3.Error as exc:
+                    logger.warning("LLM disk cache read failed: %s", exc)
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        now = time.time()
+        expires_at = now + ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self._stats["stores"] += 1
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    (key, value, expires_at, now),
+                )
+                self._writes += 1
+                if self._writes % _DISK_TRIM_EVERY == 0:
+                    self._trim_disk(now)
+            except sqlite3.Error as exc:
+                logger.warning("LLM disk cache write failed: %s", exc)
+
+    def _trim_disk(self, now: float) -> None:
+        self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        self._db.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            " SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_entries,),
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats: Dict[str, float] = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            if self._db is not None:
+                try:
+                    stats["disk_entries"] = self._db.execute(
+                        "SELECT COUNT(*) FROM llm_cache"
+                    ).fetchone()[0]
+                except sqlite3.Error:
+                    stats["disk_entries"] = -1
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        )
+        return stats
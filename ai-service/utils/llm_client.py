@@ -1,30 +1,63 @@
 import os
+import time
 import logging
 import asyncio
-from typing import Optional
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Optional
 
-from dotenv import load_dotenv
-from google import genai
+from utils.admission import ADMISSION
+from utils.llm_cache import LLMCache, make_key
+from utils.llm_resilience import CircuitBreaker, SingleFlight
+from utils.metrics import LLM_CALLS, LLM_IN_FLIGHT, LLM_SECONDS, count, enabled, timed
 
-load_dotenv()
+if TYPE_CHECKING:
+    from google import genai
+
+# .env and logging are set up by the entrypoint (utils.startup.configure)
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 API_KEY = os.getenv("GEMINI_API_KEY")
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "15"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "0.3"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+_client: Optional["genai.Client"] = None
+_cache: Optional[LLMCache] = None
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+_inflight: SingleFlight[Optional[str]] = SingleFlight()
+
+def warmup_client() -> bool:
+    """Build the client now instead of on the first LLM call."""
+    client = _get_client()
+    if client is not None:
+        logger.info("Gemini client warmed up.")
+    return client is not None
 
-_client: Optional[genai.Client] = None
 
-def warmup_client():
-    _get_client()
-    logger.info("Gemini client warmed up.")
+def set_client(client) -> None:
+    """Swap the backend client (e.g. a fake for benchmarks); None resets it."""
+    global _client
+    _client = client
 
 
 def _get_client():
     global _client
-    if not API_KEY:
+    if _client is None and LLM_BACKEND == "fake":
+        from utils.fake_llm import FakeGeminiClient
+
+        _client = FakeGeminiClient()
+    if not API_KEY and _client is None:
         return None
     if _client is None:
+        # google.genai is the slowest import of the service, so load it late
+        from google import genai
+
         # enforce correct API version just like Google AI Studio uses
         _client = genai.Client(
             api_key=API_KEY,
@@ -33,32 +66,284 @@ def _get_client():
     return _client
 
 
-async def ask_llm(prompt: str) -> Optional[str]:
+def get_cache() -> LLMCache:
+    global _cache
+    if _cache is None:
+        _cache = LLMCache()
+    return _cache
+
+
+def cache_stats() -> dict:
+    return get_cache().stats()
+
+
+def _extract_text(resp) -> Optional[str]:
+    # Stable extraction—Google's format berubah2
+    if hasattr(resp, "text") and resp.text:
+        return resp.text.strip()
+
+    if resp.candidates:
+        parts = resp.candidates[0].content.parts
+        for p in parts:
+            if hasattr(p, "text") and p.text:
+                return p.text.strip()
+
+    return None
+
+
+def _get_semaphore(model: str) -> asyncio.Semaphore:
+    sem = _semaphores.get(model)
+    if sem is None:
+        sem = _semaphores[model] = asyncio.Semaphore(LLM_CONCURRENCY)
+    return sem
+
+
+def _get_breaker(model: str) -> CircuitBreaker:
+    breaker = _breakers.get(model)
+    if breaker is None:
+        breaker = _breakers[model] = CircuitBreaker(
+            failure_threshold=LLM_BREAKER_FAILURES, reset_timeout=LLM_BREAKER_RESET
+        )
+    return breaker
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    code = getattr(exc, "code", None)
+    return not isinstance(code, int) or code == 429 or code >= 500
+
+
+async def _generate(client, model: str, prompt: str, json_mode: bool) -> Optional[str]:
+    last_error: Optional[Exception] = None
+    for attempt in range(LLM_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(LLM_RETRY_BACKOFF * (2 ** (attempt - 1)))
+        try:
+            resp = await client.aio.models.generate_content(
+                model=model,
+                contents=[{"text": prompt}],
+                config={"response_mime_type": "application/json"} if json_mode else None,
+            )
+            return _extract_text(resp)
+        except Exception as e:
+            last_error = e
+            if not _is_retryable(e):
+                break
+            logger.warning(f"Gemini attempt {attempt + 1} failed: {e}")
+    raise last_error
+
+
+async def _call_llm(
+    client, model: str, prompt: str, json_mode: bool, deadline: float
+) -> Optional[str]:
+    breaker = _get_breaker(model)
+    if not breaker.allow():
+        logger.warning("Gemini circuit open, skipping call.")
+        count(LLM_CALLS, "circuit_open")
+        return None
+
+    loop = asyncio.get_running_loop()
+    expires = loop.time() + deadline
+    sem = _get_semaphore(model)
+    try:
+        await asyncio.wait_for(sem.acquire(), timeout=deadline)
+    except asyncio.TimeoutError:
+        breaker.abandon()
+        logger.warning("Gemini queue wait exceeded deadline.")
+        count(LLM_CALLS, "queue_timeout")
+        return None
+    except asyncio.CancelledError:
+        breaker.abandon()
+        raise
+
+    ok = False
+    measured = enabled()
+    if measured:
+        LLM_IN_FLIGHT.inc()
+        started = time.perf_counter()
+    try:
+        text = await asyncio.wait_for(
+            _generate(client, model, prompt, json_mode),
+            timeout=max(expires - loop.time(), 0.0),
+        )
+        ok = True
+        return text
+    except Exception as e:
+        logger.error(f"Gemini error: {e!r}")
+        return None
+    finally:
+        sem.release()
+        if measured:
+            LLM_IN_FLIGHT.dec()
+            LLM_SECONDS.observe(time.perf_counter() - started, "ok" if ok else "error")
+        if ok:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+
+@timed("ask_llm")
+async def ask_llm(
+    prompt: str,
+    json_mode: bool = False,
+    use_cache: bool = True,
+    cache_ttl: Optional[float] = None,
+    timeout: Optional[float] = None,
+    model: Optional[str] = None,
+) -> Optional[str]:
+    model = model or GEMINI_MODEL
+    # identical prompts (after whitespace/case normalization) reuse the answer
+    key = make_key(prompt, model, json_mode)
+    if use_cache:
+        cached = get_cache().get(key)
+        if cached is not None:
+            count(LLM_CALLS, "cache_hit")
+            return cached
+
     client = _get_client()
     if client is None:
         logger.warning("No API key configured.")
+        count(LLM_CALLS, "no_client")
         return None
 
+    # concurrent callers with the same prompt share one Gemini request;
+    # the deadline covers queueing on the semaphore, retries and the call
+    deadline = LLM_TIMEOUT if timeout is None else timeout
     try:
-        resp = await asyncio.to_thread(
-            client.models.generate_content,
-            model=GEMINI_MODEL,
-            contents=[{"text": prompt}],
+        text = await asyncio.wait_for(
+            _inflight.do(key, lambda: _call_llm(client, model, prompt, json_mode, deadline)),
+            timeout=deadline,
         )
+    except asyncio.TimeoutError:
+        logger.warning(f"Gemini call exceeded {deadline}s deadline.")
+        count(LLM_CALLS, "timeout")
+        return None
 
-        # Stable extraction—Google's format berubah2
-        if hasattr(resp, "text") and resp.text:
-            return resp.text.strip()
-
-        if resp.candidates:
-            parts = resp.candidates[0].content.parts
-            for p in parts:
-                if hasattr(p, "text") and p.text:
-                    return p.text.strip()
-
+    if not text:
         logger.warning("LLM returned empty.")
+        count(LLM_CALLS, "empty")
         return None
 
+    count(LLM_CALLS, "ok")
+    if use_cache:
+        get_cache().set(key, text, ttl=cache_ttl)
+    return text
+
+
+async def stream_llm(
+    prompt: str,
+    use_cache: bool = True,
+    cache_ttl: Optional[float] = None,
+    timeout: Optional[float] = None,
+    model: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """Yield reply text chunks as Gemini produces them.
+
+    Yields nothing when the LLM is unavailable; callers pick their own
+    fallback. ``timeout`` bounds the wait for the first chunk and every
+    gap between chunks. Closing the generator early (client disconnect)
+    releases the concurrency slot without tripping the circuit breaker.
+    """
+    model = model or GEMINI_MODEL
+    key = make_key(prompt, model, False)
+    if use_cache:
+        cached = get_cache().get(key)
+        if cached is not None:
+            count(LLM_CALLS, "cache_hit")
+            yield cached
+            return
+
+    client = _get_client()
+    if client is None:
+        logger.warning("No API key configured.")
+        count(LLM_CALLS, "no_client")
+        return
+
+    breaker = _get_breaker(model)
+    if not breaker.allow():
+        logger.warning("Gemini circuit open, skipping stream.")
+        count(LLM_CALLS, "circuit_open")
+        return
+
+    deadline = LLM_TIMEOUT if timeout is None else timeout
+    sem = _get_semaphore(model)
+    try:
+        await asyncio.wait_for(sem.acquire(), timeout=deadline)
+    except asyncio.TimeoutError:
+        breaker.abandon()
+        logger.warning("Gemini queue wait exceeded deadline.")
+        count(LLM_CALLS, "queue_timeout")
+        return
+    except asyncio.CancelledError:
+        breaker.abandon()
+        raise
+
+    parts = []
+    outcome = None
+    stream = None
+    measured = enabled()
+    if measured:
+        LLM_IN_FLIGHT.inc()
+        started = time.perf_counter()
+    try:
+        stream = await asyncio.wait_for(
+            client.aio.models.generate_content_stream(
+                model=model, contents=[{"text": prompt}]
+            ),
+            timeout=deadline,
+        )
+        chunks = stream.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=deadline)
+            except StopAsyncIteration:
+                break
+            text = getattr(chunk, "text", None)
+            if text:
+                parts.append(text)
+                yield text
+        outcome = True
+    except asyncio.TimeoutError:
+        outcome = False
+        logger.warning(f"Gemini stream exceeded {deadline}s between chunks.")
+        count(LLM_CALLS, "timeout")
     except Exception as e:
-        logger.error(f"Gemini error: {e}")
-        return None
+        outcome = False
+        logger.error(f"Gemini stream error: {e!r}")
+        count(LLM_CALLS, "error")
+    finally:
+        sem.release()
+        if measured:
+            LLM_IN_FLIGHT.dec()
+            LLM_SECONDS.observe(time.perf_counter() - started, "ok" if outcome else "error")
+        if stream is not None and hasattr(stream, "aclose"):
+            try:
+                await stream.aclose()
+            except Exception:
+                pass
+        if outcome is True:
+            breaker.record_success()
+        elif outcome is False:
+            breaker.record_failure()
+        else:
+            breaker.abandon()
+
+    reply = "".join(parts).strip()
+    if outcome and not reply:
+        logger.warning("LLM stream returned empty.")
+        count(LLM_CALLS, "empty")
+    elif outcome:
+        count(LLM_CALLS, "ok")
+        if use_cache:
+            get_cache().set(key, reply, ttl=cache_ttl)
+
+
+def llm_status() -> dict:
+    return {
+        "model": GEMINI_MODEL,
+        "in_flight": len(_inflight),
+        "coalesced": _inflight.coalesced,
+        "breakers": {name: b.snapshot() for name, b in _breakers.items()},
+        "admission": ADMISSION.snapshot(),
+    }
@@ -0,0 +1,254 @@
+"""Precompiled fuzzy matching index over the menu catalog."""
+
+from __future__ import annotations
+
+import heapq
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# numpy / rapidfuzz / thefuzz are imported on first use so that importing the
+# routers stays cheap on a cold worker; utils.startup can pre-load them.
+
+MIN_MATCH_SCORE = 55
+# Catalogs up to this size are scored exhaustively, exactly like the old
+# linear scan; bigger ones are narrowed down through the trigram postings.
+FULL_SCAN_LIMIT = 64
+SHORTLIST_SIZE = 32
+# Trigrams shared by more entries than this carry almost no signal and are
+# skipped while shortlisting so lookups do not grow with the catalog.
+STOP_GRAM_LIMIT = 512
+
+
+def slugify(text: str) -> str:
+    slug = re.sub(r"[^a-z0-9\s]", "", text.lower())
+    return re.sub(r"\s+", "_", slug).strip("_")
+
+
+def normalize_slug(value: str) -> str:
+    """Slugify a value that may already use underscores as separators."""
+
+    return slugify(value.replace("_", " "))
+
+
+def _process(text: str) -> str:
+    from thefuzz.utils import full_process
+
+    return full_process(text, force_ascii=True)
+
+
+def _trigrams(processed: str) -> set:
+    padded = f"  {processed} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _build_postings(processed: Sequence[str]) -> Dict[str, Tuple[int, ...]]:
+    postings: Dict[str, List[int]] = {}
+    for idx, key in enumerate(processed):
+        for gram in _trigrams(key):
+            postings.setdefault(gram, []).append(idx)
+    return {gram: tuple(ids) for gram, ids in postings.items()}
+
+
+class MenuIndex:
+    """Immutable trigram index over menu names and their aliases.
+
+    :meth:`updated` derives a new index after a catalog sync without
+    re-processing unchanged names. Removed entries are left behind as empty
+    tombstones; ``live`` then lists the ids that still count.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str]], version: int = 0) -> None:
+        names: List[str] = []
+        processed: List[str] = []
+        slugs: List[str] = []
+        seen = set()
+        for name, slug in entries:
+            key = _process(name)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            names.append(name)
+            processed.append(key)
+            slugs.append(slug or slugify(name))
+        self._assign(version, names, processed, slugs, _build_postings(processed), 0)
+
+    def _assign(
+        self,
+        version: int,
+        names: Sequence[str],
+        processed: Sequence[str],
+        slugs: Sequence[str],
+        postings: Dict[str, Tuple[int, ...]],
+        tombstones: int,
+    ) -> None:
+        self.version = version
+        self.names: Tuple[str, ...] = tuple(names)
+        self.processed: Tuple[str, ...] = tuple(processed)
+        self.slugs: Tuple[str, ...] = tuple(slugs)
+        self.postings: Dict[str, Tuple[int, ...]] = postings
+        self.tombstones = tombstones
+        self.live: Optional[Tuple[int, ...]] = (
+            tuple(idx for idx, key in enumerate(processed) if key) if tombstones else None
+        )
+
+    def __len__(self) -> int:
+        return len(self.processed) - self.tombstones
+
+    def updated(
+        self,
+        added: Iterable[Tuple[str, str]] = (),
+        removed: Iterable[Tuple[str, str]] = (),
+        version: int = 0,
+    ) -> "MenuIndex":
+        """Return a copy without the ``removed`` entries and with ``added`` appended.
+
+        Only new names are processed and only postings of the trigrams they
+        touch are rewritten. Once tombstones make up a quarter of the index
+        it is compacted, which re-indexes the processed keys but still skips
+        the name processing.
+        """
+
+        names, processed, slugs = list(self.names), list(self.processed), list(self.slugs)
+        postings = dict(self.postings)
+        tombstones = self.tombstones
+
+        drop = {(_process(name), slug) for name, slug in removed}
+        dropped: Dict[str, set] = {}
+        if drop:
+            for idx, key in enumerate(processed):
+                if key and (key, slugs[idx]) in drop:
+                    for gram in _trigrams(key):
+                        dropped.setdefault(gram, set()).add(idx)
+                    names[idx] = processed[idx] = slugs[idx] = ""
+                    tombstones += 1
+        for gram, ids in dropped.items():
+            remaining = tuple(idx for idx in postings[gram] if idx not in ids)
+            if remaining:
+                postings[gram] = remaining
+            else:
+                del postings[gram]
+
+        seen = set(processed)
+        appended: Dict[str, List[int]] = {}
+        for name, slug in added:
+            key = _process(name)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            for gram in _trigrams(key):
+                appended.setdefault(gram, []).append(len(processed))
+            names.append(name)
+            processed.append(key)
+            slugs.append(slug or slugify(name))
+        for gram, ids in appended.items():
+            postings[gram] = postings.get(gram, ()) + tuple(ids)
+
+        index = MenuIndex.__new__(MenuIndex)
+        if tombstones * 4 > len(processed):
+            keep = [idx for idx, key in enumerate(processed) if key]
+            names = [names[idx] for idx in keep]
+            processed = [processed[idx] for idx in keep]
+            slugs = [slugs[idx] for idx in keep]
+            postings, tombstones = _build_postings(processed), 0
+        index._assign(version, names, processed, slugs, postings, tombstones)
+        return index
+
+    def shortlist(self, query: str) -> Optional[Sequence[int]]:
+        """Return candidate ids for a processed query, ``None`` meaning all."""
+
+        if len(self) <= FULL_SCAN_LIMIT:
+            return None
+
+        lists = sorted(
+            (self.postings[gram] for gram in _trigrams(query) if gram in self.postings),
+            key=len,
+        )
+        if not lists:
+            return ()
+
+        counts: Dict[int, int] = {}
+        usable = [ids for ids in lists if len(ids) <= STOP_GRAM_LIMIT] or lists[:1]
+        for ids in usable:
+            for idx in ids:
+                counts[idx] = counts.get(idx, 0) + 1
+
+        best = heapq.nlargest(SHORTLIST_SIZE, counts.items(), key=lambda kv: (kv[1], -kv[0]))
+        return sorted(idx for idx, _ in best)
+
+    def best_match(self, candidate: str) -> Tuple[int, int]:
+        """Return ``(entry id, score)`` of the best match, ``(-1, 0)`` if none."""
+
+        from rapidfuzz import fuzz
+
+        query = _process(candidate)
+        if not query or not len(self):
+            return -1, 0
+
+        ids = self.shortlist(query)
+        if ids is None:
+            ids = range(len(self.processed)) if self.live is None else self.live
+
+        best_idx, best_score = -1, -1.0
+        for idx in ids:
+            score = fuzz.WRatio(query, self.processed[idx])
+            if score > best_score:
+                best_idx, best_score = idx, score
+        if best_idx < 0:
+            return -1, 0
+        return best_idx, int(round(best_score))
+
+    def match_many(self, candidates: Sequence[str]) -> List[Tuple[str, int]]:
+        """Vectorized :meth:`match` scoring all candidates as one matrix."""
+
+        import numpy as np
+        from rapidfuzz import fuzz
+        from rapidfuzz import process as rf_process
+
+        results: List[Tuple[str, int]] = [("", 0)] * len(candidates)
+        queries = [_process(candidate) for candidate in candidates]
+        rows = [row for row, query in enumerate(queries) if query]
+        if not rows or not len(self):
+            return results
+
+        shortlists = [self.shortlist(queries[row]) for row in rows]
+        if all(ids is None for ids in shortlists):
+            if self.live is None:
+                columns = np.arange(len(self.processed))
+            else:
+                columns = np.array(self.live, dtype=np.intp)
+            mask = None
+        else:
+            # Only score the union of shortlisted entries, masking out pairs
+            # a single-text lookup would never have compared.
+            columns = np.array(sorted({idx for ids in shortlists for idx in ids}), dtype=np.intp)
+            if not len(columns):
+                return results
+            position = {idx: pos for pos, idx in enumerate(columns.tolist())}
+            mask = np.zeros((len(rows), len(columns)), dtype=bool)
+            for row_pos, ids in enumerate(shortlists):
+                mask[row_pos, [position[idx] for idx in ids]] = True
+
+        scores = rf_process.cdist(
+            [queries[row] for row in rows],
+            [self.processed[idx] for idx in columns.tolist()],
+            scorer=fuzz.WRatio,
+            dtype=np.float64,
+            workers=-1,
+        )
+        if mask is not None:
+            scores[~mask] = -1.0
+
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(rows)), best]
+        for row, col, score in zip(rows, best.tolist(), best_scores.tolist()):
+            if score >= 0:
+                results[row] = (self.slugs[int(columns[col])], int(round(score)))
+        return results
+
+    def match(self, candidate: str) -> Tuple[str, int]:
+        """Return ``(slug, score)`` for the best catalog entry."""
+
+        idx, score = self.best_match(candidate)
+        if idx < 0:
+            return "", 0
+        return self.slugs[idx], score
@@ -0,0 +1,308 @@
+"""Lightweight Prometheus metrics and stage spans, no client library needed.
+
+Instrumentation is opt-in via ``METRICS_ENABLED=1``. When it is off,
+:func:`timed` returns the undecorated function and :func:`span` a shared
+no-op context manager, so hot paths pay nothing.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0").lower() in ("1", "true", "yes")
+
+# Seconds; tuned for sub-millisecond local stages up to multi-second LLM calls.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+_NOOP = nullcontext()
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_label_text(self.labelnames, labels)} {value}" for labels, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+        # per label set: [per-bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][slot] += 1
+            entry[1][0] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(labels, list(counts), total[0]) for labels, (counts, total) in self._values.items()]
+        lines = self.header()
+        for labels, counts, total in items:
+            running = 0
+            for bound, count in zip(self.buckets, counts):
+                running += count
+                le = _label_text(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {running}")
+            running += counts[-1]
+            le = _label_text(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {running}")
+            plain = _label_text(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{plain} {total}")
+            lines.append(f"{self.name}_count{plain} {running}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Run ``collector`` before every scrape to refresh pull-style gauges."""
+
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(
+    Histogram("warunggo_stage_seconds", "Latency of instrumented hot stages", ["stage"])
+)
+HTTP_SECONDS = REGISTRY.register(
+    Histogram(
+        "warunggo_http_request_seconds",
+        "HTTP request latency by route",
+        ["method", "route", "status"],
+    )
+)
+HTTP_IN_FLIGHT = REGISTRY.register(
+    Gauge("warunggo_http_in_flight", "HTTP requests currently being served")
+)
+LLM_CALLS = REGISTRY.register(
+    Counter("warunggo_llm_calls_total", "ask_llm and stream_llm calls by outcome", ["outcome"])
+)
+LLM_SECONDS = REGISTRY.register(
+    Histogram("warunggo_llm_seconds", "Latency of Gemini requests that were sent", ["outcome"])
+)
+LLM_IN_FLIGHT = REGISTRY.register(
+    Gauge("warunggo_llm_in_flight", "Gemini requests currently in flight")
+)
+ORDER_PARSE = REGISTRY.register(
+    Counter(
+        "warunggo_order_parse_total",
+        "Order texts by resolution path (local, llm, shed, none)",
+        ["source"],
+    )
+)
+INVENTORY_OPS = REGISTRY.register(
+    Counter(
+        "warunggo_inventory_ops_total",
+        "Stock reservations, commits and releases by outcome",
+        ["op", "outcome"],
+    )
+)
+ADMISSION_DECISIONS = REGISTRY.register(
+    Counter(
+        "warunggo_admission_total",
+        "LLM-bound requests admitted or shed, by kind and outcome",
+        ["kind", "outcome"],
+    )
+)
+ADMISSION_QUEUE_DEPTH = REGISTRY.register(
+    Gauge("warunggo_admission_queue_depth", "Requests waiting for an LLM slot", ["kind"])
+)
+TENANT_CACHE_EVENTS = REGISTRY.register(
+    Counter(
+        "warunggo_tenant_cache_total",
+        "Tenant cache hits, builds, evictions and idle expiries",
+        ["event"],
+    )
+)
+TENANT_CACHE_BYTES_USED = REGISTRY.register(
+    Gauge("warunggo_tenant_cache_bytes", "Estimated bytes held by cached tenants")
+)
+STREAM_MESSAGES = REGISTRY.register(
+    Counter(
+        "warunggo_stream_messages_total",
+        "Envelopes answered over the /ws message stream, by type and outcome",
+        ["type", "outcome"],
+    )
+)
+STREAM_CONNECTIONS = REGISTRY.register(
+    Gauge("warunggo_stream_connections", "Open /ws message stream connections")
+)
+
+
+def enabled() -> bool:
+    return METRICS_ENABLED
+
+
+def span(stage: str):
+    """Context manager timing ``stage`` into ``warunggo_stage_seconds``."""
+
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _span(stage)
+
+
+@contextmanager
+def _span(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage)
+
+
+def timed(stage: str) -> Callable[[Callable], Callable]:
+    """Decorator form of :func:`span` for sync and async functions."""
+
+    def decorate(fn: Callable) -> Callable:
+        if not METRICS_ENABLED:
+            return fn
+
+        if asyncio.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    STAGE_SECONDS.observe(time.perf_counter() - started, stage)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                STAGE_SECONDS.observe(time.perf_counter() - started, stage)
+
+        return wrapper
+
+    return decorate
+
+
+def count(counter: Counter, *labels: str) -> None:
+    if METRICS_ENABLED:
+        counter.inc(*labels)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and in-flight requests."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": "500"}
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = str(message["status"])
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # the router stores the matched route, keeping label cardinality low
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_SECONDS.observe(
+                time.perf_counter() - started, scope.get("method", ""), route, status["code"]
+            )
+
+
+def render() -> str:
+    if not METRICS_ENABLED:
+        return "# metrics disabled; set METRICS_ENABLED=1\n"
+    return REGISTRY.render()
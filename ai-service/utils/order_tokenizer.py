@@ -0,0 +1,222 @@
+"""Single-pass tokenizer for Indonesian order messages.
+
+Turns "dua indomie", "sebelas es teh", "3 porsi nasi goreng" or
+"segelas kopi susu dan dua puluh kerupuk" into ``(qty, phrase)`` pairs.
+Number words (satu … sembilan belas, puluhan, ``se-``), unit words and stop
+words are compiled into one character trie at import time. Each word is
+matched against it once, so glued forms like "duabelas" or "seporsi" are
+read as well. A word is only split when every piece is a known morpheme,
+so "sate" or "semangka" stay menu words. The work is linear in the
+message length.
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# piece kinds
+DIGITS = "digits"
+ONES = "ones"  # 1..9
+TEN = "ten"  # sepuluh / sebelas
+BELAS = "belas"  # adds 10
+PULUH = "puluh"  # multiplies by 10
+UNIT = "unit"
+STOP = "stop"
+WORD = "word"
+
+ONES_WORDS = {
+    "se": 1, "satu": 1, "dua": 2, "tiga": 3, "empat": 4, "lima": 5, "enam": 6,
+    "tujuh": 7, "delapan": 8, "lapan": 8, "sembilan": 9,
+}
+TEN_WORDS = {"sepuluh": 10, "sebelas": 11}
+UNIT_WORDS = frozenset(
+    "porsi gelas bungkus piring mangkok mangkuk botol cup cangkir biji buah pcs x".split()
+)
+STOP_WORDS = frozenset(
+    "dan sama dong ya tolong pesan minta please aja deh kak juga lagi".split()
+)
+
+Piece = Tuple[str, object]
+_END = ""  # key of the entry stored on a terminal trie node
+
+
+def _compile_trie() -> Dict[str, dict]:
+    entries: Dict[str, Piece] = {}
+    entries.update((word, (ONES, value)) for word, value in ONES_WORDS.items())
+    entries.update((word, (TEN, value)) for word, value in TEN_WORDS.items())
+    # a "belas" / "puluh" that does not follow a number stays a word
+    entries["belas"] = (BELAS, "belas")
+    entries["puluh"] = (PULUH, "puluh")
+    entries.update((word, (UNIT, word)) for word in UNIT_WORDS)
+    entries.update((word, (STOP, word)) for word in STOP_WORDS)
+
+    root: Dict[str, dict] = {}
+    for word, entry in entries.items():
+        node = root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[_END] = entry
+    return root
+
+
+_TRIE = _compile_trie()
+_TOKEN = re.compile(r"\d+|[a-z]+")
+
+
+def _segment(word: str) -> Optional[List[Piece]]:
+    """Fewest trie pieces covering ``word`` exactly, or None.
+
+    Stop words only count as a whole word, so "danau" is not "dan" + "au".
+    """
+
+    size = len(word)
+    # best[j] = (pieces, start, entry) of the cheapest cover of word[:j]
+    best: List[Optional[Tuple[int, int, Piece]]] = [None] * (size + 1)
+    best[0] = (0, 0, (WORD, ""))
+    for start in range(size):
+        if best[start] is None:
+            continue
+        node = _TRIE
+        for end in range(start + 1, size + 1):
+            node = node.get(word[end - 1])
+            if node is None:
+                break
+            entry = node.get(_END)
+            if entry is None or (entry[0] == STOP and (start or end < size)):
+                continue
+            pieces = best[start][0] + 1
+            if best[end] is None or pieces < best[end][0]:
+                best[end] = (pieces, start, entry)
+    if best[size] is None:
+        return None
+    pieces: List[Piece] = []
+    end = size
+    while end:
+        _, start, entry = best[end]
+        pieces.append(entry)
+        end = start
+    pieces.reverse()
+    return pieces
+
+
+@lru_cache(maxsize=16384)
+def _pieces(token: str) -> Tuple[Piece, ...]:
+    # customers reuse a small vocabulary, so almost every word is a cache hit
+    if token[0].isdigit():
+        return ((DIGITS, int(token)),)
+    pieces = _segment(token) if token[0] in _TRIE else None
+    return ((WORD, token),) if pieces is None else tuple(pieces)
+
+
+def tokenize(text: str) -> List[Piece]:
+    """``(kind, value)`` pieces of ``text`` in order."""
+
+    return [piece for token in _TOKEN.findall(text.lower()) for piece in _pieces(token)]
+
+
+def read(text: str) -> Iterator[Piece]:
+    """Like :func:`tokenize`, with number words folded into ``(DIGITS, value)``.
+
+    "dua puluh tiga" yields 23 and "tiga belas" 13. A "belas" / "puluh"
+    that does not follow a number is yielded as a word.
+    """
+
+    number: Optional[int] = None  # number word still being assembled
+    tens = False  # ``number`` ended in "puluh" and may take a ones digit
+    for kind, value in tokenize(text):
+        if kind == ONES:
+            if number is not None and not tens:
+                yield DIGITS, number
+            elif number is not None:
+                value += number
+            number, tens = value, False
+            continue
+        if kind == BELAS and number is not None and number < 10 and not tens:
+            number += 10
+            continue
+        if kind == PULUH and number is not None and number < 10:
+            number, tens = number * 10, True
+            continue
+        if number is not None:
+            yield DIGITS, number
+            number, tens = None, False
+        if kind == TEN:
+            yield DIGITS, value
+        elif kind == BELAS or kind == PULUH:
+            yield WORD, value
+        else:
+            yield kind, value
+    if number is not None:
+        yield DIGITS, number
+
+
+def extract_candidates(text: str) -> List[Tuple[int, str]]:
+    """``(qty, phrase)`` pairs, one per quantity followed by item words.
+
+    Unit words right after a quantity are skipped ("3 porsi nasi goreng"),
+    later on they belong to the name ("2 nasi bungkus"). Words before the
+    first quantity and stop words are ignored.
+    """
+
+    candidates: List[Tuple[int, str]] = []
+    qty: Optional[int] = None
+    buffer: List[str] = []
+    for kind, value in read(text):
+        if kind == DIGITS:
+            if qty and buffer:
+                candidates.append((qty, " ".join(buffer)))
+            qty, buffer = value, []
+        elif qty is None or kind == STOP or (kind == UNIT and not buffer):
+            continue
+        else:
+            buffer.append(value)
+    if qty and buffer:
+        candidates.append((qty, " ".join(buffer)))
+    return candidates
+
+
+def extract_loose(text: str) -> Optional[Tuple[int, str]]:
+    """The whole message as one ``(qty, phrase)``; qty anywhere, default 1.
+
+    Reads "es jeruk 2" or "indomie satu ya", which :func:`extract_candidates`
+    leaves to the LLM. The first quantity wins and every other word except
+    stop and unit words makes up the phrase, so only use this when the LLM
+    is not an option.
+    """
+
+    qty: Optional[int] = None
+    words: List[str] = []
+    for kind, value in read(text):
+        if kind == DIGITS:
+            qty = value if qty is None else qty
+        elif kind == WORD:
+            words.append(value)
+    if not words or qty == 0:
+        return None
+    return (qty or 1, " ".join(words))
+
+
+def extract_trailing(text: str) -> List[Tuple[int, str]]:
+    """``(qty, phrase)`` pairs for phrases followed by their quantity.
+
+    Reads "indomi grg 2 esteh 3" or "kopi item satu gelas". Words after the
+    last quantity form a final phrase of 1 ("mau indomie"). Meant for
+    messages :func:`extract_candidates` found nothing in.
+    """
+
+    candidates: List[Tuple[int, str]] = []
+    words: List[str] = []
+    for kind, value in read(text):
+        if kind == DIGITS:
+            if words and value:
+                candidates.append((value, " ".join(words)))
+            words = []
+        elif kind == STOP or (kind == UNIT and not words):
+            continue
+        else:
+            words.append(value)
+    if words:
+        candidates.append((1, " ".join(words)))
+    return candidates
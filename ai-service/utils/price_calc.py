@@ -2,23 +2,120 @@
 
 from __future__ import annotations
 
-from typing import Dict, List, Tuple
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Dict, List, Mapping, Optional, Sequence, Tuple
 
 from models.order_model import OrderItem
+from utils.catalog import DEFAULT_MENU_PRICES, CatalogSnapshot, get_snapshot  # noqa: F401
+from utils.menu_index import normalize_slug
+from utils.metrics import timed
 
-DEFAULT_MENU_PRICES: Dict[str, int] = {
-    "indomie": 3500,
-    "indomie_goreng": 5000,
-    "nasi_goreng": 12000,
-    "ayam_geprek": 15000,
-    "es_teh": 3000,
-    "es_teh_manis": 3000,
-    "es_teh_tawar": 2500,
-    "kopi_susu": 8000,
-    "kopi_hitam": 6000,
-    "jus_jeruk": 10000,
-    "air_mineral": 4000,
-}
+if TYPE_CHECKING:
+    import numpy as np
+
+PRICE_TABLE_CACHE_SIZE = 256
+INT64_MAX = 2**63 - 1
+
+
+@dataclass(frozen=True)
+class PriceTable:
+    """Catalog prices merged with a request menu, compiled for lookups.
+
+    ``prices`` serves single invoices; ``slug_ids`` and ``price_array``
+    serve bulk totals, where carts are resolved to integer ids first.
+    """
+
+    catalog_version: int
+    slugs: Tuple[str, ...]
+    slug_ids: Mapping[str, int]
+    prices: Mapping[str, int]
+    price_array: np.ndarray
+
+
+_price_tables: "OrderedDict[Tuple[int, str], PriceTable]" = OrderedDict()
+_price_tables_lock = threading.Lock()
+
+
+def _menu_digest(menu: Optional[Mapping[str, int]]) -> str:
+    if not menu:
+        return ""
+    raw = json.dumps(sorted(menu.items()), ensure_ascii=False, default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _build_price_table(snapshot: CatalogSnapshot, menu: Optional[Mapping[str, int]]) -> PriceTable:
+    import numpy as np
+
+    prices = dict(snapshot.prices)
+    if menu:
+        prices.update({normalize_slug(str(name)): int(value) for name, value in menu.items()})
+    slugs = tuple(prices)
+    return PriceTable(
+        catalog_version=snapshot.version,
+        slugs=slugs,
+        slug_ids={slug: idx for idx, slug in enumerate(slugs)},
+        prices=prices,
+        price_array=np.fromiter((prices[slug] for slug in slugs), dtype=np.int64, count=len(slugs)),
+    )
+
+
+def _patch_price_table(
+    parent: PriceTable, snapshot: CatalogSnapshot, menu: Optional[Mapping[str, int]]
+) -> Optional[PriceTable]:
+    """Carry ``parent`` over to ``snapshot`` if only existing prices moved."""
+
+    overridden = {normalize_slug(str(name)) for name in menu} if menu else set()
+    changed = [slug for slug in snapshot.changed if slug not in overridden]
+    if any(slug not in parent.slug_ids or slug not in snapshot.prices for slug in changed):
+        return None
+    if not changed:
+        return replace(parent, catalog_version=snapshot.version)
+    prices = dict(parent.prices)
+    price_array = parent.price_array.copy()
+    for slug in changed:
+        prices[slug] = snapshot.prices[slug]
+        price_array[parent.slug_ids[slug]] = prices[slug]
+    return replace(parent, catalog_version=snapshot.version, prices=prices, price_array=price_array)
+
+
+def compile_price_table(
+    menu: Optional[Mapping[str, int]] = None,
+    snapshot: Optional[CatalogSnapshot] = None,
+) -> PriceTable:
+    """Return the cached price table for ``menu`` on top of the catalog.
+
+    Tables are keyed by catalog version plus a hash of the raw menu, so
+    repeated menus skip slugifying and merging entirely. After a catalog
+    sync the table of the parent version is patched for the changed slugs
+    instead of being rebuilt.
+    """
+
+    snapshot = snapshot or get_snapshot()
+    digest = _menu_digest(menu)
+    key = (snapshot.version, digest)
+    with _price_tables_lock:
+        table = _price_tables.get(key)
+        if table is not None:
+            _price_tables.move_to_end(key)
+            return table
+        parent = (
+            _price_tables.get((snapshot.parent_version, digest))
+            if snapshot.parent_version
+            else None
+        )
+
+    table = _patch_price_table(parent, snapshot, menu) if parent is not None else None
+    if table is None:
+        table = _build_price_table(snapshot, menu)
+    with _price_tables_lock:
+        _price_tables[key] = table
+        while len(_price_tables) > PRICE_TABLE_CACHE_SIZE:
+            _price_tables.popitem(last=False)
+    return table
 
 
 def format_rupiah(amount: int) -> str:
@@ -27,15 +124,15 @@ def format_rupiah(amount: int) -> str:
     return f"Rp{amount:,.0f}".replace(",", ".")
 
 
+@timed("calculate_total")
 def calculate_total(
     items: List[OrderItem],
     menu: Dict[str, int] | None = None,
+    table: PriceTable | None = None,
 ) -> Tuple[List[dict], int]:
     """Calculate per-item subtotals and the grand total."""
 
-    price_catalog = DEFAULT_MENU_PRICES.copy()
-    if menu:
-        price_catalog.update({key: int(value) for key, value in menu.items()})
+    price_catalog = (table or compile_price_table(menu)).prices
 
     detailed_items = []
     total = 0
@@ -54,3 +151,90 @@ def calculate_total(
         total += subtotal
 
     return detailed_items, total
+
+
+@dataclass(frozen=True)
+class BulkTotals:
+    """Columnar result of :func:`calculate_totals_bulk`.
+
+    Line arrays are flat across all carts; cart ``i`` owns lines
+    ``offsets[i]:offsets[i + 1]``. ``item_ids`` index into ``slugs``, which
+    only lists the items the carts reference. Money and quantity arrays are
+    ``object`` arrays of Python ints when int64 could overflow.
+    """
+
+    slugs: Tuple[str, ...]
+    offsets: np.ndarray
+    item_ids: np.ndarray
+    qty: np.ndarray
+    unit_price: np.ndarray
+    subtotal: np.ndarray
+    totals: np.ndarray
+
+
+def calculate_totals_bulk(
+    carts: Sequence[Sequence[OrderItem]], table: PriceTable | None = None
+) -> BulkTotals:
+    """Total many carts against one price table with integer array math.
+
+    Falls back to Python ints (still vectorised, but slower) when a total
+    could exceed int64, so huge quantities never wrap around.
+    """
+
+    import numpy as np
+
+    table = table or compile_price_table()
+    slug_ids = dict(table.slug_ids)
+    slugs = list(table.slugs)
+
+    lengths = np.fromiter((len(cart) for cart in carts), dtype=np.int64, count=len(carts))
+    offsets = np.zeros(len(carts) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    line_count = int(offsets[-1])
+
+    item_ids = np.empty(line_count, dtype=np.int64)
+    quantities: List[int] = []
+    pos = 0
+    for cart in carts:
+        for entry in cart:
+            idx = slug_ids.get(entry.item)
+            if idx is None:
+                # unknown items are kept (priced 0) so lines stay complete
+                idx = slug_ids[entry.item] = len(slugs)
+                slugs.append(entry.item)
+            item_ids[pos] = idx
+            quantities.append(entry.qty)
+            pos += 1
+
+    prices = table.price_array
+    if len(slugs) > len(prices):
+        prices = np.concatenate([prices, np.zeros(len(slugs) - len(prices), dtype=np.int64)])
+    unit_price = prices[item_ids]
+
+    # renumber so slugs only lists what the carts use, not the whole table
+    used = np.flatnonzero(np.bincount(item_ids, minlength=len(slugs)))
+    remap = np.zeros(len(slugs), dtype=np.int64)
+    remap[used] = np.arange(len(used))
+    item_ids = remap[item_ids]
+
+    dtype = np.int64
+    if line_count:
+        peak = max(abs(int(unit_price.min())), abs(int(unit_price.max())))
+        if peak * max(quantities) * line_count > INT64_MAX:
+            dtype = object
+            unit_price = unit_price.astype(object)
+    qty = np.array(quantities, dtype=dtype)
+    subtotal = unit_price * qty
+    running = np.zeros(line_count + 1, dtype=dtype)
+    np.cumsum(subtotal, out=running[1:])
+    totals = running[offsets[1:]] - running[offsets[:-1]]
+
+    return BulkTotals(
+        slugs=tuple(slugs[idx] for idx in used),
+        offsets=offsets,
+        item_ids=item_ids,
+        qty=qty,
+        unit_price=unit_price,
+        subtotal=subtotal,
+        totals=totals,
+    )
@@ -0,0 +1,404 @@
+"""Data-driven promo rules compiled into a keyword automaton.
+
+Rules live under the ``"promo"`` key of ``data/config.json``::
+
+    {
+      "promo": {
+        "default_suggestion": "belum ada promo",
+        "categories": {"beverage": ["es", "teh", "kopi", "jus", "air"]},
+        "rules": [
+          {"id": "telur", "priority": 100,
+           "suggestion": "Tambah telur biar lebih mantap?",
+           "when": {"keywords": ["indomie"]}},
+          {"id": "minum", "priority": 10, "suggestion": "Mau sekalian minum?",
+           "when": {"category": "beverage", "max_qty": 1}}
+        ]
+      }
+    }
+
+A condition selects cart lines by ``keywords`` (substring of the item
+slug), a named ``category`` of keywords or exact ``items`` slugs. It holds
+when the summed qty of those lines is within ``min_qty`` (default 1, or 0
+when only ``max_qty`` is set) and ``max_qty``. ``when`` may be a list of
+conditions that must all hold. Rules can be limited with ``branches``,
+``days`` (``"mon"``..``"sun"``) and ``hours`` (``"10:00-14:00"``, may wrap
+midnight). The highest-priority matching rule wins.
+
+All keywords of all rules share one Aho-Corasick automaton. Each cart line
+is scanned once to find the features it hits. Only rules triggered by those
+features, plus rules that can hold on an empty selection, are checked. The
+work per cart therefore follows the cart, not the number of rules.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from models.order_model import OrderItem
+from utils.catalog import BEVERAGE_KEYWORDS, CURRENT_TENANT, DATA_DIR, RELOAD_CHECK_INTERVAL
+from utils.menu_index import normalize_slug
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = DATA_DIR / "config.json"
+PROMO_TIMEZONE = os.getenv("PROMO_TIMEZONE", "Asia/Jakarta")
+
+DEFAULT_SUGGESTION = "belum ada promo"
+DEFAULT_CATEGORIES: Dict[str, Tuple[str, ...]] = {"beverage": BEVERAGE_KEYWORDS}
+# Same behavior as the old hardcoded checks in routers/promo.py.
+DEFAULT_RULES: Tuple[dict, ...] = (
+    {
+        "id": "telur_indomie",
+        "priority": 100,
+        "suggestion": "Tambah telur biar lebih mantap?",
+        "when": {"keywords": ["indomie"]},
+    },
+    {
+        "id": "sekalian_minum",
+        "priority": 10,
+        "suggestion": "Mau sekalian minum?",
+        "when": {"category": "beverage", "max_qty": 1},
+    },
+)
+
+DAY_NAMES = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+# Distinct item slugs remembered per compiled engine; carts reuse a small menu.
+SLUG_CACHE_SIZE = 4096
+
+
+class PromoConfigError(ValueError):
+    """Raised for a rule that cannot be compiled."""
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton mapping every pattern found to its payloads."""
+
+    def __init__(self, patterns: Mapping[str, Iterable[int]]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[frozenset] = [frozenset()]
+
+        outputs: List[set] = [set()]
+        for pattern, payloads in patterns.items():
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append(set())
+                state = nxt
+            outputs[state].update(payloads)
+
+        # breadth-first fail links; outputs of the fail state are merged in
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                outputs[nxt] |= outputs[self._fail[nxt]]
+        self._out = [frozenset(out) for out in outputs]
+
+    def find(self, text: str) -> set:
+        """Payloads of every pattern occurring in ``text``."""
+
+        goto, fail, out = self._goto, self._fail, self._out
+        found: set = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+
+@dataclass(frozen=True)
+class PromoRule:
+    id: str
+    priority: int
+    suggestion: str
+    # (feature id, min qty, max qty or None)
+    conditions: Tuple[Tuple[int, int, Optional[int]], ...]
+    branches: frozenset = frozenset()
+    days: frozenset = frozenset()
+    hours: Tuple[Tuple[int, int], ...] = ()
+
+    def active(self, branch: Optional[str], now: datetime) -> bool:
+        if self.branches and branch not in self.branches:
+            return False
+        if self.days and DAY_NAMES[now.weekday()] not in self.days:
+            return False
+        if self.hours:
+            minute = now.hour * 60 + now.minute
+            return any(
+                start <= minute < end if start <= end else minute >= start or minute < end
+                for start, end in self.hours
+            )
+        return True
+
+    def holds(self, qty: Mapping[int, int]) -> bool:
+        for feature, low, high in self.conditions:
+            value = qty.get(feature, 0)
+            if value < low or (high is not None and value > high):
+                return False
+        return True
+
+
+def _parse_hours(spec) -> Tuple[Tuple[int, int], ...]:
+    windows = []
+    for window in [spec] if isinstance(spec, str) else spec or ():
+        try:
+            start, end = (part.strip() for part in str(window).split("-"))
+            windows.append(
+                tuple(int(h) * 60 + int(m) for h, m in (t.split(":") for t in (start, end)))
+            )
+        except ValueError:
+            raise PromoConfigError(f"invalid hours window {window!r}") from None
+    return tuple(windows)
+
+
+@dataclass
+class _Compiler:
+    categories: Mapping[str, Sequence[str]]
+    features: Dict[Tuple, int] = field(default_factory=dict)
+    keyword_features: Dict[str, set] = field(default_factory=dict)
+    item_features: Dict[str, set] = field(default_factory=dict)
+
+    def feature(self, condition: Mapping) -> int:
+        keywords = list(condition.get("keywords") or ())
+        category = condition.get("category")
+        if category:
+            if category not in self.categories:
+                raise PromoConfigError(f"unknown category {category!r}")
+            keywords += list(self.categories[category])
+        keywords = sorted({normalize_slug(str(word)) for word in keywords} - {""})
+        items = sorted({normalize_slug(str(slug)) for slug in condition.get("items") or ()} - {""})
+        if not keywords and not items:
+            raise PromoConfigError("condition needs keywords, category or items")
+
+        # identical selections share one feature, however many rules use them
+        key = (tuple(keywords), tuple(items))
+        fid = self.features.get(key)
+        if fid is None:
+            fid = self.features[key] = len(self.features)
+            for word in keywords:
+                self.keyword_features.setdefault(word, set()).add(fid)
+            for slug in items:
+                self.item_features.setdefault(slug, set()).add(fid)
+        return fid
+
+    def rule(self, raw: Mapping, position: int) -> PromoRule:
+        when = raw.get("when") or {}
+        conditions = []
+        for condition in [when] if isinstance(when, Mapping) else when:
+            high = condition.get("max_qty")
+            low = condition.get("min_qty", 0 if high is not None else 1)
+            conditions.append(
+                (self.feature(condition), int(low), None if high is None else int(high))
+            )
+        if not conditions or not raw.get("suggestion"):
+            raise PromoConfigError("rule needs a suggestion and at least one condition")
+        return PromoRule(
+            id=str(raw.get("id") or f"rule_{position}"),
+            priority=int(raw.get("priority", 0)),
+            suggestion=str(raw["suggestion"]),
+            conditions=tuple(conditions),
+            branches=frozenset(str(b) for b in raw.get("branches") or ()),
+            days=frozenset(str(d).lower()[:3] for d in raw.get("days") or ()),
+            hours=_parse_hours(raw.get("hours")),
+        )
+
+
+class PromoTable:
+    """Compiled rules: keyword automaton plus a priority-ordered decision table."""
+
+    def __init__(
+        self,
+        rules: Sequence[Mapping],
+        categories: Optional[Mapping[str, Sequence[str]]] = None,
+        default_suggestion: str = DEFAULT_SUGGESTION,
+        version: int = 0,
+    ) -> None:
+        compiler = _Compiler({**DEFAULT_CATEGORIES, **(categories or {})})
+        compiled: List[PromoRule] = []
+        for position, raw in enumerate(rules):
+            try:
+                compiled.append(compiler.rule(raw, position))
+            except (PromoConfigError, TypeError, ValueError, AttributeError) as exc:
+                logger.warning("Skipping promo rule #%d (%s): %s", position, raw.get("id"), exc)
+
+        # stable: equal priorities keep their order from the config file
+        order = sorted(range(len(compiled)), key=lambda idx: -compiled[idx].priority)
+        self.rules: Tuple[PromoRule, ...] = tuple(compiled[idx] for idx in order)
+        self.version = version
+        self.default_suggestion = default_suggestion
+        self._automaton = KeywordAutomaton(compiler.keyword_features)
+        self._item_features = {slug: frozenset(ids) for slug, ids in compiler.item_features.items()}
+        self._slug_cache: Dict[str, frozenset] = {}
+
+        # rules reachable only through a hit feature vs. rules that can hold
+        # on an empty selection (e.g. "at most 1 drink") and are always checked
+        self._triggers: Dict[int, List[int]] = {}
+        always: List[int] = []
+        for rank, rule in enumerate(self.rules):
+            if all(low > 0 for _, low, _ in rule.conditions):
+                for feature, _, _ in rule.conditions:
+                    self._triggers.setdefault(feature, []).append(rank)
+            else:
+                always.append(rank)
+        self._always = tuple(always)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def features_of(self, slug: str) -> frozenset:
+        cached = self._slug_cache.get(slug)
+        if cached is None:
+            found = self._automaton.find(slug)
+            found.update(self._item_features.get(slug, ()))
+            cached = frozenset(found)
+            if len(self._slug_cache) < SLUG_CACHE_SIZE:
+                self._slug_cache[slug] = cached
+        return cached
+
+    def evaluate(
+        self,
+        items: Sequence[OrderItem],
+        branch: Optional[str] = None,
+        now: Optional[datetime] = None,
+    ) -> Tuple[Optional[PromoRule], str]:
+        """Return ``(rule, suggestion)``; ``rule`` is None for the default."""
+
+        qty: Dict[int, int] = {}
+        for entry in items:
+            for feature in self.features_of(entry.item):
+                qty[feature] = qty.get(feature, 0) + entry.qty
+
+        candidates = set(self._always)
+        for feature in qty:
+            candidates.update(self._triggers.get(feature, ()))
+
+        now = now or _now()
+        for rank in sorted(candidates):
+            rule = self.rules[rank]
+            if rule.holds(qty) and rule.active(branch, now):
+                return rule, rule.suggestion
+        return None, self.default_suggestion
+
+
+def _now() -> datetime:
+    try:
+        from zoneinfo import ZoneInfo
+
+        return datetime.now(ZoneInfo(PROMO_TIMEZONE))
+    except Exception:
+        # no tz database available: WIB
+        return datetime.now(timezone(timedelta(hours=7)))
+
+
+def load_promo_config(path: Path = CONFIG_PATH) -> dict:
+    """Read the ``promo`` section of the config; built-in rules if absent."""
+
+    try:
+        raw = path.read_text(encoding="utf-8")
+        data = json.loads(raw) if raw.strip() else {}
+    except (OSError, ValueError) as exc:
+        logger.warning("Cannot read promo config %s: %s", path, exc)
+        data = {}
+
+    section = data.get("promo") if isinstance(data, Mapping) else None
+    if not isinstance(section, Mapping) or not isinstance(section.get("rules"), list):
+        section = {"rules": list(DEFAULT_RULES)}
+    return dict(section)
+
+
+class PromoEngine:
+    """Serves the compiled table and recompiles it when the config changes."""
+
+    def __init__(self, path: Path = CONFIG_PATH) -> None:
+        self.path = path
+        self._table: Optional[PromoTable] = None
+        self._signature: Tuple[int, int] = (-1, -1)
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _signature_now(self) -> Tuple[int, int]:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return (0, 0)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _compile(self, signature: Tuple[int, int]) -> None:
+        try:
+            config = load_promo_config(self.path)
+            version = self._table.version + 1 if self._table else 1
+            self._table = PromoTable(
+                config.get("rules", []),
+                categories=config.get("categories"),
+                default_suggestion=str(config.get("default_suggestion") or DEFAULT_SUGGESTION),
+                version=version,
+            )
+            self._signature = signature
+            logger.info("Promo table v%d compiled with %d rules", version, len(self._table))
+        except Exception:
+            logger.exception("Promo compile failed; keeping previous table")
+            if self._table is None:
+                self._table = PromoTable(DEFAULT_RULES, version=1)
+        finally:
+            self._lock.release()
+
+    def table(self) -> PromoTable:
+        current = self._table
+        if current is None:
+            self._lock.acquire()
+            if self._table is None:
+                self._compile(self._signature_now())
+            else:
+                self._lock.release()
+            return self._table
+
+        now = time.monotonic()
+        if now - self._checked_at >= RELOAD_CHECK_INTERVAL:
+            self._checked_at = now
+            signature = self._signature_now()
+            if signature != self._signature and self._lock.acquire(blocking=False):
+                threading.Thread(
+                    target=self._compile, args=(signature,), name="promo-compile", daemon=True
+                ).start()
+        return current
+
+    def evaluate(
+        self, items: Sequence[OrderItem], branch: Optional[str] = None
+    ) -> Tuple[Optional[PromoRule], str]:
+        return self.table().evaluate(items, branch=branch)
+
+
+PROMO_ENGINE = PromoEngine()
+
+
+def current_promo_engine() -> PromoEngine:
+    """The promo engine of the tenant being served, or :data:`PROMO_ENGINE`."""
+
+    tenant = CURRENT_TENANT.get()
+    return PROMO_ENGINE if tenant is None else tenant.promo
@@ -0,0 +1,273 @@
+"""Per-customer cart sessions updated by deltas, with pluggable storage.
+
+A cart is keyed by the customer's WhatsApp JID, prefixed with the tenant
+when a request is served for one (see :mod:`utils.tenants`). Each message only applies
+a delta (add / set / remove), and the invoice total is kept up to date as
+lines change, so follow-up messages never re-parse or re-price the whole
+order. Carts expire after ``SESSION_TTL`` seconds without activity.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from models.order_model import OrderItem
+from utils.price_calc import PriceTable, compile_price_table
+from utils.tenants import tenant_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_PATH = Path(__file__).resolve().parents[1] / ".cache" / "sessions.sqlite3"
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_TTL = float(os.getenv("SESSION_TTL", "7200"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", str(DEFAULT_SESSION_PATH))
+
+OP_ADD = "add"
+OP_SET = "set"
+OP_REMOVE = "remove"
+OPS = (OP_ADD, OP_SET, OP_REMOVE)
+
+# Expired rows are swept only every N writes.
+_SWEEP_EVERY = 64
+
+# (slug, qty); qty None with OP_REMOVE drops the whole line
+Delta = Tuple[str, Optional[int]]
+
+
+@dataclass
+class Cart:
+    """Running cart of one customer; ``total`` matches ``catalog_version``."""
+
+    jid: str
+    lines: Dict[str, int] = field(default_factory=dict)
+    total: int = 0
+    catalog_version: int = 0
+    updated_at: float = field(default_factory=time.time)
+
+    def items(self) -> List[OrderItem]:
+        return [OrderItem.model_construct(item=slug, qty=qty) for slug, qty in self.lines.items()]
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "lines": list(self.lines.items()),
+                "total": self.total,
+                "catalog_version": self.catalog_version,
+                "updated_at": self.updated_at,
+            }
+        )
+
+    @classmethod
+    def from_json(cls, jid: str, raw: str) -> "Cart":
+        data = json.loads(raw)
+        return cls(
+            jid=jid,
+            lines={str(slug): int(qty) for slug, qty in data.get("lines", [])},
+            total=int(data.get("total", 0)),
+            catalog_version=int(data.get("catalog_version", 0)),
+            updated_at=float(data.get("updated_at", 0.0)),
+        )
+
+    def apply(self, op: str, deltas: Sequence[Delta], table: PriceTable) -> List[Delta]:
+        """Apply ``deltas`` in place; return the ``(slug, new qty)`` changes."""
+
+        if op not in OPS:
+            raise ValueError(f"unknown cart op {op!r}")
+        prices = table.prices
+        if table.catalog_version != self.catalog_version:
+            # prices may have moved since the last message: re-price once
+            self.total = sum(int(prices.get(slug, 0)) * qty for slug, qty in self.lines.items())
+            self.catalog_version = table.catalog_version
+
+        changes: List[Delta] = []
+        for slug, qty in deltas:
+            old = self.lines.get(slug, 0)
+            if op == OP_ADD:
+                new = old + (1 if qty is None else qty)
+            elif op == OP_SET:
+                new = qty or 0
+            else:
+                new = 0 if qty is None else old - qty
+            new = max(new, 0)
+            if new == old:
+                continue
+            if new:
+                self.lines[slug] = new
+            else:
+                self.lines.pop(slug, None)
+            self.total += int(prices.get(slug, 0)) * (new - old)
+            changes.append((slug, new))
+        self.updated_at = time.time()
+        return changes
+
+
+class MemorySessionBackend:
+    """LRU of carts bounded by count, each expiring ``ttl`` after its last update."""
+
+    def __init__(self, max_entries: int = SESSION_MAX_ENTRIES, ttl: float = SESSION_TTL) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._carts: "OrderedDict[str, Tuple[Cart, float]]" = OrderedDict()
+        self._stats: Dict[str, int] = {"evictions": 0, "expired": 0}
+
+    def load(self, jid: str) -> Optional[Cart]:
+        entry = self._carts.get(jid)
+        if entry is None:
+            return None
+        cart, expires_at = entry
+        if expires_at <= time.time():
+            del self._carts[jid]
+            self._stats["expired"] += 1
+            return None
+        return cart
+
+    def save(self, cart: Cart) -> None:
+        now = time.time()
+        self._carts[cart.jid] = (cart, now + self.ttl)
+        self._carts.move_to_end(cart.jid)
+        # least recently used first: expired carts sit at the front
+        while self._carts:
+            _, (_, expires_at) = next(iter(self._carts.items()))
+            if expires_at > now and len(self._carts) <= self.max_entries:
+                break
+            self._carts.popitem(last=False)
+            self._stats["expired" if expires_at <= now else "evictions"] += 1
+
+    def delete(self, jid: str) -> None:
+        self._carts.pop(jid, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"backend": "memory", "entries": len(self._carts), **self._stats}
+
+
+class SQLiteSessionBackend:
+    """Carts persisted in SQLite so they survive restarts and are shared by workers."""
+
+    def __init__(
+        self,
+        path: str = SESSION_DB_PATH,
+        ttl: float = SESSION_TTL,
+        max_entries: int = SESSION_MAX_ENTRIES,
+    ) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._writes = 0
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " jid TEXT PRIMARY KEY, cart TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at)"
+        )
+
+    def load(self, jid: str) -> Optional[Cart]:
+        row = self._db.execute(
+            "SELECT cart, expires_at FROM sessions WHERE jid = ?", (jid,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] <= time.time():
+            self._db.execute("DELETE FROM sessions WHERE jid = ?", (jid,))
+            return None
+        return Cart.from_json(jid, row[0])
+
+    def save(self, cart: Cart) -> None:
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO sessions (jid, cart, expires_at, updated_at)"
+            " VALUES (?, ?, ?, ?)",
+            (cart.jid, cart.to_json(), now + self.ttl, now),
+        )
+        self._writes += 1
+        if self._writes % _SWEEP_EVERY == 0:
+            self._db.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+            self._db.execute(
+                "DELETE FROM sessions WHERE jid IN ("
+                " SELECT jid FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def delete(self, jid: str) -> None:
+        self._db.execute("DELETE FROM sessions WHERE jid = ?", (jid,))
+
+    def stats(self) -> Dict[str, int]:
+        entries = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {"backend": "sqlite", "entries": entries}
+
+
+class SessionStore:
+    """Applies cart deltas on top of a backend; safe to share across threads."""
+
+    def __init__(self, backend) -> None:
+        self.backend = backend
+        self._lock = threading.Lock()
+
+    def get(self, jid: str, table: Optional[PriceTable] = None) -> Cart:
+        """Current cart for ``jid`` (empty if none), priced at today's prices."""
+
+        table = table or compile_price_table()
+        jid = tenant_key(jid)
+        with self._lock:
+            cart = self.backend.load(jid) or Cart(jid=jid)
+            if cart.lines and cart.catalog_version != table.catalog_version:
+                cart.apply(OP_ADD, (), table)
+            return cart
+
+    def apply(
+        self, jid: str, op: str, deltas: Sequence[Delta], table: Optional[PriceTable] = None
+    ) -> Tuple[Cart, List[Delta]]:
+        table = table or compile_price_table()
+        jid = tenant_key(jid)
+        with self._lock:
+            cart = self.backend.load(jid) or Cart(jid=jid)
+            changes = cart.apply(op, deltas, table)
+            if cart.lines:
+                self.backend.save(cart)
+            else:
+                self.backend.delete(jid)
+        return cart, changes
+
+    def clear(self, jid: str) -> None:
+        with self._lock:
+            self.backend.delete(tenant_key(jid))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return self.backend.stats()
+
+
+_store: Optional[SessionStore] = None
+
+
+def create_backend(kind: str = SESSION_BACKEND):
+    if kind == "sqlite":
+        try:
+            return SQLiteSessionBackend()
+        except sqlite3.Error as exc:
+            logger.warning("SQLite session backend unavailable, using memory: %s", exc)
+    elif kind != "memory":
+        logger.warning("Unknown SESSION_BACKEND %r, using memory", kind)
+    return MemorySessionBackend()
+
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        _store = SessionStore(create_backend())
+    return _store
@@ -0,0 +1,189 @@
+"""Process bootstrap: environment setup, optional warmup and readiness.
+
+Heavy dependencies (``google.genai``, ``numpy``, ``rapidfuzz``) are imported
+on first use. A fresh worker can therefore bind its port quickly and warm
+the rest in the background; ``/health`` answers 503 until that finishes.
+Run ``python -m utils.startup`` from ``ai-service/`` for an import-time
+report.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Stages run in this order; "all" selects every one of them.
+WARMUP_STAGES = ("catalog", "matcher", "faq", "prices", "intent", "llm")
+# Modules deferred until first use; the report shows whether they got loaded.
+HEAVY_MODULES = ("google.genai", "numpy", "rapidfuzz", "thefuzz")
+
+WARMUP = os.getenv("WARMUP", "all")
+WARMUP_BLOCKING = os.getenv("WARMUP_BLOCKING", "0").lower() in ("1", "true", "yes")
+
+_configured = False
+
+
+def configure() -> None:
+    """Load ``.env`` and set up logging once, before app modules read env."""
+
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+
+def selected_stages(spec: str = WARMUP) -> List[str]:
+    names = {name.strip().lower() for name in spec.split(",") if name.strip()}
+    if names & {"none", "off", "0"}:
+        return []
+    if "all" in names:
+        return list(WARMUP_STAGES)
+    unknown = names.difference(WARMUP_STAGES)
+    if unknown:
+        logger.warning("Unknown warmup stages ignored: %s", ", ".join(sorted(unknown)))
+    return [name for name in WARMUP_STAGES if name in names]
+
+
+def _warm_catalog() -> None:
+    from utils.catalog import get_snapshot
+
+    get_snapshot()
+
+
+def _warm_matcher() -> None:
+    from utils.catalog import get_snapshot
+
+    # first calls import rapidfuzz/numpy and fill their internal caches
+    index = get_snapshot().menu_index
+    index.match("indomie")
+    index.match_many(["indomie", "es teh"])
+
+
+def _warm_faq() -> None:
+    from utils.faq_engine import FAQ_ENGINE
+
+    FAQ_ENGINE.search("jam buka")
+
+
+def _warm_prices() -> None:
+    from utils.price_calc import compile_price_table
+
+    compile_price_table()
+
+
+def _warm_intent() -> None:
+    from utils.intent import classify
+
+    classify("halo kak")
+
+
+def _warm_llm() -> None:
+    from utils.llm_client import warmup_client
+
+    if not warmup_client():
+        logger.info("LLM warmup skipped: no API key or backend configured.")
+
+
+_STAGE_FUNCS: Dict[str, Callable[[], None]] = {
+    "catalog": _warm_catalog,
+    "matcher": _warm_matcher,
+    "faq": _warm_faq,
+    "prices": _warm_prices,
+    "intent": _warm_intent,
+    "llm": _warm_llm,
+}
+
+
+class Readiness:
+    """Tracks the warmup stages behind ``/health``."""
+
+    def __init__(self) -> None:
+        self.ready = False
+        self.stages: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.import_seconds: Optional[float] = None
+        self.started_at = time.perf_counter()
+        self.ready_seconds: Optional[float] = None
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        self.ready_seconds = round(time.perf_counter() - self.started_at, 4)
+
+    def snapshot(self) -> dict:
+        return {
+            "status": "ok" if self.ready else "starting",
+            "ready": self.ready,
+            "import_seconds": self.import_seconds,
+            "ready_seconds": self.ready_seconds,
+            "warmup": dict(self.stages),
+            "errors": dict(self.errors),
+            "loaded": loaded_modules(),
+        }
+
+
+READINESS = Readiness()
+
+
+def loaded_modules() -> Dict[str, bool]:
+    return {name: name in sys.modules for name in HEAVY_MODULES}
+
+
+def record_import(seconds: float) -> None:
+    READINESS.import_seconds = round(seconds, 4)
+
+
+async def warmup(stages: Optional[List[str]] = None, readiness: Readiness = READINESS) -> None:
+    """Run the warmup stages off the event loop, then mark the worker ready."""
+
+    for name in selected_stages() if stages is None else stages:
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(_STAGE_FUNCS[name])
+        except Exception as e:
+            # a failed stage only means that part stays lazy
+            readiness.errors[name] = repr(e)
+            logger.exception("Warmup stage %s failed", name)
+        readiness.stages[name] = round(time.perf_counter() - started, 4)
+    readiness.mark_ready()
+    logger.info("Worker ready after %.3fs (warmup %s)", readiness.ready_seconds, readiness.stages)
+
+
+async def start(readiness: Readiness = READINESS) -> Optional[asyncio.Task]:
+    """Warm up inline (``WARMUP_BLOCKING=1``) or in a background task."""
+
+    if WARMUP_BLOCKING or not selected_stages():
+        await warmup(readiness=readiness)
+        return None
+    return asyncio.create_task(warmup(readiness=readiness), name="warmup")
+
+
+def import_report() -> Dict[str, object]:
+    """Time ``import main`` in this process and list eager heavy imports."""
+
+    configure()
+    before = set(sys.modules)
+    started = time.perf_counter()
+    import main  # noqa: F401
+
+    elapsed = time.perf_counter() - started
+    return {
+        "import_main_seconds": round(elapsed, 4),
+        "modules_imported": len(set(sys.modules) - before),
+        "heavy_modules_loaded": loaded_modules(),
+    }
+
+
+if __name__ == "__main__":
+    import json
+
+    print(json.dumps(import_report(), indent=2))
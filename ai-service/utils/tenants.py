@@ -0,0 +1,349 @@
+"""Many warungs per process: tenant-scoped catalog, prices, FAQ and promo rules.
+
+A request picks its tenant with the ``X-Tenant-ID`` header. Its files live
+in ``TENANT_DIR/<id>/`` under the same names as in ``data/``.
+``menu.json`` and ``inventory.json`` (prices and stock) always belong to
+the branch; a missing menu means the built-in one, as it does for
+``data/``. When the tenant lacks ``aliases.json``, ``faq.json`` or
+``config.json``, the one in ``data/`` is used, and a tenant without its own
+FAQ corpus or promo rules shares the default engine instead of compiling a
+copy. Requests without the header (or with ``default``) are served from
+``data/`` exactly as before.
+
+A tenant's catalog and engines are built on its first request, off the
+event loop, and kept in an LRU bounded by ``TENANT_CACHE_BYTES``. Its size
+(what it does not share) is measured once, when it is built. Tenants idle
+for ``TENANT_IDLE_TTL`` seconds are dropped as well, and rebuilt from their
+files on the next request; in-flight requests keep the objects they
+started with. While cached, a tenant's files are watched for changes like
+the default ones, but whether a file comes from the tenant directory or
+from ``data/`` is only decided when it is built.
+
+Stock reservations (``/inventory``) and learned aliases are kept per
+tenant as well, in its ``inventory.json`` and ``learned_aliases.json``.
+Their engines live outside the cache, so an evicted tenant keeps its open
+holds. The LLM admission queue is shared by all tenants of the process.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import mmap
+import os
+import re
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional
+
+from utils.catalog import (
+    ALIAS_PATH,
+    CURRENT_TENANT,
+    DATA_DIR,
+    Catalog,
+    catalog_image_path,
+)
+from utils.metrics import REGISTRY, TENANT_CACHE_BYTES_USED, TENANT_CACHE_EVENTS, count, enabled
+
+if TYPE_CHECKING:
+    from utils.catalog_sync import CatalogSync
+
+logger = logging.getLogger(__name__)
+
+TENANT_DIR = Path(os.getenv("TENANT_DIR", DATA_DIR / "tenants"))
+TENANT_CACHE_BYTES = int(os.getenv("TENANT_CACHE_BYTES", str(256 * 1024 * 1024)))
+TENANT_IDLE_TTL = float(os.getenv("TENANT_IDLE_TTL", "1800"))
+
+TENANT_HEADER = b"x-tenant-id"
+DEFAULT_TENANT = "default"
+
+_TENANT_ID = re.compile(r"[a-z0-9][a-z0-9_-]{0,63}")
+
+
+class UnknownTenant(LookupError):
+    """Raised for a tenant id without a directory under ``TENANT_DIR``."""
+
+
+_SHARED_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+)
+
+
+def _deep_size(root: object) -> int:
+    """Approximate bytes held by ``root``; numpy arrays count their buffer.
+
+    Classes, modules and functions are shared by every tenant and skipped,
+    and so are the pages behind a mapped catalog image.
+    """
+
+    seen = set()
+    stack = [root]
+    size = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, (memoryview, mmap.mmap)):
+            size += sys.getsizeof(obj, 0)
+            continue
+        nbytes = getattr(obj, "nbytes", None)
+        if isinstance(nbytes, int):
+            # an array owning its data already reports it; a view does not
+            size += max(sys.getsizeof(obj, 0), nbytes)
+            continue
+        size += sys.getsizeof(obj, 0)
+        if isinstance(obj, (str, bytes, int, float)) or obj is None:
+            continue
+        if isinstance(obj, (dict, types.MappingProxyType)):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, "__dict__"):
+            stack.append(vars(obj))
+        for slot in getattr(type(obj), "__slots__", ()):
+            if isinstance(slot, str) and hasattr(obj, slot):
+                stack.append(getattr(obj, slot))
+    return size
+
+
+class Tenant:
+    """One warung: its data directory plus the engines compiled from it."""
+
+    def __init__(self, tenant_id: str, root: Path) -> None:
+        from utils.faq_engine import FAQ_ENGINE, FaqEngine
+        from utils.promo_engine import PROMO_ENGINE, PromoEngine
+
+        self.id = tenant_id
+        self.root = root
+        aliases = root / "aliases.json"
+        self.catalog = Catalog(
+            menu_path=root / "menu.json",
+            inventory_path=root / "inventory.json",
+            alias_path=aliases if aliases.exists() else ALIAS_PATH,
+            image_path=catalog_image_path(f"tenants/{tenant_id}"),
+        )
+        # without files of their own, tenants share the default engines
+        faq, config = root / "faq.json", root / "config.json"
+        self.faq = FaqEngine(faq) if faq.exists() else FAQ_ENGINE
+        self.promo = PromoEngine(config) if config.exists() else PROMO_ENGINE
+        self.size = 0
+        self.last_used = time.monotonic()
+        self._sync: Optional[CatalogSync] = None
+
+    @property
+    def sync(self) -> "CatalogSync":
+        """Sheet sync writing this tenant's ``menu.json`` / ``inventory.json``."""
+
+        if self._sync is None:
+            from utils.catalog_sync import CatalogSync
+
+            self._sync = CatalogSync(
+                self.catalog, self.catalog.menu_path, self.catalog.inventory_path
+            )
+        return self._sync
+
+    def build(self) -> "Tenant":
+        """Compile everything up front and record the memory it takes."""
+
+        from utils.faq_engine import FAQ_ENGINE
+        from utils.promo_engine import PROMO_ENGINE
+
+        started = time.perf_counter()
+        snapshot = self.catalog.snapshot()
+        faq = self.faq.index()
+        promo = self.promo.table()
+        owned = [snapshot]
+        owned += [faq] if self.faq is not FAQ_ENGINE else []
+        owned += [promo] if self.promo is not PROMO_ENGINE else []
+        self.size = _deep_size(owned)
+        logger.info(
+            "Tenant %s built in %.1f ms (%d items, %d FAQ entries, %d promo rules, %.1f KiB)",
+            self.id,
+            (time.perf_counter() - started) * 1000,
+            len(snapshot.slugs),
+            len(faq),
+            len(promo),
+            self.size / 1024,
+        )
+        return self
+
+
+class TenantCache:
+    """Built tenants in least-recently-used order, bounded by their total size."""
+
+    def __init__(
+        self,
+        root: Path = TENANT_DIR,
+        budget: int = TENANT_CACHE_BYTES,
+        idle_ttl: float = TENANT_IDLE_TTL,
+    ) -> None:
+        self.root = root
+        self.budget = budget
+        self.idle_ttl = idle_ttl
+        self.used = 0
+        self._tenants: "OrderedDict[str, Tenant]" = OrderedDict()
+        self._lock = threading.Lock()
+        # one lock per tenant being built, so a burst of first requests builds it once
+        self._building: Dict[str, threading.Lock] = {}
+        self._stats: Dict[str, int] = {"hits": 0, "builds": 0, "evictions": 0, "expired": 0}
+
+    def _record(self, event: str) -> None:
+        self._stats[event] += 1
+        count(TENANT_CACHE_EVENTS, event)
+
+    def peek(self, tenant_id: str) -> Optional[Tenant]:
+        """The built tenant, marked as used; None if it has to be built first."""
+
+        with self._lock:
+            self._expire()
+            tenant = self._tenants.get(tenant_id)
+            if tenant is not None:
+                self._tenants.move_to_end(tenant_id)
+                tenant.last_used = time.monotonic()
+                self._record("hits")
+        return tenant
+
+    def get(self, tenant_id: str) -> Tenant:
+        """The built tenant, building it on a miss; blocks while it is built."""
+
+        tenant = self.peek(tenant_id)
+        if tenant is not None:
+            return tenant
+        if not _TENANT_ID.fullmatch(tenant_id) or not (self.root / tenant_id).is_dir():
+            raise UnknownTenant(tenant_id)
+
+        with self._lock:
+            building = self._building.setdefault(tenant_id, threading.Lock())
+        with building:
+            tenant = self.peek(tenant_id)
+            if tenant is not None:
+                return tenant
+            try:
+                tenant = Tenant(tenant_id, self.root / tenant_id).build()
+                with self._lock:
+                    self._tenants[tenant_id] = tenant
+                    self.used += tenant.size
+                    self._record("builds")
+                    self._evict()
+            finally:
+                with self._lock:
+                    self._building.pop(tenant_id, None)
+        return tenant
+
+    def _expire(self) -> None:
+        # called with the lock held; the least recently used sit at the front
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._tenants:
+            tenant = next(iter(self._tenants.values()))
+            if tenant.last_used >= cutoff:
+                return
+            self._drop(tenant.id, "expired")
+
+    def _evict(self) -> None:
+        # called with the lock held; the newest tenant stays even if over budget
+        while self.used > self.budget and len(self._tenants) > 1:
+            self._drop(next(iter(self._tenants)), "evictions")
+
+    def _drop(self, tenant_id: str, reason: str) -> None:
+        tenant = self._tenants.pop(tenant_id)
+        self.used -= tenant.size
+        self._record(reason)
+        logger.info("Tenant %s dropped from cache (%s)", tenant_id, reason)
+
+    def invalidate(self, tenant_id: str) -> bool:
+        """Drop a tenant so its next request rebuilds it (e.g. after adding files)."""
+
+        with self._lock:
+            if tenant_id not in self._tenants:
+                return False
+            self._drop(tenant_id, "evictions")
+            return True
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "tenants": len(self._tenants),
+                "bytes": self.used,
+                "budget": self.budget,
+                **self._stats,
+                "sizes": {tenant_id: tenant.size for tenant_id, tenant in self._tenants.items()},
+            }
+
+
+TENANTS = TenantCache()
+
+
+def tenant_key(jid: str) -> str:
+    """Key of ``jid``'s cart: the same customer has one cart per warung."""
+
+    tenant = CURRENT_TENANT.get()
+    return jid if tenant is None else f"{tenant.id}/{jid}"
+
+
+async def resolve_tenant(tenant_id: str) -> Optional[Tenant]:
+    """The tenant for a header value; None for the default data directory."""
+
+    tenant_id = tenant_id.strip().lower()
+    if not tenant_id or tenant_id == DEFAULT_TENANT:
+        return None
+    tenant = TENANTS.peek(tenant_id)
+    if tenant is None:
+        # building reads files and compiles indexes; keep it off the loop
+        tenant = await asyncio.to_thread(TENANTS.get, tenant_id)
+    return tenant
+
+
+class TenantMiddleware:
+    """ASGI middleware serving each request from its ``X-Tenant-ID`` tenant.
+
+    A WebSocket picks its tenant once, in the handshake, for all its messages.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        raw = next((value for name, value in scope["headers"] if name == TENANT_HEADER), b"")
+        try:
+            tenant = await resolve_tenant(raw.decode("latin-1"))
+        except UnknownTenant as exc:
+            error = f"unknown tenant {exc.args[0]!r}"
+            if scope["type"] == "websocket":
+                from starlette.websockets import WebSocketClose
+
+                # closing before the accept rejects the handshake
+                await WebSocketClose(code=1008, reason=error)(scope, receive, send)
+                return
+            from fastapi.responses import JSONResponse
+
+            response = JSONResponse({"ok": False, "error": error}, status_code=404)
+            await response(scope, receive, send)
+            return
+
+        token = CURRENT_TENANT.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            CURRENT_TENANT.reset(token)
+
+
+def _collect_bytes() -> None:
+    TENANT_CACHE_BYTES_USED.set(TENANTS.used)
+
+
+if enabled():
+    REGISTRY.add_collector(_collect_bytes)
@@ -4,12 +4,16 @@ require('dotenv').config({ path: path.resolve(__dirname, '..', '.env') });
 const logger = require('./utils/logger');
 const { startBot } = require('./bot');
 const { syncSheets } = require('./sheetsSync');
+const { getAiStream } = require('./services/aiStreamClient');
 
 (async () => {
   try {
     logger.info('🔄 Mengambil data awal dari Google Sheets...');
     await syncSheets();
 
+    // open the AI stream (AI_WS_URL) before the first customer message
+    getAiStream();
+
     await startBot();
     logger.info('✅ WarungGo bot berjalan');
 
@@ -1,4 +1,5 @@
 const { aiChatService } = require('./services/aiChatService');
+const { aiProcessService } = require('./services/aiProcessService');
 
 // Extract text from WhatsApp message
 const getTextFromMessage = (msg = {}) => {
@@ -26,11 +27,13 @@ const handle = async ({ sock, message, jid }) => {
   const body = getTextFromMessage(message);
   if (!body) return;
 
-  // call AI to generate a short, casual reply
-  const aiReply = await aiChatService(body);
+  // prefer /process_message (intent routing, cart per jid); else plain chat
+  const aiReply = process.env.AI_PROCESS_URL || process.env.AI_WS_URL
+    ? await aiProcessService(body, jid)
+    : await aiChatService(body, jid);
 
-  // kirim jawabannya
-  return sendText(sock, jid, aiReply);
+  // kirim jawabannya (jangan pernah kirim teks kosong/null)
+  return sendText(sock, jid, aiReply || "ga tau bro 😭");
 };
 
 module.exports = {
@@ -1,12 +1,25 @@
 const axios = require('axios');
+const { aiHeaders } = require('../utils/aiHeaders');
+const { getAiStream, NOT_CONNECTED } = require('./aiStreamClient');
+
+async function aiChatService(text, jid) {
+  const stream = getAiStream();
+  if (stream) {
+    try {
+      const data = await stream.request({ type: 'chat', text, jid });
+      return data && data.reply && data.reply.trim() ? data.reply.trim() : "ga tau bro 😭";
+    } catch (err) {
+      // never sent (still reconnecting): fall through to HTTP
+      if (err.code !== NOT_CONNECTED) return "ga tau bro 😭";
+    }
+  }
 
-async function aiChatService(text) {
   const url = process.env.AI_CHAT_URL;
 
   if (!url) return "ga tau bro 😭 (no AI_CHAT_URL)";
 
   try {
-    const { data } = await axios.post(url, { text });
+    const { data } = await axios.post(url, { text, jid }, { headers: aiHeaders() });
 
     // ensure a reply ALWAYS exists
     if (!data || !data.reply || !data.reply.trim()) {
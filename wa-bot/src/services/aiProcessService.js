@@ -0,0 +1,39 @@
+const axios = require('axios');
+const { aiHeaders } = require('../utils/aiHeaders');
+const { getAiStream, NOT_CONNECTED } = require('./aiStreamClient');
+const { aiChatService } = require('./aiChatService');
+
+// One round-trip to /process_message: the AI service routes the message
+// (order, faq, promo, smalltalk) locally and only calls the LLM when needed.
+// With AI_WS_URL set it goes over the /ws stream instead.
+async function aiProcessService(text, jid) {
+  const stream = getAiStream();
+  if (stream) {
+    try {
+      const data = await stream.request({ type: 'process', text, jid });
+      return data && data.reply && data.reply.trim() ? data.reply.trim() : "ga tau bro 😭";
+    } catch (err) {
+      // never sent (still reconnecting): fall through to HTTP
+      if (err.code !== NOT_CONNECTED) return "ga tau bro 😭";
+    }
+  }
+
+  const url = process.env.AI_PROCESS_URL;
+
+  // only AI_WS_URL is set and the stream is down: plain chat still answers
+  if (!url) return aiChatService(text, jid);
+
+  try {
+    const { data } = await axios.post(url, { text, jid }, { headers: aiHeaders() });
+
+    if (!data || !data.reply || !data.reply.trim()) {
+      return "ga tau bro 😭";
+    }
+
+    return data.reply.trim();
+  } catch (err) {
+    return "ga tau bro 😭";
+  }
+}
+
+module.exports = { aiProcessService };
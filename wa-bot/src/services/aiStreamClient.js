@@ -0,0 +1,115 @@
+const WebSocket = require('ws');
+const logger = require('../utils/logger');
+const { aiHeaders } = require('../utils/aiHeaders');
+
+// One long-lived WebSocket to the AI service's /ws endpoint. Messages are
+// written as soon as they arrive, without waiting for earlier replies; the
+// service answers each one when it is done, matched back by its id.
+
+const NOT_CONNECTED = 'AI_STREAM_NOT_CONNECTED';
+
+const REQUEST_TIMEOUT_MS = Number(process.env.AI_WS_TIMEOUT_MS || 15000);
+const RECONNECT_MIN_MS = 500;
+const RECONNECT_MAX_MS = 30000;
+const HEARTBEAT_MS = 30000;
+
+class AiStreamClient {
+  constructor(url) {
+    this.url = url;
+    this.ws = null;
+    this.pending = new Map();
+    this.seq = 0;
+    this.backoff = RECONNECT_MIN_MS;
+    this.heartbeat = null;
+    this.connect();
+  }
+
+  connect() {
+    const ws = new WebSocket(this.url, { headers: aiHeaders(), perMessageDeflate: false });
+
+    ws.on('open', () => {
+      logger.info({ url: this.url }, 'AI stream connected');
+      this.ws = ws;
+      this.backoff = RECONNECT_MIN_MS;
+      ws.alive = true;
+      this.heartbeat = setInterval(() => {
+        // no pong since the last ping: the connection is dead, not just idle
+        if (!ws.alive) return ws.terminate();
+        ws.alive = false;
+        ws.ping();
+      }, HEARTBEAT_MS);
+    });
+    ws.on('pong', () => {
+      ws.alive = true;
+    });
+    ws.on('message', (data) => this.onMessage(data));
+    ws.on('error', (err) => {
+      // 'close' follows and schedules the reconnect
+      logger.warn({ err: err.message }, 'AI stream error');
+    });
+    ws.on('close', () => this.onClose(ws));
+  }
+
+  onMessage(data) {
+    let reply;
+    try {
+      reply = JSON.parse(data.toString());
+    } catch (err) {
+      logger.warn('AI stream reply is not JSON');
+      return;
+    }
+    const entry = this.pending.get(reply.id);
+    if (!entry) return; // timed out already
+    this.pending.delete(reply.id);
+    clearTimeout(entry.timer);
+    if (reply.ok) entry.resolve(reply.data);
+    else entry.reject(new Error(reply.error || 'AI stream error'));
+  }
+
+  onClose(ws) {
+    clearInterval(this.heartbeat);
+    if (this.ws === ws) this.ws = null;
+    // these were sent: the service may have processed them, so do not resend
+    for (const [id, entry] of this.pending) {
+      clearTimeout(entry.timer);
+      entry.reject(new Error('AI stream closed'));
+      this.pending.delete(id);
+    }
+    const delay = this.backoff + Math.floor(Math.random() * this.backoff * 0.2);
+    this.backoff = Math.min(this.backoff * 2, RECONNECT_MAX_MS);
+    logger.warn({ delay }, 'AI stream closed, reconnecting');
+    setTimeout(() => this.connect(), delay);
+  }
+
+  // Resolves with the reply's data. Rejects with code NOT_CONNECTED when the
+  // envelope was never sent, so the caller may safely use HTTP instead.
+  request(envelope) {
+    const ws = this.ws;
+    if (!ws || ws.readyState !== WebSocket.OPEN) {
+      const err = new Error('AI stream not connected');
+      err.code = NOT_CONNECTED;
+      return Promise.reject(err);
+    }
+    const id = `${Date.now().toString(36)}-${++this.seq}`;
+    return new Promise((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error('AI stream timeout'));
+      }, REQUEST_TIMEOUT_MS);
+      this.pending.set(id, { resolve, reject, timer });
+      ws.send(JSON.stringify({ ...envelope, id }));
+    });
+  }
+}
+
+let client = null;
+
+// The shared client, or null when AI_WS_URL is not set.
+function getAiStream() {
+  const url = process.env.AI_WS_URL;
+  if (!url) return null;
+  if (!client) client = new AiStreamClient(url);
+  return client;
+}
+
+module.exports = { AiStreamClient, getAiStream, NOT_CONNECTED };
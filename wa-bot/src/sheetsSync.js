@@ -1,8 +1,10 @@
 const fs = require('fs/promises');
 const path = require('path');
+const axios = require('axios');
 const { google } = require('googleapis');
 
 const logger = require('./utils/logger');
+const { aiHeaders } = require('./utils/aiHeaders');
 
 const SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly'];
 const DATA_DIR = path.join(__dirname, '..', 'data');
@@ -71,6 +73,30 @@ const syncSheets = async () => {
     'Google Sheets sync completed'
   );
 
+  // AI service only applies rows that changed, without a restart
+  const aiSyncUrl = process.env.AI_CATALOG_SYNC_URL;
+  if (aiSyncUrl) {
+    try {
+      const { data: result } = await axios.post(
+        aiSyncUrl,
+        { rows },
+        { headers: aiHeaders() }
+      );
+      logger.info(
+        {
+          version: result.version,
+          added: result.added.length,
+          removed: result.removed.length,
+          priceChanged: result.price_changed.length,
+          stockChanged: result.stock_changed.length
+        },
+        'AI service catalog updated'
+      );
+    } catch (err) {
+      logger.warn({ err: err.message }, 'AI service catalog sync failed');
+    }
+  }
+
   return { menu, inventory };
 };
 
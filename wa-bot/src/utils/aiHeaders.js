@@ -0,0 +1,9 @@
+// Headers sent with every AI service request. AI_TENANT_ID selects this
+// branch's menu, prices, FAQ and promo rules when one AI service serves
+// several warungs.
+function aiHeaders() {
+  const tenant = process.env.AI_TENANT_ID;
+  return tenant ? { 'X-Tenant-ID': tenant } : {};
+}
+
+module.exports = { aiHeaders };